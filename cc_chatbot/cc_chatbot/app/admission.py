@@ -0,0 +1,233 @@
+"""
+Admission control for the local Ollama model
+Ollama runs OLLAMA_NUM_PARALLEL requests at once and queues the rest
+internally, where every waiting chat slows down together. This controller
+lets at most that many calls through and keeps the others in a bounded
+queue of its own:
+- waiting requests are served round-robin by session, so one chatty
+  session can't starve the others (and may only queue a few at a time)
+- a request that waits longer than the queue deadline gives up with
+  QueueTimeout, so the caller can spill over to another provider
+- when the queue is full, QueueFull is raised at once with a Retry-After
+  estimate for the HTTP 429
+
+The same controller serves threads (slot) and asyncio tasks (slot_async).
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from event_log import log_event
+
+
+class AdmissionRejected(Exception):
+    """The call was not admitted; retry_after estimates when a slot frees up (seconds)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(AdmissionRejected):
+    pass
+
+
+class QueueTimeout(AdmissionRejected):
+    pass
+
+
+class _Waiter:
+    __slots__ = ('session_id', 'granted', 'enqueued', '_event', '_loop', '_future')
+
+    def __init__(self, session_id, loop=None):
+        self.session_id = session_id
+        self.granted = False
+        self.enqueued = time.monotonic()
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def wake(self):
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(_resolve, self._future)
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+    async def wait_async(self, timeout):
+        try:
+            await asyncio.wait_for(self._future, timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """Bounded concurrency plus a bounded, per-session fair wait queue"""
+
+    def __init__(self, name, limit=1, max_queue=8, per_session=2, queue_timeout=5.0):
+        self.name = name
+        self.limit = limit  # Calls running at once
+        self.max_queue = max_queue  # Calls waiting, across all sessions
+        self.per_session = per_session  # Calls one session may have waiting
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queues = OrderedDict()  # session_id -> deque of waiters, in round-robin order
+        self._queued = 0
+        self._service_time = queue_timeout  # Running average of how long a call holds its slot
+        self._stats = {'admitted': 0, 'queued': 0, 'timeouts': 0, 'rejected_full': 0, 'rejected_session': 0,
+                       'cancelled': 0, 'max_queue_seen': 0}
+        self._wait_total = 0.0
+        self._waits = 0  # Queued calls that got a slot
+
+    @contextmanager
+    def slot(self, session_id, timeout=None):
+        """Hold one of the limit slots for the with-block; raises QueueFull or QueueTimeout"""
+        waiter = self._enter(session_id)
+        if waiter is not None:
+            waiter.wait(self.queue_timeout if timeout is None else timeout)
+            self._settle(waiter)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    @asynccontextmanager
+    async def slot_async(self, session_id, timeout=None):
+        """slot() for asyncio tasks: waits without blocking the event loop"""
+        waiter = self._enter(session_id, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await waiter.wait_async(self.queue_timeout if timeout is None else timeout)
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+            self._settle(waiter)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(started)
+
+    def retry_after(self):
+        """Seconds until a newly queued call would probably be served"""
+        with self._lock:
+            return self._estimate_wait()
+
+    def expected_wait(self):
+        """Seconds a call arriving now would probably wait for a slot (0 while one is free)"""
+        with self._lock:
+            if self._active < self.limit and not self._queued:
+                return 0.0
+            return (self._queued + 1) / self.limit * self._service_time
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'waiting': self._queued,
+                'waiting_sessions': len(self._queues),
+                'max_queue': self.max_queue,
+                'per_session': self.per_session,
+                'queue_timeout': self.queue_timeout,
+                'avg_wait_ms': round(self._wait_total / self._waits * 1000, 1) if self._waits else None,
+                'avg_service_s': round(self._service_time, 2),
+                **self._stats
+            }
+
+    def _enter(self, session_id, loop=None):
+        """Take a free slot (returns None) or join the queue (returns the waiter)"""
+        if session_id is None:
+            session_id = object()  # No session: queued on its own
+        with self._lock:
+            if self._active < self.limit and not self._queued:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return None
+
+            queue = self._queues.get(session_id)
+            if self._queued >= self.max_queue or (queue and len(queue) >= self.per_session):
+                reason = 'rejected_full' if self._queued >= self.max_queue else 'rejected_session'
+                self._stats[reason] += 1
+                retry_after = self._estimate_wait()
+                waiting = self._queued
+            else:
+                waiter = _Waiter(session_id, loop)
+                if queue is None:
+                    queue = self._queues[session_id] = deque()
+                queue.append(waiter)
+                self._queued += 1
+                self._stats['queued'] += 1
+                self._stats['max_queue_seen'] = max(self._stats['max_queue_seen'], self._queued)
+                return waiter
+        log_event('admission_rejected', level='warning', name=self.name, reason=reason,
+                  waiting=waiting, retry_after=round(retry_after, 1))
+        raise QueueFull(f"{self.name} queue is full", retry_after)
+
+    def _settle(self, waiter):
+        """After waiting: keep the slot if it was granted, otherwise leave the queue and raise"""
+        with self._lock:
+            if waiter.granted:
+                self._wait_total += time.monotonic() - waiter.enqueued
+                self._waits += 1
+                return
+            self._remove(waiter)
+            self._stats['timeouts'] += 1
+            retry_after = self._estimate_wait()
+        log_event('admission_timeout', level='warning', name=self.name,
+                  waited_ms=round((time.monotonic() - waiter.enqueued) * 1000, 1))
+        raise QueueTimeout(f"Waited too long for {self.name}", retry_after)
+
+    def _abandon(self, waiter):
+        with self._lock:
+            self._stats['cancelled'] += 1
+            if not waiter.granted:
+                self._remove(waiter)
+                return
+        self._release(None)  # Granted just as the caller went away
+
+    def _release(self, started):
+        with self._lock:
+            self._active -= 1
+            if started is not None:
+                # Running average over roughly the last 10 calls
+                self._service_time += (time.monotonic() - started - self._service_time) * 0.1
+            while self._active < self.limit and self._queues:
+                # Round-robin: the first session in line gets the slot and goes to the back
+                session_id, queue = next(iter(self._queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(session_id)
+                else:
+                    del self._queues[session_id]
+                self._queued -= 1
+                self._active += 1
+                self._stats['admitted'] += 1
+                waiter.granted = True
+                waiter.wake()
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.session_id]
+
+    def _estimate_wait(self):
+        return max(1.0, (self._queued + 1) / self.limit * self._service_time)
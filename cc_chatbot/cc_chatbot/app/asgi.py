@@ -0,0 +1,804 @@
+"""
+Async (ASGI) serving mode for Cloudy AI
+Serves the same routes as the Flask app (/, /get, /new-chat, /stats/...)
+with the same signed session cookie, but a chat waiting on a model no longer
+holds a worker thread: Ollama is called through ollama.AsyncClient, OpenAI
+through AsyncOpenAI, Gemini through generate_content_async (on a thread
+when GEMINI_API_ENDPOINT selects the REST transport), Hugging Face
+through httpx.AsyncClient and DuckDuckGo through AsyncDDGS, so one process
+can hold hundreds of chats in flight.
+
+    uvicorn app.asgi:app --port 5000
+
+Caches, circuit breakers, the session store, conversation context and the
+rule-based fallback are the ones in chatbot.py, and so are the steps of a
+reply: whether to search the web, the context and cache lookup, building
+provider requests and reading their replies, grounding, and recording the
+reply. This module only awaits the I/O in between; the Flask server keeps
+working unchanged.
+"""
+
+import asyncio
+import functools
+import json
+import math
+import mimetypes
+import os
+import sys
+import time
+import uuid
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import render_template
+from itsdangerous import BadSignature
+from werkzeug.http import dump_cookie, parse_cookie
+from werkzeug.security import safe_join
+
+import chatbot
+from admission import QueueFull, QueueTimeout
+from chatbot import CLOUDY_PREFIX, EMPTY_CONTEXT, NO_DEADLINE, PROVIDER_MIN_BUDGET
+from circuit_breaker import guarded_stream_async
+from event_log import log_event
+from grounding import Grounding
+from http_clients import httpx_async_client
+import metrics
+from metrics import record_attempt, timed_provider
+from provider_race import call_providers_async
+from rules import keyword_rules
+from providers import ProviderRegistry
+from tracing import add_span, span, traced
+from web_search import WEB_SEARCH_AVAILABLE
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# 🔹 Session store calls: the in-memory store answers in microseconds and is called
+# inline; SQLite and Redis do I/O, so their calls run on the default thread pool
+BLOCKING_SESSIONS = not chatbot.SESSION_BACKEND.startswith('memory')
+
+async def session_call(fn, *args, **kwargs):
+    if BLOCKING_SESSIONS:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+class AsyncClients:
+    """Provider clients of the event loop: the SDK ones built on first use, closed on shutdown
+
+    Pool sizes, keep-alive and timeouts are chatbot.HTTP_SETTINGS, as for the sync clients.
+    """
+
+    def __init__(self):
+        self.providers = self._registry()
+        self.http = None
+        self.started = False
+
+    def _registry(self):
+        settings = chatbot.HTTP_SETTINGS
+        registry = ProviderRegistry()
+        # OLLAMA_HOST, like the sync client
+        registry.register('Ollama', 'ollama',
+                          lambda ollama: ollama.AsyncClient(**settings['Ollama'].httpx_options(asynchronous=True)),
+                          enabled=chatbot.provider_registry['Ollama'].enabled)
+        registry.register('OpenAI', 'openai',
+                          lambda openai: openai.AsyncOpenAI(api_key=chatbot.OPENAI_API_KEY,
+                                                            http_client=httpx_async_client(settings['OpenAI'])),
+                          enabled=chatbot.provider_registry['OpenAI'].enabled)
+        # Gemini's sync model has the async methods too
+        registry.register('Gemini', 'google.generativeai', lambda genai: chatbot.provider_registry.get('Gemini'),
+                          enabled=chatbot.provider_registry['Gemini'].enabled)
+        return registry
+
+    def start(self):
+        if self.started:
+            return
+        if HTTPX_AVAILABLE:
+            self.http = httpx_async_client(chatbot.HTTP_SETTINGS['HuggingFace'])
+        self.started = True
+
+    async def get(self, name):
+        """name's client (None if disabled); loading it the first time (the SDK import) runs on a thread"""
+        provider = self.providers[name]
+        if provider.loaded or not provider.enabled:
+            return provider.client
+        return await asyncio.to_thread(provider.get)
+
+    async def close(self):
+        openai, ollama = self.providers['OpenAI'].client, self.providers['Ollama'].client
+        if openai:
+            await openai.close()
+        if ollama:
+            await ollama._client.aclose()  # ollama 0.3's AsyncClient has no close()
+        if self.http:
+            await self.http.aclose()
+        await chatbot.web_searcher.aclose()
+        if chatbot.page_fetcher:
+            await chatbot.page_fetcher.aclose()
+        self.providers = self._registry()
+        self.http = None
+        self.started = False
+
+
+clients = AsyncClients()
+
+# 🔹 AI providers (async counterparts of the get_*_response functions in chatbot.py)
+
+async def get_ollama_response_async(user_input, context=EMPTY_CONTEXT):
+    if not chatbot.check_ollama_service() or not await clients.get('Ollama'):
+        return None
+
+    # Same admission queue as the Flask path (QueueFull is raised to the provider chain)
+    queued = time.perf_counter()
+    try:
+        async with chatbot.ollama_admission.slot_async(context.session_id, timeout=chatbot.admission_timeout()):
+            add_span('ollama.queue', queued)
+            return await ask_ollama(user_input, context)
+    except QueueTimeout:
+        add_span('ollama.queue', queued, timed_out=True)
+        return None  # Waited too long: spill over to the next provider
+
+async def ask_ollama(user_input, context):
+    breaker = chatbot.circuit_breakers['Ollama']
+    if not breaker.allow_request():
+        return None
+
+    try:
+        response = None
+        last_error = None
+        for model_name in chatbot.ollama_models():
+            try:
+                method, request, reused = chatbot.ollama_request(model_name, user_input, context)
+                with span('ollama.call', model=model_name):
+                    response = await getattr(await clients.get('Ollama'), method)(**request)
+                log_event('ollama_model_used', level='debug', model=model_name)
+                break
+            except Exception as model_error:
+                last_error = model_error
+                if not chatbot.ollama_retry(model_name, model_error):
+                    break
+
+        if response is None:
+            chatbot.record_provider_failure(breaker, last_error)
+            return None
+
+        breaker.record_success()
+        return chatbot.ollama_reply(response, reused, model_name, context)
+    except Exception as e:
+        return chatbot.provider_failed('Ollama', e)
+
+async def get_openai_response_async(user_input, context=EMPTY_CONTEXT):
+    openai = await clients.get('OpenAI')
+    if not openai:
+        return None
+
+    breaker = chatbot.circuit_breakers['OpenAI']
+    if not breaker.allow_request():
+        return None
+
+    try:
+        response = await openai.chat.completions.create(**chatbot.openai_request(user_input, context))
+        breaker.record_success()
+        return chatbot.openai_reply(response)
+    except Exception as e:
+        return chatbot.provider_failed('OpenAI', e, model=chatbot.OPENAI_MODEL)
+
+async def get_gemini_response_async(user_input, context=EMPTY_CONTEXT):
+    gemini_model = await clients.get('Gemini')
+    if not gemini_model:
+        return None
+
+    breaker = chatbot.circuit_breakers['Gemini']
+    if not breaker.allow_request():
+        return None
+
+    try:
+        response = await gemini_generate(
+            gemini_model,
+            chatbot.build_gemini_prompt(user_input, context),
+            generation_config=chatbot.gemini_generation_config(),
+            **chatbot.gemini_request_options(gemini_model)
+        )
+        breaker.record_success()
+        return chatbot.gemini_reply(response)
+    except Exception as e:
+        return chatbot.provider_failed('Gemini', e)
+
+async def gemini_generate(model, prompt, **kwargs):
+    """generate_content without blocking the loop; the REST transport has no async client, so it runs on a thread"""
+    if chatbot.GEMINI_API_ENDPOINT:
+        return await asyncio.to_thread(model.generate_content, prompt, **kwargs)
+    return await model.generate_content_async(prompt, **kwargs)
+
+async def get_huggingface_response_async(user_input, context=EMPTY_CONTEXT):
+    if not chatbot.HF_API_KEY or not clients.http:
+        return None
+
+    breaker = chatbot.circuit_breakers['HuggingFace']
+    if not breaker.allow_request():
+        return None
+
+    try:
+        response = await clients.http.post(chatbot.HF_API_URL, headers=chatbot.headers,
+                                           json=chatbot.huggingface_payload(user_input))
+        if response.status_code != 200:
+            return chatbot.provider_failed('HuggingFace', status_code=response.status_code, headers=response.headers)
+
+        breaker.record_success()
+        return chatbot.huggingface_reply(response.json(), user_input)
+    except httpx.HTTPError as e:
+        return chatbot.provider_failed('HuggingFace', e)
+
+# AI providers in priority order (same as chatbot.AI_PROVIDERS)
+AI_PROVIDERS = [
+    ('Ollama', get_ollama_response_async),
+    ('OpenAI', get_openai_response_async),
+    ('Gemini', get_gemini_response_async),
+    ('HuggingFace', get_huggingface_response_async),
+]
+
+@traced('providers')
+async def get_ai_response(user_input, context=EMPTY_CONTEXT, deadline=NO_DEADLINE, grounding=None):
+    """Return (provider, reply) from the AI providers, or (None, None) if all fail or time runs out"""
+    providers = [(name, functools.partial(provider, context=context)) for name, provider in AI_PROVIDERS]
+    if grounding:
+        providers = [(name, grounded(name, provider, grounding, deadline)
+                      if name in chatbot.GROUNDED_PROVIDERS else provider)
+                     for name, provider in providers]
+    return await call_providers_async(providers, user_input, **chatbot.provider_chain_options(deadline))
+
+def grounded(name, provider, grounding, deadline):
+    """provider, called with the search results in its prompt when they are in"""
+    async def call(user_input):
+        return await provider(await grounding.ground_async(user_input, name, deadline))
+    return call
+
+async def get_web_search_response(user_input, deadline=NO_DEADLINE):
+    """Search the web (AsyncDDGS, shared cache) and answer from the results"""
+    if not WEB_SEARCH_AVAILABLE:
+        return None
+
+    try:
+        return chatbot.format_web_results(await web_search_results(user_input, deadline))
+    except Exception as e:
+        log_event('web_search_error', level='warning', error=str(e))
+        return None
+
+@timed_provider('web_search')
+@traced('web_search')
+async def web_search_results(user_input, deadline=NO_DEADLINE):
+    """The web search results for user_input (with page text when enrichment is on), or None"""
+    results = await chatbot.web_searcher.search_async(user_input, timeout=deadline.cap(chatbot.web_searcher.deadline))
+    log_event('web_search_results', level='debug', query=user_input[:200],
+              results=len(results) if results is not None else None)
+    if results and chatbot.page_fetcher:
+        results = await chatbot.page_fetcher.enrich_async(results, timeout=deadline.cap(chatbot.page_fetcher.budget))
+    return results
+
+def start_grounding(user_input, deadline):
+    """Start the web search for user_input as a task alongside the providers (see grounding.py)"""
+    return Grounding.start_async(web_search_results, user_input, deadline, wait=chatbot.WEB_GROUNDING_WAIT,
+                                 max_results=chatbot.WEB_GROUNDING_RESULTS)
+
+async def settle_reply(user_input, provider, reply, context, grounding, deadline):
+    """chatbot.settle_reply, waiting for the search results on the event loop when no provider answered"""
+    if grounding and not reply:
+        await grounding.results_async(deadline.cap(chatbot.web_searcher.deadline))
+    return chatbot.settle_reply(user_input, provider, reply, context, grounding, deadline)
+
+async def chatbot_response(user_input, session_id, regenerate, request_id, deadline=NO_DEADLINE):
+    """The JSON body of a non-streaming /get (same steps as chatbot.chatbot_response)"""
+    started = time.perf_counter()
+    scan = keyword_rules.scan(user_input)
+    try:
+        # High-confidence intents are answered instantly, without any LLM
+        reply = await session_call(chatbot.get_intent_reply, user_input, regenerate, session_id, scan)
+        if reply:
+            return await session_call(chatbot.record_reply, request_id, session_id, 'intent', reply, started)
+
+        grounding = None
+        search = chatbot.web_search_plan(user_input, scan, deadline)
+        if search == 'speculative':
+            grounding = start_grounding(user_input, deadline)
+        elif search:
+            reply = await get_web_search_response(user_input, deadline)
+            if reply:
+                return await session_call(chatbot.record_reply, request_id, session_id, 'web_search', reply, started)
+
+        context, cached = await session_call(chatbot.prepare_providers, user_input, session_id, regenerate, grounding)
+        if cached:
+            provider, reply = cached
+            return await session_call(chatbot.record_reply, request_id, session_id, provider, reply, started,
+                                      cached=True)
+
+        provider, reply = await get_ai_response(user_input, context, deadline, grounding)
+        provider, reply = await settle_reply(user_input, provider, reply, context, grounding, deadline)
+
+        if not reply:
+            provider, reply = 'fallback', await session_call(chatbot.get_intelligent_fallback, user_input, session_id,
+                                                             scan)
+
+        return await session_call(chatbot.record_reply, request_id, session_id, provider, reply, started,
+                                  grounding=grounding)
+
+    except QueueFull:
+        raise
+    except Exception as e:
+        log_event('chat_error', level='error', request_id=request_id, error=str(e), error_type=type(e).__name__)
+        reply = await session_call(chatbot.get_intelligent_fallback, user_input, session_id, scan)
+        return {'reply': reply, 'provider': 'fallback'}
+
+# 🔹 Streaming responses (Server-Sent Events)
+
+async def _ollama_chunks(user_input, context):
+    started = time.perf_counter()
+    method, request, reused = chatbot.ollama_request(chatbot.OLLAMA_MODEL, user_input, context)
+    stream = await getattr(await clients.get('Ollama'), method)(stream=True, **request)
+    reply_parts = []
+    time_to_first_token = None
+    async for chunk in stream:
+        content = chatbot.ollama_chunk_text(chunk, reused)
+        if content:
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - started
+            reply_parts.append(content)
+            yield content
+        chatbot.ollama_stream_done(chunk, reused, context, reply_parts, time_to_first_token)
+
+async def _openai_chunks(user_input, context):
+    openai = await clients.get('OpenAI')
+    stream = await openai.chat.completions.create(stream=True, **chatbot.openai_request(user_input, context))
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def _gemini_chunks(user_input, context):
+    gemini_model = await clients.get('Gemini')
+    stream = await gemini_generate(
+        gemini_model,
+        chatbot.build_gemini_prompt(user_input, context),
+        generation_config=chatbot.gemini_generation_config(),
+        stream=True,
+        **chatbot.gemini_request_options(gemini_model)
+    )
+    if chatbot.GEMINI_API_ENDPOINT:
+        # A blocking stream: each chunk is read on a thread
+        chunks = iter(stream)
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            if chunk.text:
+                yield chunk.text
+    async for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+def stream_provider(name, available, chunks):
+    """A streaming provider: chunks(user_input, context) behind the provider's circuit breaker"""
+    async def stream(user_input, context):
+        if not await available():
+            return
+        async for chunk in guarded_stream_async(chatbot.circuit_breakers[name], lambda: chunks(user_input, context)):
+            yield chunk
+    return stream
+
+async def stream_ollama(user_input, context):
+    """Ollama's stream, holding an admission slot until it ends"""
+    queued = time.perf_counter()
+    try:
+        async with chatbot.ollama_admission.slot_async(context.session_id, timeout=chatbot.admission_timeout()):
+            add_span('ollama.queue', queued)
+            async for chunk in ollama_stream(user_input, context):
+                yield chunk
+    except QueueTimeout:
+        add_span('ollama.queue', queued, timed_out=True)
+        return  # Spill over to the next provider
+
+async def ollama_ready():
+    return chatbot.check_ollama_service() and await clients.get('Ollama') is not None
+
+ollama_stream = stream_provider('Ollama', ollama_ready, _ollama_chunks)
+
+# Streaming providers in fallback order (same as chatbot.STREAMING_PROVIDERS)
+STREAMING_PROVIDERS = [
+    ('Ollama', stream_ollama),
+    ('OpenAI', stream_provider('OpenAI', lambda: clients.get('OpenAI'), _openai_chunks)),
+    ('Gemini', stream_provider('Gemini', lambda: clients.get('Gemini'), _gemini_chunks)),
+]
+
+async def with_cloudy_prefix(chunks):
+    """Buffer just enough of a stream to make sure it starts with the Cloudy prefix"""
+    buffered = ''
+    async for chunk in chunks:
+        buffered += chunk
+        if len(buffered.lstrip()) >= len(CLOUDY_PREFIX):
+            break
+
+    buffered = buffered.lstrip()
+    if not buffered:
+        return
+    yield chatbot.cloudy_reply(buffered)
+    async for chunk in chunks:
+        yield chunk
+
+async def chunks_within(stream, deadline):
+    """The rest of stream, each chunk awaited with deadline applied; raises TimeoutError once it has run out"""
+    while True:
+        if deadline.expired():
+            raise TimeoutError("stream ran past the request deadline")
+        try:
+            with deadline.applied():
+                chunk = await asyncio.wait_for(stream.__anext__(), deadline.cap(None))
+        except StopAsyncIteration:
+            return
+        yield chunk
+
+async def stream_chatbot_reply(user_input, outcome, regenerate=False, session_id='default', deadline=NO_DEADLINE,
+                               scan=None):
+    """Yield reply chunks, falling back to the next provider until one produces a first token
+
+    No provider gets longer than what is left of the deadline for its first token,
+    and a stream still running when the deadline expires ends there.
+    """
+    reply = await session_call(chatbot.get_intent_reply, user_input, regenerate, session_id, scan)
+    if reply:
+        outcome['provider'] = 'intent'
+        yield reply
+        return
+
+    grounding = None
+    search = chatbot.web_search_plan(user_input, scan, deadline)
+    if search == 'speculative':
+        grounding = start_grounding(user_input, deadline)
+    elif search:
+        reply = await get_web_search_response(user_input, deadline)
+        if reply:
+            outcome['provider'] = 'web_search'
+            yield reply
+            return
+
+    context, cached = await session_call(chatbot.prepare_providers, user_input, session_id, regenerate, grounding)
+    if cached:
+        outcome['provider'], reply = cached
+        outcome['cached'] = True
+        yield reply
+        return
+
+    overloaded = None
+    streaming_providers = chatbot.router.order(STREAMING_PROVIDERS, stream=True)
+    for index, (name, provider) in enumerate(streaming_providers):
+        if chatbot.out_of_time(streaming_providers, index, deadline):
+            break
+        log_event('provider_attempt', level='debug', provider=name, stream=True)
+        prompt = await grounding.ground_async(user_input, name, deadline) if grounding else user_input
+        stream = with_cloudy_prefix(provider(prompt, context))
+
+        # Fallback is only possible until the first token has been sent
+        attempt_start = time.perf_counter()
+        first_chunk = None
+        try:
+            with deadline.applied(), span(name.lower(), stream=True):
+                first_chunk = await asyncio.wait_for(stream.__anext__(), deadline.cap(None))
+        except Exception as e:
+            overloaded = chatbot.stream_failed(name, e, deadline) or overloaded
+            continue
+        finally:
+            chatbot.observe_attempt(name, first_chunk is not None, attempt_start, stream=True)
+
+        metrics.fallback_depth.observe(index)
+        outcome['provider'] = name
+        reply_parts = [first_chunk]
+        yield first_chunk
+        try:
+            async for chunk in chunks_within(stream, deadline):
+                reply_parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            log_event('stream_interrupted', level='warning', provider=name, error=str(e))
+            return  # Don't cache a partial reply
+        for chunk in chatbot.stream_ending(user_input, name, ''.join(reply_parts), context, grounding, deadline,
+                                           outcome):
+            yield chunk
+        return
+
+    # Non-streaming fallbacks are sent as a single chunk
+    reply = None
+    if deadline.allows(PROVIDER_MIN_BUDGET):
+        attempt_start = time.perf_counter()
+        with deadline.applied(), span('huggingface'):
+            reply = await get_huggingface_response_async(user_input)
+        chatbot.observe_attempt('HuggingFace', bool(reply), attempt_start)
+    else:
+        record_attempt('HuggingFace', None)
+    metrics.fallback_depth.observe(len(STREAMING_PROVIDERS) + (0 if reply else 1))
+    # Without any provider's reply, the search results are the answer
+    provider, reply = await settle_reply(user_input, 'HuggingFace' if reply else None, reply, context, grounding,
+                                         deadline)
+    if reply:
+        outcome['provider'] = provider
+        yield reply
+        return
+
+    if overloaded:
+        raise overloaded
+    outcome['provider'] = 'fallback'
+    yield await session_call(chatbot.get_intelligent_fallback, user_input, session_id, scan)
+
+async def stream_chatbot_response(send, request, user_input, session_id, regenerate=False, request_id=None,
+                                  deadline=NO_DEADLINE):
+    """Stream the reply to the browser as Server-Sent Events"""
+    started = time.perf_counter()
+    outcome = {'provider': None, 'cached': False}
+    scan = keyword_rules.scan(user_input)
+    chunks = stream_chatbot_reply(user_input, outcome, regenerate, session_id, deadline, scan)
+
+    # Run up to the first token before committing to a 200, so a full Ollama queue can still get a 429
+    reply_parts = []
+    error = None
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = None
+    except QueueFull as e:
+        return await overloaded(send, request, e, request_id)
+    except Exception as e:
+        first_chunk, error = None, e
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream; charset=utf-8'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+        *session_headers(request),
+    ]})
+    try:
+        if error:
+            raise error
+        if first_chunk is not None:
+            reply_parts.append(first_chunk)
+            await send_body(send, chatbot.sse_event({'token': first_chunk}), more=True)
+            async for chunk in chunks:
+                reply_parts.append(chunk)
+                await send_body(send, chatbot.sse_event({'token': chunk}), more=True)
+    except Exception as e:
+        log_event('chat_error', level='error', request_id=request_id, stream=True,
+                  error=str(e), error_type=type(e).__name__)
+        if not reply_parts:
+            outcome['provider'] = 'fallback'
+            fallback = await session_call(chatbot.get_intelligent_fallback, user_input, session_id, scan)
+            reply_parts.append(fallback)
+            await send_body(send, chatbot.sse_event({'token': fallback}), more=True)
+
+    done = await session_call(chatbot.streamed_reply, request_id, session_id, ''.join(reply_parts), outcome, started)
+    await send_body(send, chatbot.sse_event(done, event='done'))
+
+async def overloaded(send, request, error, request_id=None):
+    """429 for a message that only Ollama could answer while its queue is full"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    log_event('chat_overloaded', level='warning', request_id=request_id, retry_after=retry_after)
+    await respond(send, request, {'error': "Cloudy is busy right now, please try again shortly.",
+                                  'retry_after': retry_after},
+                  status=429, headers=[(b'retry-after', str(retry_after).encode())])
+
+# 🔹 HTTP plumbing: requests, responses and Flask-compatible session cookies
+
+class Request:
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.session = load_session(self.headers.get('cookie', ''))
+        self.session_modified = False
+
+    async def body(self):
+        chunks = []
+        while True:
+            message = await self.receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    async def json(self):
+        return json.loads(await self.body() or b'null')
+
+    def new_session_id(self):
+        self.session['session_id'] = os.urandom(16).hex()
+        self.session_modified = True
+
+def load_session(cookie_header):
+    """The session dict from Flask's signed session cookie (empty if missing or tampered with)"""
+    value = parse_cookie(cookie_header).get(chatbot.app.config['SESSION_COOKIE_NAME'])
+    if not value:
+        return {}
+    serializer = chatbot.app.session_interface.get_signing_serializer(chatbot.app)
+    try:
+        return serializer.loads(value, max_age=int(chatbot.app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+def session_cookie(session):
+    """Set-Cookie value for session, signed and attributed exactly like Flask's"""
+    interface = chatbot.app.session_interface
+    app = chatbot.app
+    return dump_cookie(
+        interface.get_cookie_name(app),
+        interface.get_signing_serializer(app).dumps(dict(session)),
+        httponly=interface.get_cookie_httponly(app),
+        domain=interface.get_cookie_domain(app),
+        path=interface.get_cookie_path(app),
+        secure=interface.get_cookie_secure(app),
+        samesite=interface.get_cookie_samesite(app)
+    )
+
+async def send_body(send, text, more=False):
+    await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': more})
+
+def session_headers(request):
+    """Set-Cookie (and Vary) headers if the request changed its session"""
+    if request is None or not request.session_modified:
+        return []
+    return [(b'set-cookie', session_cookie(request.session).encode('latin-1')), (b'vary', b'Cookie')]
+
+async def respond(send, request, body, status=200, content_type='application/json', headers=()):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    headers = [(b'content-type', content_type.encode('latin-1')), (b'content-length', str(len(body)).encode()),
+               *headers]
+    headers.extend(session_headers(request))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+@functools.lru_cache(maxsize=None)
+def index_page():
+    # The template only needs url_for, so it is rendered once
+    with chatbot.app.test_request_context('/'):
+        return render_template('index.html').encode('utf-8')
+
+# 🔹 Routes
+
+async def home(request, send):
+    if 'session_id' not in request.session:
+        request.new_session_id()
+    await respond(send, request, index_page(), content_type='text/html; charset=utf-8')
+
+def instrumented(handler):
+    """Count a chat route's requests by reply mode and status, track how many are in flight, and
+    trace it (the Server-Timing header goes out with the response start)"""
+    @functools.wraps(handler)
+    async def route(request, send):
+        mode = 'stream' if 'text/event-stream' in request.headers.get('accept', '') else 'json'
+        status = 500
+        trace = chatbot.tracer.start(f"{request.method} {request.path}", request.headers.get('traceparent'),
+                                     mode=mode)
+
+        async def counted_send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if trace and chatbot.tracer.server_timing:
+                    message = dict(message, headers=list(message.get('headers', [])) + [
+                        (b'server-timing', trace.server_timing().encode('latin-1'))])
+            await send(message)
+
+        try:
+            with metrics.requests_in_flight.track(mode):
+                await handler(request, counted_send)
+        finally:
+            metrics.request_count.inc(mode, str(status))
+            if trace:
+                trace.root.set(status=status)
+                trace.finish()
+    return route
+
+@instrumented
+async def get(request, send):
+    try:
+        data = await request.json()
+        user_input = data['message']
+    except (ValueError, TypeError, KeyError):
+        return await respond(send, request, {'error': 'Expected a JSON body with a message'}, status=400)
+    regenerate = bool(data.get('regenerate'))
+    if 'session_id' not in request.session:
+        request.new_session_id()  # Never share history (and prompt context) between cookieless clients
+    session_id = request.session['session_id']
+
+    request_id = uuid.uuid4().hex[:12]
+    streaming = 'text/event-stream' in request.headers.get('accept', '')
+    deadline = chatbot.request_deadline('stream' if streaming else 'get', request.headers.get('x-request-deadline'))
+    log_event('chat_request', request_id=request_id, session=session_id, input=user_input[:200],
+              regenerate=regenerate, stream=streaming, deadline=deadline.budget, server='asgi')
+
+    await session_call(chatbot.add_to_history, session_id, 'user', user_input)
+
+    if streaming:
+        return await stream_chatbot_response(send, request, user_input, session_id, regenerate, request_id,
+                                             deadline)
+    try:
+        body = await chatbot_response(user_input, session_id, regenerate, request_id, deadline)
+    except QueueFull as e:
+        return await overloaded(send, request, e, request_id)
+    await respond(send, request, body)
+
+async def new_chat(request, send):
+    old_session_id = request.session.get('session_id')
+    if old_session_id:
+        await session_call(chatbot.end_chat, old_session_id)
+    request.new_session_id()
+    await respond(send, request, {'success': True, 'message': 'New chat started!'})
+
+async def provider_stats(request, send):
+    await respond(send, request, await session_call(chatbot.collect_provider_stats))
+
+async def session_stats(request, send):
+    query = parse_qs(request.scope.get('query_string', b'').decode('latin-1'))
+    stats = await session_call(chatbot.collect_session_stats, request.session.get('session_id'),
+                               int(query.get('top', [20])[0]))
+    await respond(send, request, stats)
+
+async def routing_stats(request, send):
+    query = parse_qs(request.scope.get('query_string', b'').decode('latin-1'))
+    await respond(send, request, chatbot.router.stats(int(query.get('recent', [20])[0])))
+
+async def metrics_page(request, send):
+    await respond(send, request, metrics.registry.render().encode('utf-8'), content_type=metrics.CONTENT_TYPE)
+
+async def static_file(request, send):
+    path = safe_join(chatbot.app.static_folder, request.path[len('/static/'):])
+    if path is None or not os.path.isfile(path):
+        return await respond(send, request, {'error': 'Not found'}, status=404)
+    body = await asyncio.to_thread(_read_file, path)
+    await respond(send, request, body, content_type=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+ROUTES = {
+    ('GET', '/'): home,
+    ('POST', '/get'): get,
+    ('POST', '/new-chat'): new_chat,
+    ('GET', '/stats/providers'): provider_stats,
+    ('GET', '/stats/sessions'): session_stats,
+    ('GET', '/stats/routing'): routing_stats,
+    ('GET', '/metrics'): metrics_page,
+}
+
+async def app(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    clients.start()  # For servers that don't send lifespan events
+    request = Request(scope, receive)
+    handler = ROUTES.get((request.method, request.path))
+    if handler is None and request.method == 'GET' and request.path.startswith('/static/'):
+        handler = static_file
+    if handler is None:
+        status = 405 if any(path == request.path for _, path in ROUTES) else 404
+        return await respond(send, None, {'error': 'Not found' if status == 404 else 'Method not allowed'},
+                             status=status)
+    await handler(request, send)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            clients.start()
+            if chatbot.PROVIDER_WARM_UP:
+                clients.providers.warm_up(delay=chatbot.PROVIDER_WARM_UP_DELAY)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await clients.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
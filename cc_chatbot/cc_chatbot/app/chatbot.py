@@ -1,70 +1,208 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context, g
 from dotenv import load_dotenv
 import os
+import asyncio
 import requests
 import json
 import random
-from datetime import datetime
+import sys
+import threading
+import time
+import atexit
+import functools
+import inspect
+import itertools
+import math
+import uuid
+
+# Make sibling modules importable both as `python app/chatbot.py` and `app.chatbot:app`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import event_log
+from event_log import log_event
+from provider_race import call_providers, race_stats
+from admission import AdmissionController, AdmissionRejected, QueueFull, QueueTimeout
+from deadline import Deadline, NO_DEADLINE, current_deadline
+from http_clients import PoolSettings, ProviderClients, httpx_client, requests_session
+import metrics
+from metrics import record_attempt, timed_provider
+from tracing import Tracer, TraceExporter, add_span, span, traced
+from rules import keyword_rules
+from ollama_supervisor import OllamaSupervisor
+from providers import ProviderRegistry, installed
+from routing import Router, RoutingPolicy, parse_weights
+from ollama_context import OllamaContextCache
+from circuit_breaker import CircuitBreaker, OPEN, classify_failure, guarded_stream
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from session_store import create_session_store
+from conversation_context import ContextBuilder, EMPTY_CONTEXT, count_tokens, extractive_summary
+from intent_classifier import IntentClassifier
+from text_embedding import NUMPY_AVAILABLE
 
 # Optional: Try to import web search libraries
-try:
-    from duckduckgo_search import DDGS
-    WEB_SEARCH_AVAILABLE = True
-except ImportError:
-    WEB_SEARCH_AVAILABLE = False
-
-try:
-    from bs4 import BeautifulSoup
-    BS4_AVAILABLE = True
-except ImportError:
-    BS4_AVAILABLE = False
-
-# Optional: Try to import AI libraries, but don't crash if not installed
-try:
-    import ollama
-    OLLAMA_AVAILABLE = True
-except ImportError:
-    OLLAMA_AVAILABLE = False
-
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
-
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+from web_search import WebSearcher, WEB_SEARCH_AVAILABLE, WEB_SEARCH_URL
+from web_pages import PageFetcher, BS4_AVAILABLE, excerpt
+from grounding import Grounding
+
+# Optional AI libraries: only looked up here; each is imported on first use (providers.py)
+OLLAMA_AVAILABLE = installed('ollama')
+OPENAI_AVAILABLE = installed('openai')
+GEMINI_AVAILABLE = installed('google.generativeai')
 
 # 🔹 Load .env from project root
 load_dotenv()  # Automatically picks up .env file
 
+# 🔹 Structured Logging
+# JSON lines written by a background thread; request threads never touch the file
+LOG_PATH = os.getenv("LOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'chatbot.jsonl'))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info").lower()
+event_logger = event_log.configure(
+    path=LOG_PATH,
+    min_level=LOG_LEVEL,
+    # Fraction of events kept per level, e.g. LOG_SAMPLE_DEBUG=0.1 keeps 10% of debug events
+    sample_rates={level: float(os.getenv(f"LOG_SAMPLE_{level.upper()}", "1.0")) for level in event_log.LEVELS},
+    max_bytes=int(float(os.getenv("LOG_MAX_MB", "10")) * 1024 * 1024),
+    backup_count=int(os.getenv("LOG_BACKUPS", "5")),
+    echo=os.getenv("LOG_ECHO", "false").lower() == "true"
+)
+
+# 🔹 Request Tracing
+# Each /get is timed stage by stage; the breakdown goes back in a Server-Timing header and,
+# with TRACE_EXPORT_PATH set, sampled traces are appended there as OTLP/JSON lines
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+trace_exporter = None
+if TRACE_EXPORT_PATH:
+    trace_exporter = TraceExporter(
+        path=TRACE_EXPORT_PATH,
+        max_bytes=int(float(os.getenv("TRACE_MAX_MB", "50")) * 1024 * 1024),
+        backup_count=int(os.getenv("TRACE_BACKUPS", "3"))
+    )
+    atexit.register(trace_exporter.close)
+tracer = Tracer(
+    server_timing=os.getenv("SERVER_TIMING", "true").lower() == "true",
+    exporter=trace_exporter,
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+)
+
+# 🔹 Outbound HTTP clients: one pooled keep-alive client per provider, opened here at startup
+# and closed at exit. Each provider reads {PREFIX}_HTTP_POOL_SIZE, _HTTP_KEEPALIVE,
+# _HTTP_KEEPALIVE_EXPIRY, _HTTP_CONNECT_TIMEOUT and _HTTP_READ_TIMEOUT (prefixes OLLAMA, OPENAI
+# and HF), falling back to the unprefixed HTTP_* settings, then to the defaults below.
+# Ollama's read timeout covers a whole non-streamed reply, so it is the longest.
+HTTP_SETTINGS = {
+    'Ollama': PoolSettings.from_env('OLLAMA', pool_size=8, keepalive=8, connect_timeout=2.0, read_timeout=120.0),
+    'OpenAI': PoolSettings.from_env('OPENAI', read_timeout=15.0),
+    'HuggingFace': PoolSettings.from_env('HF', read_timeout=10.0)
+}
+provider_clients = ProviderClients()
+atexit.register(provider_clients.close)
+
+hf_session = provider_clients.register('HuggingFace', HTTP_SETTINGS['HuggingFace'],
+                                       requests_session(HTTP_SETTINGS['HuggingFace']))
+
+# 🔹 AI provider SDKs: each is imported and set up when its provider is first used, so a
+# worker starts without paying for SDKs it may never call. With PROVIDER_WARM_UP the enabled
+# ones are loaded on a background thread PROVIDER_WARM_UP_DELAY seconds after start-up,
+# once the server is taking requests, so the first chats don't pay for the imports either.
+provider_registry = ProviderRegistry()
+PROVIDER_WARM_UP = os.getenv("PROVIDER_WARM_UP", "true").lower() == "true"
+PROVIDER_WARM_UP_DELAY = float(os.getenv("PROVIDER_WARM_UP_DELAY", "2.0"))
+
 # 🔹 Ollama Configuration
 OLLAMA_MODEL = "llama3.2:1b"  # Using 1B model for better compatibility with system memory
+OLLAMA_OPTIONS = {
+    'temperature': 0.8,  # Slightly more creative
+    'top_p': 0.9,
+    'num_predict': 1000,  # Longer responses for complete answers
+    'repeat_penalty': 1.1,  # Reduce repetition
+    'seed': -1,  # Random seed for variety
+    'num_ctx': 2048  # Limit context window to save memory
+}
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Keep the model resident between chats
+OLLAMA_PROBE_INTERVAL = float(os.getenv("OLLAMA_PROBE_INTERVAL", "15"))  # Seconds between health probes
+OLLAMA_SERVE_CMD = os.getenv("OLLAMA_SERVE_CMD")  # Defaults to `ollama serve` from PATH
+OLLAMA_AUTO_START = os.getenv("OLLAMA_AUTO_START", "true").lower() == "true"
+
+def make_ollama_client(ollama):
+    # OLLAMA_HOST, like the ollama module's default client, but with a sized pool and timeouts
+    client = ollama.Client(**HTTP_SETTINGS['Ollama'].httpx_options())
+    # ollama 0.3's Client has no close()
+    return provider_clients.register('Ollama', HTTP_SETTINGS['Ollama'], client, close=client._client.close)
+
+provider_registry.register('Ollama', 'ollama', make_ollama_client)
+
+# Background health probing, server start-up and model preloading (its first probe loads the client)
+ollama_supervisor = OllamaSupervisor(
+    OLLAMA_MODEL,
+    keep_alive=OLLAMA_KEEP_ALIVE,
+    probe_interval=OLLAMA_PROBE_INTERVAL,
+    serve_command=OLLAMA_SERVE_CMD,
+    auto_start=OLLAMA_AUTO_START,
+    client=functools.partial(provider_registry['Ollama'].get, loaded_by='supervisor')
+)
+if provider_registry['Ollama'].enabled:
+    ollama_supervisor.start()
+
+# 🔹 Ollama context reuse: keep the `context` tokens Ollama returns for each session so
+# follow-up turns only prefill the new message, not the system prompt and history again.
+# A context is dropped when less than OLLAMA_CONTEXT_RESERVE tokens of num_ctx would be
+# left for the reply, when the model changes, or when another provider answered a turn.
+OLLAMA_CONTEXT_REUSE = os.getenv("OLLAMA_CONTEXT_REUSE", "true").lower() == "true"
+if OLLAMA_CONTEXT_REUSE:
+    ollama_contexts = OllamaContextCache(
+        num_ctx=OLLAMA_OPTIONS['num_ctx'],
+        reserve=int(os.getenv("OLLAMA_CONTEXT_RESERVE", OLLAMA_OPTIONS['num_predict'] // 2)),
+        max_sessions=int(os.getenv("OLLAMA_CONTEXT_MAX_SESSIONS", "1000")),
+        ttl=float(os.getenv("OLLAMA_CONTEXT_TTL", "1800"))
+    )
+else:
+    ollama_contexts = None
+
+# 🔹 Ollama admission control: at most OLLAMA_NUM_PARALLEL calls (the setting `ollama serve`
+# runs with) reach Ollama at once. Up to OLLAMA_MAX_QUEUE more wait, served round-robin by
+# session with at most OLLAMA_QUEUE_PER_SESSION each. A call that waits OLLAMA_QUEUE_TIMEOUT
+# seconds spills over to the cloud providers or the rule-based fallback; when the queue is
+# full and no other provider answers, /get returns 429 with Retry-After.
+ollama_admission = AdmissionController(
+    'Ollama',
+    limit=int(os.getenv("OLLAMA_NUM_PARALLEL", "1")),
+    max_queue=int(os.getenv("OLLAMA_MAX_QUEUE", "8")),
+    per_session=int(os.getenv("OLLAMA_QUEUE_PER_SESSION", "2")),
+    queue_timeout=float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "5"))
+)
 
 # 🔹 OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")  # Default to gpt-4o-mini, can use gpt-4, gpt-3.5-turbo, etc.
 
-if OPENAI_AVAILABLE and OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-else:
-    openai_client = None
+def make_openai_client(openai):
+    # The SDK takes its timeouts from the pooled http_client (httpx ships with openai)
+    return provider_clients.register('OpenAI', HTTP_SETTINGS['OpenAI'], openai.OpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx_client(HTTP_SETTINGS['OpenAI'])
+    ))
+
+provider_registry.register('OpenAI', 'openai', make_openai_client, enabled=bool(OPENAI_API_KEY))
 
 # 🔹 Google Gemini Configuration
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")  # Default to gemini-pro
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")  # e.g. a local stand-in (fake_providers.py)
 
-if GEMINI_AVAILABLE and GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel(GEMINI_MODEL)
-else:
-    gemini_model = None
+def make_gemini_model(genai):
+    if GEMINI_API_ENDPOINT:
+        # A custom endpoint is reached over the REST transport (plain HTTP works there, not over gRPC)
+        genai.configure(api_key=GEMINI_API_KEY, transport='rest',
+                        client_options={'api_endpoint': GEMINI_API_ENDPOINT})
+    else:
+        genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL)
+
+provider_registry.register('Gemini', 'google.generativeai', make_gemini_model, enabled=bool(GEMINI_API_KEY))
 
 # 🔹 Hugging Face API Configuration (as fallback)
-HF_API_URL = "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium"
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co/models/microsoft/DialoGPT-medium")
 HF_API_KEY = os.getenv("HUGGING_FACE_API_KEY")
 
 # 🔹 Headers for Hugging Face API
@@ -72,15 +210,360 @@ headers = {
     "Authorization": f"Bearer {HF_API_KEY}" if HF_API_KEY else None
 }
 
+# 🔹 Circuit breakers: after BREAKER_FAILURE_THRESHOLD consecutive failures (or one
+# auth/quota error) a provider is skipped for a backoff window, then probed again
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+circuit_breakers = {
+    name: CircuitBreaker(name, failure_threshold=BREAKER_FAILURE_THRESHOLD)
+    for name in ('Ollama', 'OpenAI', 'Gemini', 'HuggingFace')
+}
+
+def record_provider_failure(breaker, error=None, **kwargs):
+    """breaker.record_failure(...), unless the request's deadline has run out: the provider
+    chain already counted the attempt as a timeout when it stopped waiting for it"""
+    if current_deadline().expired():
+        return classify_failure(error, kwargs.get('status_code'))
+    return breaker.record_failure(error, **kwargs)
+
+def provider_failed(name, error=None, status_code=None, headers=None, **fields):
+    """Report a failed call to name's breaker and log it (sync and async providers); returns None"""
+    kind = record_provider_failure(circuit_breakers[name], error, status_code=status_code, headers=headers)
+    if error is not None:
+        fields.update(error=str(error), error_type=type(error).__name__)
+    if status_code is not None:
+        fields['status'] = status_code
+    log_event('provider_error', level='warning', provider=name, kind=kind, **fields)
+    return None
+
+# 🔹 Provider chain mode: 'serial' (one after another), 'hedge' (start the next
+# provider if the current one hasn't answered after HEDGE_DELAY seconds) or
+# 'race' (ask all configured providers at once, first good reply wins)
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "serial")
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "2.0"))
+
+# 🔹 Adaptive routing: with ROUTING_POLICY=adaptive each request tries the providers in
+# the order that minimises its expected wait for a reply, from EWMA latency and success
+# rates per provider and model (ROUTING_ALPHA, fading back to the priors with
+# ROUTING_HALF_LIFE seconds) plus Ollama's current queue wait. PROVIDER_COSTS (cents per
+# reply) are charged at ROUTING_COST_WEIGHT seconds per cent; providers below
+# ROUTING_MIN_QUALITY (PROVIDER_QUALITY, 0-1) or above ROUTING_MAX_COST cents, disabled
+# ones and ones whose breaker is open go last. ROUTING_POLICY=fixed keeps the order above.
+routing_policy = RoutingPolicy(
+    costs=parse_weights(os.getenv("PROVIDER_COSTS", "OpenAI=0.05,Gemini=0.03")),
+    quality=parse_weights(os.getenv("PROVIDER_QUALITY", "Ollama=0.6,OpenAI=0.9,Gemini=0.85,HuggingFace=0.3")),
+    cost_weight=float(os.getenv("ROUTING_COST_WEIGHT", "10")),
+    min_quality=float(os.getenv("ROUTING_MIN_QUALITY", "0.5")),
+    max_cost=float(os.getenv("ROUTING_MAX_COST")) if os.getenv("ROUTING_MAX_COST") else None
+)
+
+def provider_available(name):
+    """Whether name is configured and its circuit breaker isn't open"""
+    if name == 'HuggingFace':
+        configured = bool(HF_API_KEY)
+    else:
+        configured = provider_registry[name].enabled
+    return configured and circuit_breakers[name].snapshot()['state'] != OPEN
+
+router = Router(
+    policy=routing_policy,
+    mode=os.getenv("ROUTING_POLICY", "adaptive"),
+    models={'Ollama': OLLAMA_MODEL, 'OpenAI': OPENAI_MODEL, 'Gemini': GEMINI_MODEL, 'HuggingFace': HF_API_URL},
+    alpha=float(os.getenv("ROUTING_ALPHA", "0.2")),
+    half_life=float(os.getenv("ROUTING_HALF_LIFE", "60")),
+    load={'Ollama': ollama_admission.expected_wait},
+    available=provider_available
+)
+
+# 🔹 Request deadlines: each /get has one time budget that web search, every provider
+# attempt (retries included) and the wait for an Ollama slot draw down from. The budget
+# is per route: REQUEST_DEADLINE for a JSON reply, STREAM_DEADLINE for a streamed one
+# (a stream that runs past it is cut off). A client can ask for its own with an X-Request-Deadline header
+# (seconds, at most REQUEST_DEADLINE_MAX). Once less than PROVIDER_MIN_BUDGET seconds
+# are left, the remaining providers are skipped and the rule-based fallback answers.
+ROUTE_DEADLINES = {
+    'get': float(os.getenv("REQUEST_DEADLINE", "20")),
+    'stream': float(os.getenv("STREAM_DEADLINE", "20"))
+}
+REQUEST_DEADLINE_MAX = float(os.getenv("REQUEST_DEADLINE_MAX", "60"))
+PROVIDER_MIN_BUDGET = float(os.getenv("PROVIDER_MIN_BUDGET", "1.0"))
+
+def request_deadline(route, requested=None):
+    """The Deadline of a request to route: the client's X-Request-Deadline if valid, else the route's"""
+    budget = ROUTE_DEADLINES[route]
+    if requested:
+        try:
+            value = float(requested)
+            if not math.isfinite(value):
+                raise ValueError(requested)
+            budget = min(max(value, 0.0), REQUEST_DEADLINE_MAX)
+        except ValueError:
+            log_event('deadline_header_invalid', level='debug', value=requested[:50])
+    return Deadline(budget)
+
+# 🔹 Response cache for repeated questions (exact match after normalization)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+response_cache = ResponseCache(
+    max_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "16")) * 1024 * 1024),
+    max_entry_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_ENTRY_KB", "64")) * 1024),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+)
+
+# 🔹 Semantic cache: reuse replies for differently worded versions of the same
+# question (same question kind and content words, see benchmark_semantic_cache.py)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_PATH = os.getenv(
+    "SEMANTIC_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'semantic_cache')
+)
+SEMANTIC_CACHE_SAVE_INTERVAL = float(os.getenv("SEMANTIC_CACHE_SAVE_INTERVAL", "60"))
+
+if SEMANTIC_CACHE_ENABLED:
+    semantic_cache = SemanticCache(
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+        path=SEMANTIC_CACHE_PATH
+    )
+    semantic_cache.load()
+    
+    def _save_semantic_cache_periodically():
+        while True:
+            time.sleep(SEMANTIC_CACHE_SAVE_INTERVAL)
+            try:
+                semantic_cache.save()
+            except OSError as e:
+                log_event('semantic_cache_save_failed', level='warning', error=str(e))
+    
+    threading.Thread(target=_save_semantic_cache_periodically, name='semantic-cache-saver', daemon=True).start()
+    atexit.register(semantic_cache.save)
+else:
+    semantic_cache = None
+
+# 🔹 Intent classifier: messages that clearly match an intent in intent_data.json
+# (or other intent files/directories listed in INTENT_FILES) are answered instantly
+INTENT_ENABLED = os.getenv("INTENT_ENABLED", "true").lower() == "true"
+INTENT_FILES = os.getenv(
+    "INTENT_FILES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_data.json')
+).split(os.pathsep)
+INTENT_THRESHOLD = float(os.getenv("INTENT_THRESHOLD", "0.8"))
+INTENT_CACHE_PATH = os.getenv(
+    "INTENT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'cache', 'intents.npz')
+)
+
+if INTENT_ENABLED and NUMPY_AVAILABLE:
+    intent_classifier = IntentClassifier(
+        INTENT_FILES,
+        threshold=INTENT_THRESHOLD,
+        min_margin=float(os.getenv("INTENT_MIN_MARGIN", "0.05")),
+        cache_path=INTENT_CACHE_PATH
+    )
+else:
+    intent_classifier = None
+
+# 🔹 Web search (DuckDuckGo, or the SearxNG-style WEB_SEARCH_URL): cached per normalized
+# query, identical concurrent queries share one upstream call, and every search has a hard deadline
+web_searcher = WebSearcher(
+    backend_url=WEB_SEARCH_URL,
+    max_results=5,
+    deadline=float(os.getenv("WEB_SEARCH_DEADLINE", "6")),
+    ttl=float(os.getenv("WEB_SEARCH_CACHE_TTL", "3600")),
+    time_sensitive_ttl=float(os.getenv("WEB_SEARCH_NEWS_TTL", "120")),
+    workers=int(os.getenv("WEB_SEARCH_WORKERS", "4"))
+)
+
+# 🔹 Web page enrichment (WEB_PAGE_ENRICH=true, needs BeautifulSoup): the top WEB_PAGE_COUNT
+# result pages are fetched at once and their main text quoted instead of the search snippet.
+# All of it takes at most WEB_PAGE_BUDGET seconds (pages still loading are left out), each
+# page at most WEB_PAGE_TIMEOUT seconds and WEB_PAGE_MAX_KB. Extracted text is cached by URL
+# for WEB_PAGE_CACHE_TTL seconds, then revalidated with the page's ETag/Last-Modified.
+if BS4_AVAILABLE and os.getenv("WEB_PAGE_ENRICH", "false").lower() == "true":
+    page_fetcher = PageFetcher(
+        pages=int(os.getenv("WEB_PAGE_COUNT", "3")),
+        budget=float(os.getenv("WEB_PAGE_BUDGET", "2.0")),
+        page_timeout=float(os.getenv("WEB_PAGE_TIMEOUT", "1.5")),
+        max_bytes=int(os.getenv("WEB_PAGE_MAX_KB", "512")) * 1024,
+        ttl=float(os.getenv("WEB_PAGE_CACHE_TTL", "600")),
+        workers=int(os.getenv("WEB_PAGE_WORKERS", "6"))
+    )
+    atexit.register(page_fetcher.close)
+else:
+    page_fetcher = None
+WEB_PAGE_EXCERPT = int(os.getenv("WEB_PAGE_EXCERPT", "500"))  # Characters quoted from each page
+
+# 🔹 Speculative web search: with WEB_SEARCH_MODE=speculative (the default) a question that
+# wants current information starts its web search in the background and goes straight on to
+# the AI providers, instead of waiting for the search first (WEB_SEARCH_MODE=sequential).
+# Providers that take the results into their prompt hold their call until WEB_GROUNDING_WAIT
+# seconds after the search started (less if the results come in sooner), then put the top
+# WEB_GROUNDING_RESULTS results that are in into their prompt; the others start right away.
+# If no provider answers, the search results are the reply.
+WEB_SEARCH_MODE = os.getenv("WEB_SEARCH_MODE", "speculative")
+WEB_GROUNDING_WAIT = float(os.getenv("WEB_GROUNDING_WAIT", "1.5"))
+WEB_GROUNDING_RESULTS = int(os.getenv("WEB_GROUNDING_RESULTS", "3"))
+
+# 🔹 Shared Cloudy personality prompt (used by Ollama and OpenAI)
+CLOUDY_SYSTEM_PROMPT = """You are Cloudy, a friendly, intelligent, and engaging cloud-themed chatbot assistant. You should:
+        - Always respond as "Cloudy ☁️:" followed by your message
+        - Be helpful, friendly, conversational, and enthusiastic
+        - Provide detailed, well-structured, and informative responses
+        - Use clear formatting with bullet points or numbered lists when appropriate
+        - Include relevant examples and practical insights
+        - Remember context from the conversation when possible
+        - If someone tells you their name, remember it and use it in future responses
+        - Be knowledgeable about cloud computing, technology, science, and general topics
+        - Provide comprehensive answers (2-4 sentences minimum, can be longer for complex topics)
+        - Use cloud and weather emojis occasionally ☁️ ⛅ 🌤️ 💨 🌩️
+        - Format code examples with proper syntax highlighting when needed
+        - Ask follow-up questions to clarify or deepen understanding
+        """
+
+CLOUDY_PREFIX = "Cloudy ☁️:"
+
 # 🔹 Flask App
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'cloudy-ai-secret-key-change-in-production')
 
-# 🔹 Chat sessions storage (in production, use a database)
-chat_sessions = {}
+# 🔹 Chat sessions: history and per-session memory (the user's name) live in
+# SESSION_BACKEND: memory:// (default), sqlite:///path/sessions.db for restarts
+# and several workers on one machine, or redis://host:port/db to share across nodes.
+# Bounded by SESSION_MAX sessions (LRU), SESSION_IDLE_TTL and SESSION_MAX_MESSAGES.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory://")
+chat_sessions = create_session_store(
+    SESSION_BACKEND,
+    max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+    max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "200")),
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "7200")),
+    stripes=int(os.getenv("SESSION_STRIPES", "16")),
+    sweep_interval=float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+)
+chat_sessions.start_sweeper()
+atexit.register(chat_sessions.close)
+
+# 🔹 Conversation context: each provider gets the newest turns that fit its prompt
+# budget (tokens, including the system prompt and the message); older turns are
+# folded into a rolling summary in the background. Ollama's budget is what num_ctx
+# leaves after reserving room for the reply.
+CONTEXT_ENABLED = os.getenv("CONTEXT_ENABLED", "true").lower() == "true"
+CONTEXT_BUDGETS = {
+    'Ollama': int(os.getenv("CONTEXT_BUDGET_OLLAMA", OLLAMA_OPTIONS['num_ctx'] - OLLAMA_OPTIONS['num_predict'])),
+    'OpenAI': int(os.getenv("CONTEXT_BUDGET_OPENAI", "3000")),
+    'Gemini': int(os.getenv("CONTEXT_BUDGET_GEMINI", "3000")),
+}
+SYSTEM_PROMPT_TOKENS = count_tokens(CLOUDY_SYSTEM_PROMPT)
+
+def summarize_conversation(previous, messages, max_tokens):
+    """Rolling summary of older turns (runs in the background): Ollama if it's up, else extractive"""
+    if check_ollama_service():
+        transcript = '\n'.join(
+            f"{'User' if m.role == 'user' else 'Cloudy'}: {m.content[:600]}" for m in messages)
+        prompt = (f"Summarize this conversation between a user and the assistant Cloudy in at most "
+                  f"{max_tokens // 2} words. Keep names, facts and open questions.\n\n"
+                  + (f"Earlier summary:\n{previous}\n\n" if previous else '')
+                  + f"Conversation:\n{transcript}\n\nSummary:")
+        try:
+            # Summaries queue for Ollama like one more session, so they never crowd out chats
+            with ollama_admission.slot('background-summaries'):
+                response = provider_registry.get('Ollama').generate(
+                    model=OLLAMA_MODEL,
+                    prompt=prompt,
+                    options={'temperature': 0.2, 'num_predict': max_tokens, 'num_ctx': OLLAMA_OPTIONS['num_ctx']},
+                    keep_alive=OLLAMA_KEEP_ALIVE
+                )
+            summary = response.get('response', '').strip()
+            if summary:
+                return summary
+        except AdmissionRejected:
+            pass  # Ollama is busy with chats: summarize extractively
+        except Exception as e:
+            log_event('context_summary_llm_failed', level='warning', error=str(e))
+    return extractive_summary(previous, messages, max_tokens)
+
+if CONTEXT_ENABLED:
+    context_builder = ContextBuilder(
+        chat_sessions,
+        summarize=summarize_conversation,
+        history_limit=int(os.getenv("CONTEXT_HISTORY_LIMIT", "40")),
+        keep_recent=int(os.getenv("CONTEXT_KEEP_RECENT", "6")),
+        summarize_after=int(os.getenv("CONTEXT_SUMMARIZE_AFTER", "12")),
+        summarize_over_tokens=int(os.getenv("CONTEXT_SUMMARIZE_OVER_TOKENS", "600")),
+        summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200"))
+    )
+else:
+    context_builder = None
+
+# 🔹 Metrics (/metrics): request and provider metrics are recorded as they happen
+# (metrics.py); these are read from the stores and caches at scrape time
+def cache_stats():
+    """(hits, lookups) of each cache in front of the providers"""
+    search = web_searcher.stats()
+    caches = {
+        'response': response_cache.stats(),
+        'semantic': semantic_cache.stats() if semantic_cache else None,
+        'intent': intent_classifier.stats() if intent_classifier else None,
+    }
+    totals = {name: (stats['hits'], stats['hits'] + stats['misses']) for name, stats in caches.items() if stats}
+    totals['web_search'] = (search['cache_hits'], search['searches'])
+    return totals
+
+metrics.registry.callback('cache_hit_ratio', "Share of lookups answered by each cache",
+                          lambda: {name: hits / lookups if lookups else 0.0
+                                   for name, (hits, lookups) in cache_stats().items()}, ('cache',))
+metrics.registry.callback('cache_lookups_total', "Lookups of each cache by result",
+                          lambda: {(name, result): count for name, (hits, lookups) in cache_stats().items()
+                                   for result, count in (('hit', hits), ('miss', lookups - hits))},
+                          ('cache', 'result'), type='counter')
+metrics.registry.callback('sessions', "Chat sessions held by the session store",
+                          lambda: chat_sessions.stats().get('sessions'))
+metrics.registry.callback('session_messages', "Messages held by the session store",
+                          lambda: chat_sessions.stats().get('messages'))
+metrics.registry.callback('ollama_slots_in_use', "Ollama requests running under admission control",
+                          lambda: ollama_admission.stats()['active'])
+metrics.registry.callback('ollama_queue_length', "Requests waiting for an Ollama slot",
+                          lambda: ollama_admission.stats()['waiting'])
+
+def reply_mode():
+    """'stream' for clients that accept Server-Sent Events, else 'json'"""
+    return 'stream' if 'text/event-stream' in request.headers.get('Accept', '') else 'json'
 
-# 🔹 Simple memory for user's name (in production, use a database)
-user_memory = {}
+@app.before_request
+def track_chat_request():
+    if request.path == '/get':
+        mode = reply_mode()
+        metrics.requests_in_flight.inc(mode)
+        g.trace = tracer.start('POST /get', request.headers.get('traceparent'), mode=mode)
+
+@app.after_request
+def count_chat_request(response):
+    if request.path == '/get':
+        mode = reply_mode()
+        metrics.request_count.inc(mode, str(response.status_code))
+        trace = g.pop('trace', None)
+        if trace:
+            trace.root.set(status=response.status_code)
+            if tracer.server_timing:
+                # Stages up to now: for a streamed reply, everything before the first token
+                response.headers['Server-Timing'] = trace.server_timing()
+            trace.detach()
+        
+        # Once the body is sent: a streamed reply is still in flight after this returns
+        def finish():
+            metrics.requests_in_flight.dec(mode)
+            if trace:
+                trace.finish()
+        response.call_on_close(finish)
+    return response
+
+@traced('context')
+def get_conversation_context(session_id, user_input):
+    """History for the LLM prompts of this message (EMPTY_CONTEXT when disabled)"""
+    if not context_builder:
+        return EMPTY_CONTEXT
+    return context_builder.for_request(session_id, user_input)
+
+def history_budget(provider, context):
+    """Tokens left for history in the provider's prompt budget"""
+    return CONTEXT_BUDGETS[provider] - SYSTEM_PROMPT_TOKENS - context.input_tokens
 
 @app.route('/')
 def home():
@@ -92,386 +575,430 @@ def home():
 @app.route('/new-chat', methods=['POST'])
 def new_chat():
     """Create a new chat session"""
-    # Generate new session ID
+    # Drop the old session's history, then generate a new session ID
+    old_session_id = session.get('session_id')
+    if old_session_id:
+        end_chat(old_session_id)
     session['session_id'] = os.urandom(16).hex()
     
-    # Clear user memory for this session
-    session_id = session['session_id']
-    if session_id in chat_sessions:
-        chat_sessions[session_id] = []
-    
     return jsonify({'success': True, 'message': 'New chat started!'})
 
+def end_chat(session_id):
+    """Forget a session's history, memory and cached Ollama context"""
+    chat_sessions.delete(session_id)
+    if ollama_contexts:
+        ollama_contexts.invalidate(session_id)
+
+@app.route('/stats/providers')
+def provider_stats():
+    """Recent provider outcomes (winners, attempt timings) for tuning HEDGE_DELAY"""
+    return jsonify(collect_provider_stats())
+
+@app.route('/stats/sessions')
+def session_stats():
+    """Session store totals and the largest sessions by approximate memory use"""
+    return jsonify(collect_session_stats(session.get('session_id'), int(request.args.get('top', 20))))
+
+@app.route('/stats/routing')
+def routing_stats():
+    """The router's per-provider estimates and its recent ordering decisions, with their scores"""
+    return jsonify(router.stats(int(request.args.get('recent', 20))))
+
+@app.route('/metrics')
+def metrics_page():
+    """Prometheus-style metrics"""
+    return Response(metrics.registry.render(), mimetype=metrics.CONTENT_TYPE)
+
+def collect_provider_stats():
+    return {
+        'mode': PROVIDER_MODE,
+        'hedge_delay': HEDGE_DELAY,
+        'routing': router.mode,
+        'race': race_stats(),
+        'ollama': ollama_supervisor.status(),
+        'ollama_context': ollama_contexts.stats() if ollama_contexts else None,
+        'ollama_admission': ollama_admission.stats(),
+        'circuit_breakers': {name: breaker.snapshot() for name, breaker in circuit_breakers.items()},
+        'response_cache': response_cache.stats(),
+        'semantic_cache': semantic_cache.stats() if semantic_cache else None,
+        'intents': intent_classifier.stats() if intent_classifier else None,
+        'web_search': web_searcher.stats(),
+        'web_pages': page_fetcher.stats() if page_fetcher else None,
+        'http_clients': provider_clients.stats(),
+        'sdks': provider_registry.stats(),
+        'sessions': chat_sessions.stats(),
+        'context': context_builder.stats() if context_builder else None,
+        'event_log': event_logger.stats()
+    }
+
+def collect_session_stats(session_id, top=20):
+    return {
+        **chat_sessions.stats(),
+        'current_session_bytes': chat_sessions.session_size(session_id) if session_id else None,
+        'largest': chat_sessions.memory_report(top=top)
+    }
+
+@traced('history')
+def add_to_history(session_id, role, content, provider=None):
+    """Append a message to the session's chat history"""
+    chat_sessions.append(session_id, role, content, provider=provider)
+
 @app.route('/get', methods=['POST'])
 def chatbot_response():
     user_input = request.json['message']
-    session_id = session.get('session_id', 'default')
+    regenerate = bool(request.json.get('regenerate'))
+    if 'session_id' not in session:
+        # Never share history (and prompt context) between cookieless clients
+        session['session_id'] = os.urandom(16).hex()
+    session_id = session['session_id']
     
-    # Debug logging
-    with open('debug.log', 'a') as f:
-        f.write(f"\n{'='*60}\n")
-        f.write(f"Input: {user_input}\n")
-        f.write(f"Session: {session_id}\n")
+    request_id = uuid.uuid4().hex[:12]
+    streaming = reply_mode() == 'stream'
+    deadline = request_deadline('stream' if streaming else 'get', request.headers.get('X-Request-Deadline'))
+    log_event('chat_request', request_id=request_id, session=session_id,
+              input=user_input[:200], regenerate=regenerate, stream=streaming, deadline=deadline.budget)
     
     # Store message in session history
-    if session_id not in chat_sessions:
-        chat_sessions[session_id] = []
+    add_to_history(session_id, 'user', user_input)
     
-    chat_sessions[session_id].append({
-        'role': 'user',
-        'content': user_input,
-        'timestamp': datetime.now().isoformat()
-    })
+    # Clients that accept Server-Sent Events get tokens as they are generated
+    if streaming:
+        return stream_chatbot_response(user_input, session_id, regenerate, request_id, deadline)
     
+    started = time.perf_counter()
+    scan = keyword_rules.scan(user_input)  # Tokenized once for every keyword rule check below
     try:
-        # Check if user is asking for current/real-time information
-        needs_web_search = should_use_web_search(user_input)
-        
-        with open('debug.log', 'a') as f:
-            f.write(f"Web search needed: {needs_web_search}\n")
-            f.write(f"Web search available: {WEB_SEARCH_AVAILABLE}\n")
+        # High-confidence intents are answered instantly, without any LLM
+        reply = get_intent_reply(user_input, regenerate, session_id, scan)
+        if reply:
+            return jsonify(record_reply(request_id, session_id, 'intent', reply, started))
         
-        if needs_web_search and WEB_SEARCH_AVAILABLE:
+        # Check if user is asking for current/real-time information
+        grounding = None
+        search = web_search_plan(user_input, scan, deadline)
+        if search == 'speculative':
+            # Search in the background; the providers use the results if they come in time
+            grounding = start_grounding(user_input, deadline)
+        elif search:
             # Try web search first for current information
-            with open('debug.log', 'a') as f:
-                f.write("Attempting web search...\n")
-            
-            reply = get_web_search_response(user_input)
-            
-            with open('debug.log', 'a') as f:
-                f.write(f"Web search result: {reply[:100] if reply else 'None'}\n")
-            
+            reply = get_web_search_response(user_input, deadline)
             if reply:
-                chat_sessions[session_id].append({
-                    'role': 'assistant',
-                    'content': reply,
-                    'timestamp': datetime.now().isoformat()
-                })
-                return jsonify({'reply': reply})
-        # Try Ollama first (local AI model)
-        print("Attempting Ollama...")
-        reply = get_ollama_response(user_input)
-        if reply:
-            print(f"Ollama succeeded: {reply[:50]}...")
-            return jsonify({'reply': reply})
-        else:
-            print("Ollama failed or returned None")
+                return jsonify(record_reply(request_id, session_id, 'web_search', reply, started))
         
-        # Try OpenAI GPT as second option (if API key is available)
-        print("Attempting OpenAI...")
-        reply = get_openai_response(user_input)
-        if reply:
-            print(f"OpenAI succeeded: {reply[:50]}...")
-            return jsonify({'reply': reply})
-        else:
-            print("OpenAI failed or returned None")
+        context, cached = prepare_providers(user_input, session_id, regenerate, grounding)
+        if cached:
+            provider, reply = cached
+            return jsonify(record_reply(request_id, session_id, provider, reply, started, cached=True))
         
-        # Try Google Gemini AI as third option (if API key is available)
-        print("Attempting Gemini...")
-        reply = get_gemini_response(user_input)
-        if reply:
-            print(f"Gemini succeeded: {reply[:50]}...")
-            return jsonify({'reply': reply})
-        else:
-            print("Gemini failed or returned None")
-        
-        # Try Hugging Face API as fallback (if API key is available)
-        if HF_API_KEY:
-            payload = {
-                "inputs": user_input,
-                "parameters": {
-                    "max_length": 500,
-                    "temperature": 0.7,
-                    "do_sample": True
-                }
-            }
-            
-            try:
-                response = requests.post(HF_API_URL, headers=headers, json=payload, timeout=10)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if isinstance(result, list) and len(result) > 0:
-                        reply = result[0].get('generated_text', '').replace(user_input, '').strip()
-                        if reply:
-                            return jsonify({'reply': f"Cloudy ☁️: {reply}"})
-            except requests.exceptions.Timeout:
-                print("Hugging Face API timeout")
-            except requests.exceptions.RequestException as e:
-                print(f"Hugging Face API error: {e}")
+        # Try the AI providers: Ollama → OpenAI → Gemini → Hugging Face
+        # (serially, hedged or raced depending on PROVIDER_MODE, within the deadline)
+        provider, reply = get_ai_response(user_input, context, deadline, grounding)
+        provider, reply = settle_reply(user_input, provider, reply, context, grounding, deadline)
         
         # Final fallback to intelligent rule-based responses
-        reply = get_intelligent_fallback(user_input)
-        
-        chat_sessions[session_id].append({
-            'role': 'assistant',
-            'content': reply,
-            'timestamp': datetime.now().isoformat()
-        })
+        if not reply:
+            provider, reply = 'fallback', get_intelligent_fallback(user_input, session_id, scan)
         
-        return jsonify({'reply': reply})
+        return jsonify(record_reply(request_id, session_id, provider, reply, started, grounding=grounding))
         
+    except QueueFull as e:
+        return overloaded_response(e, request_id)
     except Exception as e:
         # Fallback response in case of any error
-        print(f"Error in chatbot_response: {e}")
-        reply = get_intelligent_fallback(user_input)
-        return jsonify({'reply': reply})
+        log_event('chat_error', level='error', request_id=request_id, error=str(e), error_type=type(e).__name__)
+        reply = get_intelligent_fallback(user_input, session_id, scan)
+        return jsonify({'reply': reply, 'provider': 'fallback'})
 
-def should_use_web_search(user_input):
-    """Determine if the query needs web search for current information"""
-    user_input_lower = user_input.lower()
-    
-    # Keywords that indicate need for current/real-time information
-    current_info_keywords = [
-        'today', 'now', 'current', 'latest', 'recent', 'this year', '2024', '2025',
-        'news', 'weather', 'stock', 'price', 'score', 'update', 'happening',
-        'who is', 'what is the current', 'what happened', 'when did', 'where is',
-        'search', 'find', 'look up', 'tell me about', 'information about',
-        'what are', 'how to', 'best', 'top', 'list of', 'compare'
-    ]
-    
-    # Check for question words that might need web search
-    question_patterns = ['what is', 'who is', 'where is', 'when is', 'how to', 'why is']
-    
-    should_search = any(keyword in user_input_lower for keyword in current_info_keywords)
-    
-    # Also search if it's a question about something specific
-    if any(pattern in user_input_lower for pattern in question_patterns):
-        # Avoid searching for basic programming/math questions
-        if not any(word in user_input_lower for word in ['function', 'code', 'program', 'algorithm', 'theorem', 'formula']):
-            should_search = True
+def overloaded_response(error, request_id=None):
+    """429 for a message that only Ollama could answer while its queue is full"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    log_event('chat_overloaded', level='warning', request_id=request_id, retry_after=retry_after)
+    response = jsonify({'error': "Cloudy is busy right now, please try again shortly.", 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def record_reply(request_id, session_id, provider, reply, started, cached=False, grounding=None, stream=False):
+    """Add a reply to the chat history and log it; returns its JSON body (sync and async apps)"""
+    add_to_history(session_id, 'assistant', reply, provider=provider)
+    log_reply(request_id, provider, reply, started, cached=cached, stream=stream)
+    body = {'reply': reply, 'provider': provider}
+    if cached:
+        body['cached'] = True
+    if grounding and grounding.grounded(provider):
+        body['grounded'] = True
+    return body
+
+def log_reply(request_id, provider, reply, started, cached=False, stream=False):
+    """Log which provider answered a request and how long it took"""
+    latency = time.perf_counter() - started
+    metrics.request_latency.observe(latency, 'stream' if stream else 'json', provider)
+    log_event('chat_reply', request_id=request_id, provider=provider, cached=cached,
+              latency_ms=round(latency * 1000, 1), reply_chars=len(reply))
+
+@traced('web_search_check')
+def should_use_web_search(user_input, scan=None):
+    """Determine if the query needs web search for current information
+
+    scan is keyword_rules.scan(user_input), if the caller has it already.
+    """
+    # Current/real-time keywords, or a factual question that isn't about
+    # basic programming/math (see the 'web_search' rules in rules.py)
+    scan = scan or keyword_rules.scan(user_input)
+    should_search = keyword_rules.first_match(scan, 'web_search') is not None
     
-    print(f"🔍 Should use web search for '{user_input}': {should_search}", flush=True)
+    log_event('web_search_check', level='debug', input=user_input[:200], should_search=should_search)
     return should_search
 
-def get_web_search_response(user_input):
+def web_search_plan(user_input, scan, deadline):
+    """How a message uses the web: 'speculative' (search alongside the providers),
+    'sequential' (search first, answer from the results) or None (no search)"""
+    if not (should_use_web_search(user_input, scan) and WEB_SEARCH_AVAILABLE and deadline.allows(PROVIDER_MIN_BUDGET)):
+        return None
+    return 'speculative' if WEB_SEARCH_MODE == 'speculative' else 'sequential'
+
+def get_web_search_response(user_input, deadline=NO_DEADLINE):
     """Search the web and provide an answer based on search results"""
     if not WEB_SEARCH_AVAILABLE:
-        with open('debug.log', 'a') as f:
-            f.write("Web search not available - library not installed\n")
+        log_event('web_search_unavailable', level='debug')
         return None
     
     try:
-        with open('debug.log', 'a') as f:
-            f.write(f"Starting DuckDuckGo search for: {user_input}\n")
-        
-        # Use DuckDuckGo search
-        with DDGS() as ddgs:
-            results = list(ddgs.text(user_input, max_results=5))
-        
-        with open('debug.log', 'a') as f:
-            f.write(f"Found {len(results)} results\n")
-        
-        if not results:
-            with open('debug.log', 'a') as f:
-                f.write("No results returned from search\n")
-            return None
-        
-        # Compile search results
-        search_summary = "Cloudy ☁️: Based on my web search, here's what I found:\n\n"
-        
-        for i, result in enumerate(results[:3], 1):
-            title = result.get('title', 'No title')
-            snippet = result.get('body', 'No description')
-            url = result.get('href', '')
-            
-            search_summary += f"**{i}. {title}**\n"
-            search_summary += f"{snippet}\n"
-            if url:
-                search_summary += f"🔗 Source: {url}\n"
-            search_summary += "\n"
-        
-        search_summary += "💡 *Information sourced from the web in real-time*"
-        
-        return search_summary
-        
+        return format_web_results(web_search_results(user_input, deadline))
     except Exception as e:
-        print(f"Web search error: {e}")
+        log_event('web_search_error', level='warning', error=str(e))
         return None
 
+@timed_provider('web_search')
+@traced('web_search')
+def web_search_results(user_input, deadline=NO_DEADLINE):
+    """The web search results for user_input (with page text when enrichment is on), or None"""
+    # Use DuckDuckGo search (cached, coalesced and bounded by its own and the request's deadline)
+    results = web_searcher.search(user_input, timeout=deadline.cap(web_searcher.deadline))
+    
+    log_event('web_search_results', level='debug', query=user_input[:200],
+              results=len(results) if results is not None else None)
+    
+    if results and page_fetcher:
+        results = page_fetcher.enrich(results, timeout=deadline.cap(page_fetcher.budget))
+    return results
+
+def start_grounding(user_input, deadline):
+    """Start the web search for user_input in the background (see grounding.py)"""
+    return Grounding.start(web_search_results, user_input, deadline, wait=WEB_GROUNDING_WAIT,
+                           max_results=WEB_GROUNDING_RESULTS)
+
+def finish_grounding(grounding, provider, reply, deadline):
+    """(provider, reply) of a request that searched speculatively
+
+    A grounded reply gets its sources listed; when no provider answered, the
+    search results are the reply if they are in before the deadline.
+    """
+    if reply and grounding.grounded(provider):
+        reply += grounding.sources()
+    elif not reply:
+        reply = format_web_results(grounding.results(deadline.cap(web_searcher.deadline)))
+        if reply:
+            provider = 'web_search'
+    log_event('web_grounding', provider=provider, **grounding.summary(provider))
+    return provider, reply
+
+def settle_reply(user_input, provider, reply, context, grounding, deadline):
+    """(provider, reply) once the AI providers are done: a speculative search is
+    finished (see finish_grounding), otherwise an AI reply is cached"""
+    if grounding:
+        return finish_grounding(grounding, provider, reply, deadline)
+    cache_reply(user_input, provider, reply, context)
+    return provider, reply
+
+def format_web_results(results):
+    """Cloudy's answer from web search results (the top three), or None if there are none"""
+    if not results:
+        return None
+    
+    # Compile search results
+    search_summary = "Cloudy ☁️: Based on my web search, here's what I found:\n\n"
+    
+    for i, result in enumerate(results[:3], 1):
+        title = result.get('title', 'No title')
+        # The page's own text when it was fetched (WEB_PAGE_ENRICH), else the search snippet
+        snippet = excerpt(result['text'], WEB_PAGE_EXCERPT) if result.get('text') else result.get('body', 'No description')
+        url = result.get('href', '')
+        
+        search_summary += f"**{i}. {title}**\n"
+        search_summary += f"{snippet}\n"
+        if url:
+            search_summary += f"🔗 Source: {url}\n"
+        search_summary += "\n"
+    
+    search_summary += "💡 *Information sourced from the web in real-time*"
+    
+    return search_summary
+
+@traced('ollama.health')
 def check_ollama_service():
-    """Check if Ollama service is running and start if needed"""
-    try:
-        # Try to list models to check if service is running
-        ollama.list()
-        return True
-    except Exception as e:
-        print(f"Ollama service not running: {e}")
-        try:
-            # Try to start Ollama service with environment variables for better memory management
-            import subprocess
-            import os
-            env = os.environ.copy()
-            env['OLLAMA_NUM_PARALLEL'] = '1'  # Limit parallel requests
-            env['OLLAMA_MAX_LOADED_MODELS'] = '1'  # Only load one model at a time
-            env['OLLAMA_FLASH_ATTENTION'] = 'false'  # Disable flash attention to save memory
-            
-            subprocess.Popen(["C:\\Users\\Admin\\AppData\\Local\\Programs\\Ollama\\ollama.exe", "serve"], 
-                           creationflags=subprocess.CREATE_NO_WINDOW, env=env)
-            import time
-            time.sleep(5)  # Wait longer for service to start
-            return True
-        except Exception as start_error:
-            print(f"Could not start Ollama service: {start_error}")
-            return False
-
-def get_ollama_response(user_input):
+    """Return the supervisor's cached Ollama readiness (no RPC on the request path)"""
+    return ollama_supervisor.is_ready()
+
+def ollama_request(model_name, user_input, context):
+    """Build an Ollama call; returns (API method name, keyword arguments, reused)
+
+    With context reuse on, the generate API continues the session's cached
+    context (only the new message is prefilled) or, when there is no valid
+    one, starts from the system prompt plus the conversation so far, and
+    reused says which. Otherwise the chat API is used and reused is None.
+    Shared by the sync client here and the async client in asgi.py.
+    """
+    request = {'model': model_name, 'options': OLLAMA_OPTIONS, 'keep_alive': OLLAMA_KEEP_ALIVE}
+    if not ollama_contexts or not context.session_id:
+        # Earlier turns that fit in num_ctx next to the reply
+        request['messages'] = context.chat_messages(CLOUDY_SYSTEM_PROMPT, user_input, history_budget('Ollama', context))
+        return 'chat', request, None
+    
+    cached = ollama_contexts.get(context.session_id, model_name, context.last_reply, context.input_tokens)
+    if cached is not None:
+        request.update(prompt=user_input, context=cached)
+    else:
+        system_prompt = CLOUDY_SYSTEM_PROMPT
+        transcript = context.transcript(history_budget('Ollama', context))
+        if transcript:
+            system_prompt = f"{system_prompt}\nConversation so far:\n{transcript}"
+        request.update(prompt=user_input, system=system_prompt)
+    return 'generate', request, cached is not None
+
+def ollama_call(model_name, user_input, context, stream=False):
+    """Ask Ollama for a reply; returns (response or chunk stream, reused)"""
+    method, request, reused = ollama_request(model_name, user_input, context)
+    return getattr(provider_registry.get('Ollama'), method)(stream=stream, **request), reused
+
+def ollama_reply(response, reused, model_name, context):
+    """The Cloudy reply from a complete Ollama response, remembering its context for the next turn"""
+    ai_response = response['message']['content'] if reused is None else response.get('response', '')
+    ai_response = ai_response.strip()
+    if not ai_response:
+        return None
+    ai_response = cloudy_reply(ai_response)
+    if reused is not None:
+        ollama_contexts.put(context.session_id, model_name, response.get('context'), ai_response)
+        ollama_contexts.record(reused, response=response)
+    return ai_response
+
+def cloudy_reply(text):
+    """Make sure a provider's reply starts with "Cloudy ☁️:" """
+    return text if text.startswith(CLOUDY_PREFIX) else f"{CLOUDY_PREFIX} {text}"
+
+def get_ollama_response(user_input, context=EMPTY_CONTEXT):
     """Get intelligent response from Ollama AI model"""
-    if not OLLAMA_AVAILABLE:
+    # Check if Ollama service is running (it is only ever ready once its client is loaded)
+    if not check_ollama_service():
         return None
     
-    # Check if Ollama service is running
-    if not check_ollama_service():
+    # Wait for a free Ollama slot (QueueFull is raised to the provider chain)
+    queued = time.perf_counter()
+    try:
+        with ollama_admission.slot(context.session_id, timeout=admission_timeout()):
+            add_span('ollama.queue', queued)
+            return ask_ollama(user_input, context)
+    except QueueTimeout:
+        add_span('ollama.queue', queued, timed_out=True)
+        return None  # Waited too long: spill over to the next provider
+
+def admission_timeout():
+    """How long to queue for Ollama: the queue timeout, leaving PROVIDER_MIN_BUDGET of the deadline for the call"""
+    deadline = current_deadline()
+    if not deadline.bounded:
+        return None
+    return max(0.0, min(ollama_admission.queue_timeout, deadline.remaining() - PROVIDER_MIN_BUDGET))
+
+def ask_ollama(user_input, context):
+    """Call Ollama (holding an admission slot) behind its circuit breaker"""
+    breaker = circuit_breakers['Ollama']
+    if not breaker.allow_request():
         return None
     
     try:
-        # Create an enhanced system prompt to make the AI act like Cloudy
-        system_prompt = """You are Cloudy, a friendly, intelligent, and engaging cloud-themed chatbot assistant. You should:
-        - Always respond as "Cloudy ☁️:" followed by your message
-        - Be helpful, friendly, conversational, and enthusiastic
-        - Provide detailed, well-structured, and informative responses
-        - Use clear formatting with bullet points or numbered lists when appropriate
-        - Include relevant examples and practical insights
-        - Remember context from the conversation when possible
-        - If someone tells you their name, remember it and use it in future responses
-        - Be knowledgeable about cloud computing, technology, science, and general topics
-        - Provide comprehensive answers (2-4 sentences minimum, can be longer for complex topics)
-        - Use cloud and weather emojis occasionally ☁️ ⛅ 🌤️ 💨 🌩️
-        - Format code examples with proper syntax highlighting when needed
-        - Ask follow-up questions to clarify or deepen understanding
-        """
-        
-        # Try the configured model first, fallback to smaller model if memory issues
-        models_to_try = [OLLAMA_MODEL]
-        if OLLAMA_MODEL != "llama3.2:1b":
-            models_to_try.append("llama3.2:1b")  # Fallback to smaller model
-        
         response = None
-        for model_name in models_to_try:
+        last_error = None
+        for model_name in ollama_models():
             try:
-                # Call Ollama with improved parameters
-                response = ollama.chat(
-                    model=model_name,
-                    messages=[
-                        {
-                            'role': 'system',
-                            'content': system_prompt
-                        },
-                        {
-                            'role': 'user', 
-                            'content': user_input
-                        }
-                    ],
-                    options={
-                        'temperature': 0.8,  # Slightly more creative
-                        'top_p': 0.9,
-                        'num_predict': 1000,  # Longer responses for complete answers
-                        'repeat_penalty': 1.1,  # Reduce repetition
-                        'seed': -1,  # Random seed for variety
-                        'num_ctx': 2048  # Limit context window to save memory
-                    }
-                )
-                print(f"Successfully used model: {model_name}")
+                # Call Ollama with improved parameters (Cloudy system prompt, conversation so far)
+                with span('ollama.call', model=model_name):
+                    response, reused = ollama_call(model_name, user_input, context)
+                log_event('ollama_model_used', level='debug', model=model_name)
                 break  # Success, exit the loop
             except Exception as model_error:
-                print(f"Failed to use model {model_name}: {model_error}")
-                if "memory" in str(model_error).lower():
-                    print(f"Memory issue with {model_name}, trying smaller model...")
-                    continue
-                else:
-                    # Non-memory error, don't try other models
+                last_error = model_error
+                if not ollama_retry(model_name, model_error):
                     break
         
-        if response and 'message' in response:
-            ai_response = response['message']['content'].strip()
-            
-            # Ensure response starts with "Cloudy ☁️:" 
-            if not ai_response.startswith("Cloudy ☁️:"):
-                ai_response = f"Cloudy ☁️: {ai_response}"
-            
-            return ai_response
+        if response is None:
+            record_provider_failure(breaker, last_error)
+            return None
+        
+        breaker.record_success()
+        return ollama_reply(response, reused, model_name, context)
             
     except Exception as e:
-        print(f"Ollama error: {e}")
-        return None
-    
-    return None
+        return provider_failed('Ollama', e)
+
+def ollama_models():
+    """Models to try in order: the configured one first, then the smaller fallback model"""
+    return [OLLAMA_MODEL] if OLLAMA_MODEL == "llama3.2:1b" else [OLLAMA_MODEL, "llama3.2:1b"]
 
-def get_openai_response(user_input):
+def ollama_retry(model_name, error):
+    """Log a failed Ollama model; True if the next model is worth a try
+
+    Only running out of memory is (a smaller model may fit), and only while the
+    deadline leaves PROVIDER_MIN_BUDGET for it.
+    """
+    memory_issue = "memory" in str(error).lower()
+    log_event('ollama_model_failed', level='warning', model=model_name, error=str(error), memory_issue=memory_issue)
+    return memory_issue and current_deadline().allows(PROVIDER_MIN_BUDGET)
+
+def openai_request(user_input, context=EMPTY_CONTEXT):
+    """Keyword arguments of an OpenAI chat completion (sync and async clients)"""
+    return {
+        'model': OPENAI_MODEL,
+        # Enhanced system prompt to make the AI act like Cloudy
+        'messages': context.chat_messages(CLOUDY_SYSTEM_PROMPT, user_input, history_budget('OpenAI', context)),
+        'temperature': 0.7,
+        'max_tokens': 800
+    }
+
+def get_openai_response(user_input, context=EMPTY_CONTEXT):
     """Get intelligent response from OpenAI GPT models (GPT-4, GPT-3.5, etc.)"""
-    if not OPENAI_AVAILABLE or not openai_client:
-        print(f"OpenAI not available: AVAILABLE={OPENAI_AVAILABLE}, CLIENT={openai_client is not None}")
+    openai_client = provider_registry.get('OpenAI')
+    if not openai_client:
+        log_event('provider_unavailable', level='debug', provider='OpenAI',
+                  installed=OPENAI_AVAILABLE, configured=bool(OPENAI_API_KEY))
+        return None
+    
+    # Skip the call entirely while the breaker is open (bad key, quota, outage)
+    breaker = circuit_breakers['OpenAI']
+    if not breaker.allow_request():
         return None
     
     try:
-        print(f"Using OpenAI model: {OPENAI_MODEL}")
-        print(f"API key starts with: {OPENAI_API_KEY[:10]}..." if OPENAI_API_KEY else "No API key")
-        
-        # Create an enhanced system prompt to make the AI act like Cloudy
-        system_prompt = """You are Cloudy, a friendly, intelligent, and engaging cloud-themed chatbot assistant. You should:
-        - Always respond as "Cloudy ☁️:" followed by your message
-        - Be helpful, friendly, conversational, and enthusiastic
-        - Provide detailed, well-structured, and informative responses
-        - Use clear formatting with bullet points or numbered lists when appropriate
-        - Include relevant examples and practical insights
-        - Remember context from the conversation when possible
-        - If someone tells you their name, remember it and use it in future responses
-        - Be knowledgeable about cloud computing, technology, science, and general topics
-        - Provide comprehensive answers (2-4 sentences minimum, can be longer for complex topics)
-        - Use cloud and weather emojis occasionally ☁️ ⛅ 🌤️ 💨 🌩️
-        - Format code examples with proper syntax highlighting when needed
-        - Ask follow-up questions to clarify or deepen understanding
-        """
-        
         # Call OpenAI API
-        response = openai_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_input}
-            ],
-            temperature=0.7,
-            max_tokens=800,
-            timeout=15
-        )
-        
-        if response and response.choices:
-            ai_response = response.choices[0].message.content.strip()
-            
-            # Ensure response starts with "Cloudy ☁️:"
-            if not ai_response.startswith("Cloudy ☁️:"):
-                ai_response = f"Cloudy ☁️: {ai_response}"
-            
-            return ai_response
-        else:
-            print("OpenAI: No response or choices returned")
-            
+        response = openai_client.chat.completions.create(**openai_request(user_input, context))
+        breaker.record_success()
+        return openai_reply(response)
     except Exception as e:
-        print(f"OpenAI error: {e}")
-        print(f"Error type: {type(e).__name__}")
-        
-        # Check for specific API key issues
-        if "invalid" in str(e).lower() and "key" in str(e).lower():
-            print("OpenAI: Invalid API key - check your OPENAI_API_KEY")
-        elif "quota" in str(e).lower() or "limit" in str(e).lower():
-            print("OpenAI: API quota exceeded or rate limit")
-        elif "timeout" in str(e).lower():
-            print("OpenAI: Request timeout")
-        else:
-            print(f"OpenAI: Unknown error - {e}")
-        
-        return None
-    
+        # Classify the failure (auth, quota, timeout, 5xx) and back off accordingly
+        return provider_failed('OpenAI', e, model=OPENAI_MODEL)
+
+def openai_reply(response):
+    """The Cloudy reply from an OpenAI chat completion, or None"""
+    if response and response.choices:
+        return cloudy_reply(response.choices[0].message.content.strip())
+    log_event('provider_empty_reply', level='warning', provider='OpenAI', model=OPENAI_MODEL)
     return None
 
-def get_gemini_response(user_input):
-    """Get intelligent response from Google Gemini AI"""
-    if not GEMINI_AVAILABLE or not gemini_model:
-        return None
-    
-    try:
-        # Create an enhanced prompt that includes personality and detailed instructions
-        full_prompt = f"""You are Cloudy, a friendly, intelligent, and engaging cloud-themed chatbot assistant. Respond to the following message as Cloudy.
+def build_gemini_prompt(user_input, context=EMPTY_CONTEXT):
+    """Build the Gemini prompt with Cloudy's personality and the conversation so far"""
+    transcript = context.transcript(history_budget('Gemini', context))
+    history = f"Conversation so far:\n{transcript}\n\n" if transcript else ""
+    return f"""You are Cloudy, a friendly, intelligent, and engaging cloud-themed chatbot assistant. Respond to the following message as Cloudy.
 
 Guidelines:
 - Always start with "Cloudy ☁️:"
@@ -484,63 +1011,531 @@ Guidelines:
 - Ask follow-up questions to clarify or deepen understanding
 - Be helpful, friendly, conversational, and enthusiastic
 
-User: {user_input}
+{history}User: {user_input}
 
 Provide a thoughtful, detailed, and engaging response."""
+
+def gemini_generation_config():
+    # A plain dict (the SDK accepts one), so building it doesn't need the SDK loaded
+    return {
+        'temperature': 0.7,
+        'max_output_tokens': 800
+    }
+
+def gemini_request_options(model):
+    """Per-call SDK options: a timeout of what is left of the current deadline (the SDK has none by default)
+
+    Only SDK releases whose generate_content takes request_options get it; older
+    ones (like the pinned 0.3.2) reject unknown arguments. Their calls are still
+    abandoned at the deadline by the provider chain, but keep their thread until
+    the call returns.
+    """
+    deadline = current_deadline()
+    if not deadline.bounded or not takes_request_options(type(model)):
+        return {}
+    return {'request_options': {'timeout': max(deadline.remaining(), 0.01)}}
+
+@functools.lru_cache(maxsize=None)
+def takes_request_options(model_class):
+    return 'request_options' in inspect.signature(model_class.generate_content).parameters
+
+def get_gemini_response(user_input, context=EMPTY_CONTEXT):
+    """Get intelligent response from Google Gemini AI"""
+    gemini_model = provider_registry.get('Gemini')
+    if not gemini_model:
+        return None
+    
+    breaker = circuit_breakers['Gemini']
+    if not breaker.allow_request():
+        return None
+    
+    try:
+        # Create an enhanced prompt that includes personality and detailed instructions
+        full_prompt = build_gemini_prompt(user_input, context)
         
         # Call Gemini API
-        response = gemini_model.generate_content(
-            full_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=800,
-            )
-        )
-        
-        if response and response.text:
-            ai_response = response.text.strip()
-            
-            # Ensure response starts with "Cloudy ☁️:"
-            if not ai_response.startswith("Cloudy ☁️:"):
-                ai_response = f"Cloudy ☁️: {ai_response}"
-            
-            return ai_response
-            
+        response = gemini_model.generate_content(full_prompt, generation_config=gemini_generation_config(),
+                                                 **gemini_request_options(gemini_model))
+        breaker.record_success()
+        return gemini_reply(response)
     except Exception as e:
-        print(f"Gemini error: {e}")
-        return None
-    
+        return provider_failed('Gemini', e)
+
+def gemini_reply(response):
+    """The Cloudy reply from a Gemini response, or None"""
+    if response and response.text:
+        return cloudy_reply(response.text.strip())
     return None
 
-def get_intelligent_fallback(user_input):
-    """Intelligent fallback responses with better context understanding"""
-    user_input_lower = user_input.lower().strip()
+def get_huggingface_response(user_input, context=EMPTY_CONTEXT):
+    """Get response from the Hugging Face Inference API (last AI fallback)
+
+    DialoGPT gets the bare message; context is accepted for a uniform provider signature.
+    """
+    if not HF_API_KEY:
+        return None
     
-    # Cloud Computing - CHECK FIRST before generic 'cloud' keyword
-    if 'cloud computing' in user_input_lower or ('cloud' in user_input_lower and 'computing' in user_input_lower) or ('cloud' in user_input_lower and any(word in user_input_lower for word in ['service', 'provider', 'aws', 'azure', 'gcp', 'infrastructure', 'server', 'storage', 'database'])):
+    breaker = circuit_breakers['HuggingFace']
+    if not breaker.allow_request():
+        return None
+    
+    try:
+        response = hf_session.post(HF_API_URL, headers=headers, json=huggingface_payload(user_input),
+                                   timeout=HTTP_SETTINGS['HuggingFace'].timeout())
         
-        # Specific question about cloud computing definition and characteristics
-        if 'what is cloud computing' in user_input_lower and ('characteristic' in user_input_lower or 'main characteristics' in user_input_lower):
-            return """Cloudy ☁️: Cloud computing is the delivery of computing resources like servers, storage, databases, and software over the internet.
-Its key characteristics are on-demand access, pay-as-you-go pricing, broad network access, resource pooling, and rapid elasticity."""
+        if response.status_code != 200:
+            return provider_failed('HuggingFace', status_code=response.status_code, headers=response.headers)
         
-        # Specific question about cloud service models
-        if 'types of cloud service' in user_input_lower and ('iaas' in user_input_lower or 'paas' in user_input_lower or 'saas' in user_input_lower):
-            return """Cloudy ☁️: IaaS provides virtualized hardware resources (VMs, storage, networks).
-PaaS offers a platform for building, running, and managing applications.
-SaaS delivers ready-to-use software over the internet."""
+        breaker.record_success()
+        return huggingface_reply(response.json(), user_input)
+    except requests.exceptions.RequestException as e:
+        return provider_failed('HuggingFace', e)
+
+def huggingface_payload(user_input):
+    return {
+        "inputs": user_input,
+        "parameters": {
+            "max_length": 500,
+            "temperature": 0.7,
+            "do_sample": True
+        }
+    }
+
+def huggingface_reply(result, user_input):
+    """The Cloudy reply from a Hugging Face Inference API result, or None"""
+    if isinstance(result, list) and len(result) > 0:
+        reply = result[0].get('generated_text', '').replace(user_input, '').strip()
+        if reply:
+            return cloudy_reply(reply)
+    return None
+
+# AI providers in priority order
+AI_PROVIDERS = [
+    ('Ollama', get_ollama_response),
+    ('OpenAI', get_openai_response),
+    ('Gemini', get_gemini_response),
+    ('HuggingFace', get_huggingface_response),
+]
+
+# Identifies the provider chain configuration so cached replies are only reused
+# by the same models and sampling settings
+PROVIDER_SIGNATURE = "|".join([
+    PROVIDER_MODE,
+    f"ollama:{OLLAMA_MODEL}@{OLLAMA_OPTIONS['temperature']}",
+    f"openai:{OPENAI_MODEL}@0.7",
+    f"gemini:{GEMINI_MODEL}@0.7",
+    f"hf:{HF_API_URL}@0.7",
+])
+
+# Providers whose prompt can carry web search results (DialoGPT on Hugging Face gets the bare message)
+GROUNDED_PROVIDERS = ('Ollama', 'OpenAI', 'Gemini')
+
+@traced('providers')
+def get_ai_response(user_input, context=EMPTY_CONTEXT, deadline=NO_DEADLINE, grounding=None):
+    """Return (provider, reply) from the AI providers, or (None, None) if all fail or time runs out
+
+    With a grounding (a web search running alongside), the GROUNDED_PROVIDERS
+    wait for its results, until its wait is over, as their attempt starts and put
+    them into their prompt if they are in. The chain itself starts at once.
+    """
+    providers = [(name, functools.partial(provider, context=context)) for name, provider in AI_PROVIDERS]
+    if grounding:
+        providers = [(name, grounded(name, provider, grounding, deadline) if name in GROUNDED_PROVIDERS else provider)
+                     for name, provider in providers]
+    return call_providers(providers, user_input, **provider_chain_options(deadline))
+
+def provider_chain_options(deadline):
+    """Keyword arguments of call_providers (and call_providers_async in asgi.py)"""
+    return {'mode': PROVIDER_MODE, 'hedge_delay': HEDGE_DELAY, 'deadline': deadline,
+            'min_budget': PROVIDER_MIN_BUDGET, 'router': router, 'breakers': circuit_breakers}
+
+def grounded(name, provider, grounding, deadline):
+    """provider, called with the search results in its prompt when they are in"""
+    def call(user_input):
+        return provider(grounding.ground(user_input, name, deadline))
+    return call
+
+# Prompts about the user themselves must never be answered from another user's reply
+PERSONAL_PROMPT_PHRASES = ['my name', 'call me', 'i am', "i'm", 'myself', 'my self']
+
+def is_cacheable_prompt(user_input, context=EMPTY_CONTEXT):
+    """Only context-free prompts are cached: a reply that depended on earlier turns
+    must not be served to a different conversation"""
+    if not context.is_empty:
+        return False
+    user_input_lower = user_input.lower()
+    return not any(phrase in user_input_lower for phrase in PERSONAL_PROMPT_PHRASES)
+
+@traced('intent')
+def get_intent_reply(user_input, regenerate=False, session_id='default', scan=None):
+    """Reply from the intent files if the message clearly matches an intent, else None
+
+    Name memory goes first: a message that gives or asks for the user's name, or
+    greets a user whose name is remembered, takes the usual path instead.
+    """
+    if not intent_classifier or regenerate:
+        return None
+    
+    simple = keyword_rules.first_match(scan or keyword_rules.scan(user_input), 'simple')
+    if simple in ('ask_name', 'set_name') or (simple == 'greeting' and chat_sessions.recall(session_id, 'name')):
+        return None
+    
+    result = intent_classifier.respond(user_input)
+    if not result:
+        return None
+    match, response = result
+    log_event('intent_match', tag=match.tag, confidence=match.confidence, margin=match.margin)
+    return response if response.startswith(CLOUDY_PREFIX) else f"{CLOUDY_PREFIX} {response}"
+
+@traced('cache')
+def get_cached_reply(user_input, regenerate=False, context=EMPTY_CONTEXT):
+    """Return a cached (provider, reply) for this prompt, or None
+
+    Exact (normalized) matches are tried first, then semantically similar
+    prompts. The Regenerate button bypasses the lookup so the user gets a
+    fresh answer.
+    """
+    if regenerate or not is_cacheable_prompt(user_input, context):
+        return None
+    
+    if RESPONSE_CACHE_ENABLED:
+        cached = response_cache.get(response_cache.make_key(user_input, PROVIDER_SIGNATURE))
+        if cached:
+            return cached
+    
+    if semantic_cache:
+        match = semantic_cache.lookup(user_input, PROVIDER_SIGNATURE)
+        if match:
+            log_event('semantic_cache_hit', provider=match[0])
+            return match
+    return None
+
+def prepare_providers(user_input, session_id, regenerate=False, grounding=None):
+    """(context, cached (provider, reply) or None) for a message going on to the AI providers
+
+    The context is the earlier turns of the chat (newest first, within each
+    provider's budget). Repeated questions are answered from the response
+    cache, but not ones about current events (a search is running).
+    """
+    context = get_conversation_context(session_id, user_input)
+    cached = get_cached_reply(user_input, regenerate, context) if grounding is None else None
+    return context, cached
+
+def cache_reply(user_input, provider, reply, context=EMPTY_CONTEXT):
+    """Remember an AI reply for identical or similar future prompts"""
+    if not reply or not is_cacheable_prompt(user_input, context):
+        return
+    if RESPONSE_CACHE_ENABLED:
+        response_cache.set(response_cache.make_key(user_input, PROVIDER_SIGNATURE), (provider, reply))
+    if semantic_cache:
+        semantic_cache.add(user_input, PROVIDER_SIGNATURE, provider, reply)
+
+# 🔹 Streaming responses (Server-Sent Events)
+
+def stream_ollama_response(user_input, context=EMPTY_CONTEXT):
+    """Yield reply chunks from Ollama as they are generated"""
+    if not check_ollama_service():
+        return
+    
+    # The slot is held until the stream ends (or the client goes away)
+    queued = time.perf_counter()
+    try:
+        with ollama_admission.slot(context.session_id, timeout=admission_timeout()):
+            add_span('ollama.queue', queued)
+            yield from guarded_stream(circuit_breakers['Ollama'], lambda: _ollama_chunks(user_input, context))
+    except QueueTimeout:
+        add_span('ollama.queue', queued, timed_out=True)
+        return  # Spill over to the next provider
+
+def _ollama_chunks(user_input, context):
+    started = time.perf_counter()
+    stream, reused = ollama_call(OLLAMA_MODEL, user_input, context, stream=True)
+    reply_parts = []
+    time_to_first_token = None
+    for chunk in stream:
+        content = ollama_chunk_text(chunk, reused)
+        if content:
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - started
+            reply_parts.append(content)
+            yield content
+        ollama_stream_done(chunk, reused, context, reply_parts, time_to_first_token)
+
+def ollama_chunk_text(chunk, reused):
+    """The text of one chunk of an Ollama stream (chat or generate API, see ollama_request)"""
+    return chunk.get('message', {}).get('content', '') if reused is None else chunk.get('response', '')
+
+def ollama_stream_done(chunk, reused, context, reply_parts, time_to_first_token):
+    """Remember the context a generate stream continues from next turn (its final chunk carries it)"""
+    if reused is not None and chunk.get('done'):
+        ollama_contexts.put(context.session_id, OLLAMA_MODEL, chunk.get('context'), ''.join(reply_parts))
+        ollama_contexts.record(reused, ttft=time_to_first_token, response=chunk)
+
+def stream_openai_response(user_input, context=EMPTY_CONTEXT):
+    """Yield reply chunks from OpenAI as they are generated"""
+    if not provider_registry.get('OpenAI'):
+        return
+    
+    yield from guarded_stream(circuit_breakers['OpenAI'], lambda: _openai_chunks(user_input, context))
+
+def _openai_chunks(user_input, context):
+    stream = provider_registry.get('OpenAI').chat.completions.create(stream=True, **openai_request(user_input, context))
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def stream_gemini_response(user_input, context=EMPTY_CONTEXT):
+    """Yield reply chunks from Google Gemini as they are generated"""
+    if not provider_registry.get('Gemini'):
+        return
+    
+    yield from guarded_stream(circuit_breakers['Gemini'], lambda: _gemini_chunks(user_input, context))
+
+def _gemini_chunks(user_input, context):
+    gemini_model = provider_registry.get('Gemini')
+    stream = gemini_model.generate_content(
+        build_gemini_prompt(user_input, context),
+        generation_config=gemini_generation_config(),
+        stream=True,
+        **gemini_request_options(gemini_model)
+    )
+    for chunk in stream:
+        if chunk.text:
+            yield chunk.text
+
+# Streaming providers in fallback order (same priority as chatbot_response)
+STREAMING_PROVIDERS = [
+    ('Ollama', stream_ollama_response),
+    ('OpenAI', stream_openai_response),
+    ('Gemini', stream_gemini_response),
+]
+
+def with_cloudy_prefix(chunks):
+    """Buffer just enough of a stream to make sure it starts with the Cloudy prefix"""
+    chunks = iter(chunks)
+    buffered = ''
+    for chunk in chunks:
+        buffered += chunk
+        if len(buffered.lstrip()) >= len(CLOUDY_PREFIX):
+            break
+    
+    buffered = buffered.lstrip()
+    if not buffered:
+        return
+    yield cloudy_reply(buffered)
+    yield from chunks
+
+def chunks_within(stream, deadline):
+    """The rest of stream, each chunk read with deadline applied; raises TimeoutError once it has run out"""
+    while True:
+        if deadline.expired():
+            raise TimeoutError("stream ran past the request deadline")
+        with deadline.applied():
+            chunk = next(stream, None)
+        if chunk is None:
+            return
+        yield chunk
+
+def stream_chatbot_reply(user_input, outcome, regenerate=False, session_id='default', deadline=NO_DEADLINE,
+                         scan=None):
+    """Yield reply chunks, falling back to the next provider until one produces a first token
+
+    The name of the provider that answered is stored in outcome['provider'].
+    The deadline bounds the whole reply; providers are skipped once less than
+    PROVIDER_MIN_BUDGET of it is left, and a stream still running when it
+    expires ends there.
+    """
+    reply = get_intent_reply(user_input, regenerate, session_id, scan)
+    if reply:
+        outcome['provider'] = 'intent'
+        yield reply
+        return
+    
+    grounding = None
+    search = web_search_plan(user_input, scan, deadline)
+    if search == 'speculative':
+        grounding = start_grounding(user_input, deadline)
+    elif search:
+        reply = get_web_search_response(user_input, deadline)
+        if reply:
+            outcome['provider'] = 'web_search'
+            yield reply
+            return
+    
+    context, cached = prepare_providers(user_input, session_id, regenerate, grounding)
+    if cached:
+        outcome['provider'], reply = cached
+        outcome['cached'] = True
+        yield reply
+        return
+    
+    overloaded = None
+    streaming_providers = router.order(STREAMING_PROVIDERS, stream=True)
+    for index, (name, stream_provider) in enumerate(streaming_providers):
+        if out_of_time(streaming_providers, index, deadline):
+            break
+        log_event('provider_attempt', level='debug', provider=name, stream=True)
+        prompt = grounding.ground(user_input, name, deadline) if grounding else user_input
+        stream = with_cloudy_prefix(stream_provider(prompt, context))
         
-        # Specific question about virtualization
-        if 'virtualization' in user_input_lower:
-            return """Cloudy ☁️: Virtualization allows one physical machine to run multiple virtual machines using a hypervisor.
-It helps cloud providers efficiently share hardware, isolate users, and scale resources easily."""
+        # Fallback is only possible until the first token has been sent
+        attempt_start = time.perf_counter()
+        first_chunk = None
+        try:
+            # The request (and Ollama's queue wait) starts here, so its timeouts follow the deadline
+            with deadline.applied(), span(name.lower(), stream=True):
+                first_chunk = next(stream)
+        except Exception as e:
+            overloaded = stream_failed(name, e, deadline) or overloaded
+            continue
+        finally:
+            observe_attempt(name, first_chunk is not None, attempt_start, stream=True)
         
-        # Specific question about elasticity vs scalability
-        if 'elasticity' in user_input_lower and 'scalability' in user_input_lower:
-            return """Cloudy ☁️: Elasticity means resources automatically expand or shrink based on real-time demand.
-Scalability means increasing or upgrading resources to handle long-term growth."""
+        metrics.fallback_depth.observe(index)
+        outcome['provider'] = name
+        reply_parts = [first_chunk]
+        yield first_chunk
+        try:
+            for chunk in chunks_within(stream, deadline):
+                reply_parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            log_event('stream_interrupted', level='warning', provider=name, error=str(e))
+            return  # Don't cache a partial reply
+        yield from stream_ending(user_input, name, ''.join(reply_parts), context, grounding, deadline, outcome)
+        return
+    
+    # Non-streaming fallbacks are sent as a single chunk
+    reply = None
+    if deadline.allows(PROVIDER_MIN_BUDGET):
+        attempt_start = time.perf_counter()
+        with deadline.applied(), span('huggingface'):
+            reply = get_huggingface_response(user_input)
+        observe_attempt('HuggingFace', bool(reply), attempt_start)
+    else:
+        record_attempt('HuggingFace', None)
+    metrics.fallback_depth.observe(len(STREAMING_PROVIDERS) + (0 if reply else 1))
+    # Without any provider's reply, the search results are the answer
+    provider, reply = settle_reply(user_input, 'HuggingFace' if reply else None, reply, context, grounding, deadline)
+    if reply:
+        outcome['provider'] = provider
+        yield reply
+        return
+    
+    if overloaded:
+        raise overloaded
+    outcome['provider'] = 'fallback'
+    yield get_intelligent_fallback(user_input, session_id, scan)
+
+def streamed_reply(request_id, session_id, reply, outcome, started):
+    """record_reply for a streamed reply; returns the payload of the stream's done event"""
+    done = record_reply(request_id, session_id, outcome['provider'], reply, started, cached=outcome['cached'],
+                        stream=True)
+    done['cached'] = outcome['cached']
+    if outcome.get('grounded'):
+        done['grounded'] = True
+    return done
+
+def out_of_time(streaming_providers, index, deadline):
+    """True once the deadline leaves less than PROVIDER_MIN_BUDGET for streaming_providers[index]
+    (the ones from there on are recorded as skipped)"""
+    if deadline.allows(PROVIDER_MIN_BUDGET):
+        return False
+    log_event('provider_deadline_skip', level='warning', provider=streaming_providers[index][0], stream=True,
+              remaining=round(deadline.remaining(), 3))
+    for skipped, _ in streaming_providers[index:]:
+        record_attempt(skipped, None)
+    return True
+
+def stream_failed(name, error, deadline):
+    """Log a stream that ended before its first chunk; returns error if it was a full Ollama queue"""
+    if isinstance(error, QueueFull):
+        return error
+    if isinstance(error, (StopIteration, StopAsyncIteration)):
+        log_event('provider_empty_reply', level='warning', provider=name, stream=True)
+    elif isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        log_event('provider_deadline_exceeded', level='warning', provider=name, stream=True, budget=deadline.budget)
+    else:
+        log_event('provider_error', level='warning', provider=name, stream=True, error=str(error))
+    return None
+
+def observe_attempt(name, ok, attempt_start, stream=False):
+    """Record a provider attempt made outside the provider chain, for the metrics and the router"""
+    latency = time.perf_counter() - attempt_start
+    record_attempt(name, ok, latency)
+    router.observe(name, ok, latency, stream=stream)
+
+def stream_ending(user_input, name, reply, context, grounding, deadline, outcome):
+    """What follows a complete stream: a grounded reply ends with its sources (see settle_reply)"""
+    _, full_reply = settle_reply(user_input, name, reply, context, grounding, deadline)
+    outcome['grounded'] = bool(grounding) and grounding.grounded(name)
+    if len(full_reply) > len(reply):
+        yield full_reply[len(reply):]
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Events frame with a JSON payload"""
+    frame = f"data: {json.dumps(data)}\n\n"
+    if event:
+        frame = f"event: {event}\n{frame}"
+    return frame
+
+def stream_chatbot_response(user_input, session_id, regenerate=False, request_id=None, deadline=NO_DEADLINE):
+    """Stream the reply to the browser as Server-Sent Events"""
+    started = time.perf_counter()
+    outcome = {'provider': None, 'cached': False}
+    scan = keyword_rules.scan(user_input)
+    chunks = stream_chatbot_reply(user_input, outcome, regenerate, session_id, deadline, scan)
+    
+    # Run up to the first token before committing to a 200, so a full Ollama queue can still get a 429
+    first_chunks = []
+    first_error = None
+    try:
+        first_chunks.append(next(chunks))
+    except StopIteration:
+        pass
+    except QueueFull as e:
+        return overloaded_response(e, request_id)
+    except Exception as e:
+        first_error = e
+    
+    def generate():
+        reply_parts = []
+        try:
+            if first_error:
+                raise first_error
+            for chunk in itertools.chain(first_chunks, chunks):
+                reply_parts.append(chunk)
+                yield sse_event({'token': chunk})
+        except Exception as e:
+            log_event('chat_error', level='error', request_id=request_id, stream=True,
+                      error=str(e), error_type=type(e).__name__)
+            if not reply_parts:
+                outcome['provider'] = 'fallback'
+                fallback = get_intelligent_fallback(user_input, session_id, scan)
+                reply_parts.append(fallback)
+                yield sse_event({'token': fallback})
         
-        return """Cloudy ☁️: Cloud computing is delivering computing services over the internet! Here's the breakdown:
+        yield sse_event(streamed_reply(request_id, session_id, ''.join(reply_parts), outcome, started), event='done')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# 🔹 Rule-based fallback (keywords and routing order live in rules.py)
+
+TOPIC_REPLIES = {
+    'cloud_definition': """Cloudy ☁️: Cloud computing is the delivery of computing resources like servers, storage, databases, and software over the internet.
+Its key characteristics are on-demand access, pay-as-you-go pricing, broad network access, resource pooling, and rapid elasticity.""",
+    'cloud_service_models': """Cloudy ☁️: IaaS provides virtualized hardware resources (VMs, storage, networks).
+PaaS offers a platform for building, running, and managing applications.
+SaaS delivers ready-to-use software over the internet.""",
+    'virtualization': """Cloudy ☁️: Virtualization allows one physical machine to run multiple virtual machines using a hypervisor.
+It helps cloud providers efficiently share hardware, isolate users, and scale resources easily.""",
+    'elasticity_vs_scalability': """Cloudy ☁️: Elasticity means resources automatically expand or shrink based on real-time demand.
+Scalability means increasing or upgrading resources to handle long-term growth.""",
+    'cloud_computing': """Cloudy ☁️: Cloud computing is delivering computing services over the internet! Here's the breakdown:
 
 **What It Includes:**
 - **Compute**: Virtual servers and processing power
@@ -562,12 +1557,8 @@ Scalability means increasing or upgrading resources to handle long-term growth."
 - Microsoft Azure - enterprise focus
 - Google Cloud Platform - data analytics strength
 
-I'm proud to be a cloud chatbot! ☁️"""
-    
-    # Technology & Programming questions
-    if any(word in user_input_lower for word in ['python', 'programming', 'code', 'function']):
-        if 'sort' in user_input_lower or 'reverse' in user_input_lower:
-            return """Cloudy ☁️: Here's a simple Python example:
+I'm proud to be a cloud chatbot! ☁️""",
+    'python_snippets': """Cloudy ☁️: Here's a simple Python example:
 
 ```python
 # Reverse a string
@@ -579,15 +1570,10 @@ def sort_list(items):
     return sorted(items)
 ```
 
-Would you like me to explain how these work?"""
-        elif 'benefit' in user_input_lower:
-            return "Cloudy ☁️: Python is great for beginners and experts! It's easy to read, has tons of libraries, works for web development, data science, AI, and automation. Plus, it has a huge community for support! 🐍"
-        else:
-            return "Cloudy ☁️: Python is a versatile programming language! What specific aspect would you like to know about - syntax, libraries, or use cases?"
-    
-    # AI & Machine Learning
-    if any(word in user_input_lower for word in ['artificial intelligence', 'machine learning', 'ai', 'neural']):
-        return """Cloudy ☁️: Artificial Intelligence (AI) is transforming technology! Here's what you need to know:
+Would you like me to explain how these work?""",
+    'python_benefits': "Cloudy ☁️: Python is great for beginners and experts! It's easy to read, has tons of libraries, works for web development, data science, AI, and automation. Plus, it has a huge community for support! 🐍",
+    'python': "Cloudy ☁️: Python is a versatile programming language! What specific aspect would you like to know about - syntax, libraries, or use cases?",
+    'ai': """Cloudy ☁️: Artificial Intelligence (AI) is transforming technology! Here's what you need to know:
 
 **Key Components:**
 - **Machine Learning (ML)**: Systems learn from data without explicit programming
@@ -602,11 +1588,8 @@ Would you like me to explain how these work?"""
 - Medical diagnosis and drug discovery
 - Fraud detection in banking
 
-AI is revolutionizing industries and creating new possibilities every day! 🤖✨"""
-    
-    # Quantum Computing
-    if 'quantum' in user_input_lower:
-        return """Cloudy ☁️: Quantum computing is the future of computation! Let me explain:
+AI is revolutionizing industries and creating new possibilities every day! 🤖✨""",
+    'quantum': """Cloudy ☁️: Quantum computing is the future of computation! Let me explain:
 
 **How It Works:**
 - **Classical Bits**: Traditional computers use 0 or 1
@@ -631,114 +1614,81 @@ AI is revolutionizing industries and creating new possibilities every day! 🤖
 - Error rates still high
 - Limited number of qubits available
 
-Companies like IBM, Google, and Microsoft are racing to build practical quantum computers! ⚛️🚀"""
-    
-    # Science questions
-    if 'photosynthesis' in user_input_lower:
-        return "Cloudy ☁️: Photosynthesis is how plants make food! They use sunlight, water, and carbon dioxide to create glucose (sugar) and oxygen. The chlorophyll in leaves captures sunlight energy. Formula: 6CO₂ + 6H₂O + light → C₆H₁₂O₆ + 6O₂ 🌱"
-    
-    # Math questions
-    if 'pythagorean' in user_input_lower or 'pythagoras' in user_input_lower:
-        return "Cloudy ☁️: The Pythagorean theorem states that in a right triangle: a² + b² = c², where c is the hypotenuse (longest side) and a, b are the other two sides. Example: if a=3 and b=4, then c=5 because 3²+4²=9+16=25=5² 📐"
-    
-    if 'calculus' in user_input_lower:
-        return "Cloudy ☁️: Calculus has two main parts: Derivatives (rate of change - like speed from distance) and Integrals (accumulation - like distance from speed). It's used in physics, engineering, economics, and more! Think of it as the math of change and motion. 📊"
-    
-    # General knowledge
-    if 'capital' in user_input_lower and 'france' in user_input_lower:
-        return "Cloudy ☁️: The capital of France is Paris! 🇫🇷 It's known as the 'City of Light' and is famous for the Eiffel Tower, Louvre Museum, and delicious croissants!"
-    
-    if 'telephone' in user_input_lower and ('invent' in user_input_lower or 'who' in user_input_lower):
-        return "Cloudy ☁️: Alexander Graham Bell is credited with inventing the telephone in 1876. However, there's debate as Antonio Meucci developed a similar device earlier. Bell was first to patent it! 📞"
-    
-    # Business
-    if 'digital marketing' in user_input_lower or ('digital' in user_input_lower and 'marketing' in user_input_lower):
-        return "Cloudy ☁️: Digital marketing promotes products/services using digital channels like social media, search engines, email, and websites. It includes SEO, content marketing, social media ads, email campaigns, and analytics. It's cost-effective and measurable! 📱"
-    
-    if 'supply chain' in user_input_lower:
-        return "Cloudy ☁️: Supply chain management oversees the flow of goods from raw materials to final customers. It includes sourcing, production, inventory, warehousing, transportation, and delivery. Good SCM reduces costs and improves efficiency! 📦"
-    
-    # Health
-    if 'exercise' in user_input_lower and 'benefit' in user_input_lower:
-        return "Cloudy ☁️: Exercise benefits include: stronger heart and muscles, better mood (endorphins!), weight management, improved sleep, reduced disease risk, more energy, and better brain function. Aim for 30 minutes daily! 💪"
-    
-    # Education
-    if 'study' in user_input_lower and ('habit' in user_input_lower or 'improve' in user_input_lower):
-        return "Cloudy ☁️: Great study habits: 1) Set specific goals, 2) Create a schedule, 3) Use active recall (test yourself), 4) Take breaks (Pomodoro technique), 5) Teach others, 6) Stay organized, 7) Get enough sleep. Consistency is key! 📚"
-    
-    # OOP
-    if 'object' in user_input_lower and 'oriented' in user_input_lower:
-        return "Cloudy ☁️: Object-Oriented Programming (OOP) organizes code into 'objects' that contain data and methods. Key concepts: Classes (blueprints), Objects (instances), Inheritance (reusing code), Encapsulation (hiding details), Polymorphism (multiple forms). Makes code reusable and organized! 🎯"
+Companies like IBM, Google, and Microsoft are racing to build practical quantum computers! ⚛️🚀""",
+    'photosynthesis': "Cloudy ☁️: Photosynthesis is how plants make food! They use sunlight, water, and carbon dioxide to create glucose (sugar) and oxygen. The chlorophyll in leaves captures sunlight energy. Formula: 6CO₂ + 6H₂O + light → C₆H₁₂O₆ + 6O₂ 🌱",
+    'pythagorean': "Cloudy ☁️: The Pythagorean theorem states that in a right triangle: a² + b² = c², where c is the hypotenuse (longest side) and a, b are the other two sides. Example: if a=3 and b=4, then c=5 because 3²+4²=9+16=25=5² 📐",
+    'calculus': "Cloudy ☁️: Calculus has two main parts: Derivatives (rate of change - like speed from distance) and Integrals (accumulation - like distance from speed). It's used in physics, engineering, economics, and more! Think of it as the math of change and motion. 📊",
+    'capital_of_france': "Cloudy ☁️: The capital of France is Paris! 🇫🇷 It's known as the 'City of Light' and is famous for the Eiffel Tower, Louvre Museum, and delicious croissants!",
+    'telephone': "Cloudy ☁️: Alexander Graham Bell is credited with inventing the telephone in 1876. However, there's debate as Antonio Meucci developed a similar device earlier. Bell was first to patent it! 📞",
+    'digital_marketing': "Cloudy ☁️: Digital marketing promotes products/services using digital channels like social media, search engines, email, and websites. It includes SEO, content marketing, social media ads, email campaigns, and analytics. It's cost-effective and measurable! 📱",
+    'supply_chain': "Cloudy ☁️: Supply chain management oversees the flow of goods from raw materials to final customers. It includes sourcing, production, inventory, warehousing, transportation, and delivery. Good SCM reduces costs and improves efficiency! 📦",
+    'exercise_benefits': "Cloudy ☁️: Exercise benefits include: stronger heart and muscles, better mood (endorphins!), weight management, improved sleep, reduced disease risk, more energy, and better brain function. Aim for 30 minutes daily! 💪",
+    'study_habits': "Cloudy ☁️: Great study habits: 1) Set specific goals, 2) Create a schedule, 3) Use active recall (test yourself), 4) Take breaks (Pomodoro technique), 5) Teach others, 6) Stay organized, 7) Get enough sleep. Consistency is key! 📚",
+    'oop': "Cloudy ☁️: Object-Oriented Programming (OOP) organizes code into 'objects' that contain data and methods. Key concepts: Classes (blueprints), Objects (instances), Inheritance (reusing code), Encapsulation (hiding details), Polymorphism (multiple forms). Makes code reusable and organized! 🎯"
+}
+
+SIMPLE_REPLIES = {
+    'about_me': "Cloudy ☁️: I'm Cloudy, your friendly cloud-themed chatbot! I love talking about cloud computing, weather, and helping people. I'm here to chat and assist you with any questions! ☁️✨",
+    'cloud': "Cloudy ☁️: Great question about cloud computing! Cloud services offer scalability, flexibility, and cost-effectiveness. Popular providers include AWS, Azure, and Google Cloud Platform.",
+    'weather': "Cloudy ☁️: As a cloud, I love talking about weather! ☀️🌧️ I'm always floating around observing the sky!",
+    'how_are_you': "Cloudy ☁️: I'm doing great! Just floating around in the digital sky, ready to chat with you! ☁️✨",
+    'capabilities': "Cloudy ☁️: I can chat with you about many topics! I love discussing cloud computing, weather, answering questions, and having friendly conversations. What would you like to talk about?",
+    'time': "Cloudy ☁️: I don't have access to real-time information, but I'm always here to chat whenever you need me! ⏰",
+    'thanks': "Cloudy ☁️: You're very welcome! I'm always happy to help! 😊",
+    'goodbye': "Cloudy ☁️: Goodbye! It was lovely chatting with you! Come back anytime! 👋☁️"
+}
+
+@timed_provider('fallback')
+@traced('fallback')
+def get_intelligent_fallback(user_input, session_id='default', scan=None):
+    """Intelligent fallback responses with better context understanding"""
+    scan = scan or keyword_rules.scan(user_input)
+    topic = keyword_rules.first_match(scan, 'topic')
+    if topic:
+        return TOPIC_REPLIES[topic]
     
-    return get_simple_response(user_input_lower)
+    # Rules ignore case and spacing, so the scan of user_input serves the lowercased text too
+    return get_simple_response(user_input.lower().strip(), session_id, scan)
 
-def get_simple_response(user_input):
+def get_simple_response(user_input, session_id='default', scan=None):
     """Simple rule-based chatbot responses - completely free!"""
+    intent = keyword_rules.first_match(scan or keyword_rules.scan(user_input), 'simple')
+    name = chat_sessions.recall(session_id, 'name') if intent in ('greeting', 'ask_name') else None
     
     # Greetings
-    if any(word in user_input for word in ['hello', 'hi', 'hey', 'greetings']):
-        if user_memory.get('name'):
-            return f"Cloudy ☁️: Hello {user_memory['name']}! Great to see you again! How can I help you today?"
+    if intent == 'greeting':
+        if name:
+            return f"Cloudy ☁️: Hello {name}! Great to see you again! How can I help you today?"
         return "Cloudy ☁️: Hello! I'm Cloudy, your friendly cloud chatbot! How can I help you today?"
     
     # Personal questions - Name related
-    elif any(phrase in user_input for phrase in ['what is my name', 'my name is', 'call me', 'i am', 'my self', 'myself']):
-        # Check if asking for their name
-        if any(phrase in user_input for phrase in ['what is my name', 'what\'s my name']):
-            if user_memory.get('name'):
-                return f"Cloudy ☁️: Your name is {user_memory['name']}! I remember you! 😊"
-            else:
-                return "Cloudy ☁️: I don't know your name yet! Could you please tell me what you'd like me to call you?"
-        
-        # Extract name from the input - improved logic
-        elif any(phrase in user_input for phrase in ['my name is', 'call me', 'i am', 'my self', 'myself']):
-            words = user_input.split()
-            name = None
-            
-            # Look for name after common patterns
-            for i, word in enumerate(words):
-                if word in ['is', 'am'] and i + 1 < len(words):
-                    potential_name = words[i + 1].strip('.,!?').capitalize()
-                    if potential_name.isalpha() and len(potential_name) > 1:
-                        name = potential_name
-                        break
-            
-            if name:
-                user_memory['name'] = name  # Remember the name
-                return f"Cloudy ☁️: Nice to meet you, {name}! I'll remember your name. How can I help you today?"
-            return "Cloudy ☁️: Please tell me your name clearly, like 'My name is John' or 'Call me Sarah'!"
-    
-    # About yourself questions
-    elif any(phrase in user_input for phrase in ['tell me about yourself', 'who are you', 'what are you']):
-        return "Cloudy ☁️: I'm Cloudy, your friendly cloud-themed chatbot! I love talking about cloud computing, weather, and helping people. I'm here to chat and assist you with any questions! ☁️✨"
-    
-    # Cloud-related questions
-    elif any(word in user_input for word in ['cloud', 'aws', 'azure', 'gcp', 'google cloud']):
-        return "Cloudy ☁️: Great question about cloud computing! Cloud services offer scalability, flexibility, and cost-effectiveness. Popular providers include AWS, Azure, and Google Cloud Platform."
-    
-    # Weather
-    elif any(word in user_input for word in ['weather', 'rain', 'sunny', 'storm']):
-        return "Cloudy ☁️: As a cloud, I love talking about weather! ☀️🌧️ I'm always floating around observing the sky!"
-    
-    # How are you
-    elif any(phrase in user_input for phrase in ['how are you', 'how do you do', 'whats up', 'what\'s up']):
-        return "Cloudy ☁️: I'm doing great! Just floating around in the digital sky, ready to chat with you! ☁️✨"
-    
-    # Questions about capabilities
-    elif any(phrase in user_input for phrase in ['what can you do', 'help me', 'can you help']):
-        return "Cloudy ☁️: I can chat with you about many topics! I love discussing cloud computing, weather, answering questions, and having friendly conversations. What would you like to talk about?"
-    
-    # Time/Date questions
-    elif any(word in user_input for word in ['time', 'date', 'today', 'now']):
-        return "Cloudy ☁️: I don't have access to real-time information, but I'm always here to chat whenever you need me! ⏰"
+    elif intent == 'ask_name':
+        if name:
+            return f"Cloudy ☁️: Your name is {name}! I remember you! 😊"
+        else:
+            return "Cloudy ☁️: I don't know your name yet! Could you please tell me what you'd like me to call you?"
     
-    # Thank you
-    elif any(word in user_input for word in ['thank', 'thanks', 'appreciate']):
-        return "Cloudy ☁️: You're very welcome! I'm always happy to help! 😊"
+    # Extract name from the input - improved logic
+    elif intent == 'set_name':
+        words = user_input.split()
+        name = None
+        
+        # Look for name after common patterns
+        for i, word in enumerate(words):
+            if word in ['is', 'am'] and i + 1 < len(words):
+                potential_name = words[i + 1].strip('.,!?').capitalize()
+                if potential_name.isalpha() and len(potential_name) > 1:
+                    name = potential_name
+                    break
+        
+        if name:
+            chat_sessions.remember(session_id, 'name', name)  # Remember the name for this session
+            return f"Cloudy ☁️: Nice to meet you, {name}! I'll remember your name. How can I help you today?"
+        return "Cloudy ☁️: Please tell me your name clearly, like 'My name is John' or 'Call me Sarah'!"
     
-    # Goodbye
-    elif any(word in user_input for word in ['bye', 'goodbye', 'see you', 'farewell']):
-        return "Cloudy ☁️: Goodbye! It was lovely chatting with you! Come back anytime! 👋☁️"
+    # About me, cloud, weather, how are you, capabilities, time, thanks, goodbye
+    elif intent in SIMPLE_REPLIES:
+        return SIMPLE_REPLIES[intent]
     
     # Questions (ending with ?)
     elif user_input.endswith('?'):
@@ -755,6 +1705,9 @@ def get_simple_response(user_input):
         ]
         return random.choice(responses)
 
+if PROVIDER_WARM_UP:
+    provider_registry.warm_up(delay=PROVIDER_WARM_UP_DELAY)
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 CLOUDY AI CHATBOT - STARTING UP")
@@ -764,7 +1717,7 @@ if __name__ == '__main__':
     # Enhanced Ollama status check
     if OLLAMA_AVAILABLE:
         try:
-            models = ollama.list()
+            models = provider_registry.get('Ollama').list()
             if models and 'models' in models and len(models['models']) > 0:
                 print(f"✅ Ollama: Available with {len(models['models'])} model(s)")
                 print(f"   🤖 Primary Model: {OLLAMA_MODEL}")
@@ -789,6 +1742,9 @@ if __name__ == '__main__':
     print(f"{'✅' if BS4_AVAILABLE else '❌'} BeautifulSoup: {'Available' if BS4_AVAILABLE else 'Not installed'}")
     print("="*60)
     print(f"🌐 Server starting at http://127.0.0.1:5000")
-    print(f"🤖 AI Priority: Ollama → OpenAI → Gemini → Fallback")
+    if router.mode == 'adaptive':
+        print(f"🤖 AI Priority: adaptive (Ollama → OpenAI → Gemini → Fallback until measured, see /stats/routing)")
+    else:
+        print(f"🤖 AI Priority: Ollama → OpenAI → Gemini → Fallback")
     print("="*60 + "\n")
     app.run(debug=True)
@@ -0,0 +1,238 @@
+"""
+Circuit breakers for the AI providers
+Counts consecutive failures per provider, classifies them (auth, quota,
+timeout, 5xx), and stops calling a dead provider for a backoff window so it
+costs nothing on the hot path. After the window one half-open probe request
+is let through to test whether the provider has recovered.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from event_log import log_event
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Failure kinds
+AUTH = 'auth'
+QUOTA = 'quota'
+TIMEOUT = 'timeout'
+SERVER_ERROR = '5xx'
+OTHER = 'other'
+
+# Base backoff (seconds) per failure kind; doubled each time the breaker re-opens
+DEFAULT_BACKOFF = {
+    AUTH: 300,  # A bad key won't fix itself quickly
+    QUOTA: 60,
+    TIMEOUT: 15,
+    SERVER_ERROR: 10,
+    OTHER: 10,
+}
+
+# Failure kinds that open the breaker straight away instead of after the threshold
+OPEN_IMMEDIATELY = (AUTH, QUOTA)
+
+
+def classify_failure(error=None, status_code=None):
+    """Classify a provider failure from an exception and/or HTTP status code"""
+    status = status_code or _status_from_error(error)
+    if status in (401, 403):
+        return AUTH
+    if status == 429:
+        return QUOTA
+    if status in (408, 504):
+        return TIMEOUT
+    if status and status >= 500:
+        return SERVER_ERROR
+
+    if error is None:
+        return OTHER
+    name = type(error).__name__.lower()
+    text = str(error).lower()
+    if 'timeout' in name or 'deadline' in name or 'timed out' in text:
+        return TIMEOUT
+    if 'auth' in name or 'permission' in name or ('invalid' in text and 'key' in text):
+        return AUTH
+    if 'ratelimit' in name or 'resourceexhausted' in name or 'quota' in text or 'rate limit' in text:
+        return QUOTA
+    if 'connection' in name or 'unavailable' in name or 'connection refused' in text:
+        return SERVER_ERROR
+    return OTHER
+
+
+def retry_after_seconds(error=None, headers=None):
+    """Read a Retry-After header (seconds or HTTP date) from headers or an error's response"""
+    if headers is None:
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    value = headers.get('retry-after') or headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_from_error(error):
+    if error is None:
+        return None
+    for candidate in (getattr(error, 'status_code', None),
+                      getattr(getattr(error, 'response', None), 'status_code', None),
+                      getattr(error, 'code', None)):
+        try:
+            if candidate is not None:
+                return int(candidate)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class CircuitBreaker:
+    """Closed → open after repeated failures → half-open probe → closed"""
+
+    def __init__(self, name, failure_threshold=3, backoff=None, max_backoff=900, probe_timeout=60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = dict(DEFAULT_BACKOFF, **(backoff or {}))
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._times_opened = 0
+        self._open_until = 0.0
+        self._probe_started = None
+        self._last_failure = None
+        self._total_failures = 0
+        self._total_rejected = 0
+
+    def allow_request(self):
+        """Return True if a call may go ahead; False means skip this provider"""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return True
+
+            if self._state == OPEN:
+                if now < self._open_until:
+                    self._total_rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probe_started = None
+
+            # Half-open: let a single probe through (or a new one if it got lost)
+            if self._probe_started is None or now - self._probe_started > self.probe_timeout:
+                self._probe_started = now
+                return True
+            self._total_rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                log_event('circuit_closed', provider=self.name)
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._times_opened = 0
+            self._probe_started = None
+
+    def record_failure(self, error=None, status_code=None, headers=None):
+        """Record a failed call; returns the failure kind"""
+        kind = classify_failure(error, status_code)
+        retry_after = retry_after_seconds(error, headers)
+
+        with self._lock:
+            self._consecutive_failures += 1
+            self._total_failures += 1
+            self._last_failure = {
+                'kind': kind,
+                'error': str(error)[:200] if error else f"HTTP {status_code}",
+                'time': time.time()
+            }
+
+            should_open = (
+                self._state == HALF_OPEN
+                or kind in OPEN_IMMEDIATELY
+                or self._consecutive_failures >= self.failure_threshold
+            )
+            if should_open:
+                self._times_opened += 1
+                if retry_after is not None:
+                    window = retry_after
+                else:
+                    window = self.backoff.get(kind, self.backoff[OTHER]) * 2 ** (self._times_opened - 1)
+                window = min(window, self.max_backoff)
+                self._state = OPEN
+                self._open_until = time.monotonic() + window
+                self._probe_started = None
+                log_event('circuit_opened', level='warning', provider=self.name, kind=kind,
+                          window=round(window, 1), times_opened=self._times_opened)
+        return kind
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = max(0.0, self._open_until - time.monotonic()) if self._state == OPEN else 0.0
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'total_failures': self._total_failures,
+                'rejected_calls': self._total_rejected,
+                'retry_in': round(retry_in, 1),
+                'last_failure': self._last_failure
+            }
+
+
+def guarded_stream(breaker, make_stream):
+    """Yield from make_stream() while reporting the outcome to breaker"""
+    if not breaker.allow_request():
+        return
+
+    succeeded = False
+    try:
+        for chunk in make_stream():
+            if not succeeded:
+                breaker.record_success()
+                succeeded = True
+            yield chunk
+    except Exception as e:
+        if not succeeded:
+            breaker.record_failure(e)
+        raise
+
+    if not succeeded:
+        breaker.record_success()
+
+
+async def guarded_stream_async(breaker, make_stream):
+    """guarded_stream for async iterators (make_stream() returns one, e.g. an async generator)"""
+    if not breaker.allow_request():
+        return
+
+    succeeded = False
+    try:
+        async for chunk in make_stream():
+            if not succeeded:
+                breaker.record_success()
+                succeeded = True
+            yield chunk
+    except Exception as e:
+        if not succeeded:
+            breaker.record_failure(e)
+        raise
+
+    if not succeeded:
+        breaker.record_success()
@@ -0,0 +1,210 @@
+"""
+Conversation context for Cloudy AI's LLM prompts
+Builds the history part of a prompt within a per-provider token budget:
+- every stored message carries its token count, computed once at append
+- the newest turns that fit the budget are sent verbatim
+- older turns are folded into a rolling summary by a background worker, so
+  prompt size (and prefill time) stays flat as a conversation grows
+
+Token counts are estimates (no tokenizer dependency): roughly one token per
+short word or word piece, digit group, punctuation mark or symbol, which
+tracks BPE tokenizers closely enough for budgeting.
+"""
+
+import json
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from event_log import log_event
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+
+# Per-message overhead of chat formats (role markers, separators)
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_KEY = 'summary'
+CLOUDY_PREFIX = "Cloudy ☁️:"
+
+
+def count_tokens(text):
+    """Estimated token count of text"""
+    return len(_TOKEN_PATTERN.findall(text)) if text else 0
+
+
+def message_anchor(message):
+    """Stable identity of a stored message (same in every process and backend)"""
+    return f"{message.timestamp}:{message.role}:{zlib.crc32(message.content.encode('utf-8'))}"
+
+
+def extractive_summary(previous, messages, max_tokens):
+    """Summary without an LLM: the first sentence of each turn, newest kept if it runs long"""
+    lines = [previous] if previous else []
+    for message in messages:
+        first_sentence = re.split(r'(?<=[.!?])\s', message.content.replace(CLOUDY_PREFIX, '').strip(), 1)[0]
+        lines.append(f"{'User' if message.role == 'user' else 'Cloudy'}: {first_sentence[:200]}")
+    while len(lines) > 1 and count_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+class ConversationContext:
+    """The history of one request: rolling summary plus unsummarized turns (oldest first)"""
+
+    def __init__(self, summary, summary_tokens, turns, input_tokens=0, session_id=None):
+        self.session_id = session_id
+        self.summary = summary
+        self.summary_tokens = summary_tokens
+        self.turns = turns
+        self.input_tokens = input_tokens  # Of the current message, which is sent after the history
+        self._selected = {}
+
+    @property
+    def is_empty(self):
+        return not self.summary and not self.turns
+
+    @property
+    def last_reply(self):
+        """Content of the latest assistant turn, or None"""
+        if self.turns and self.turns[-1].role == 'assistant':
+            return self.turns[-1].content
+        return None
+
+    def select(self, budget):
+        """(summary or None, newest turns) that fit in budget tokens"""
+        if budget not in self._selected:
+            available = budget
+            summary = None
+            if self.summary and self.summary_tokens + MESSAGE_OVERHEAD <= available:
+                summary = self.summary
+                available -= self.summary_tokens + MESSAGE_OVERHEAD
+            selected = []
+            for message in reversed(self.turns):
+                cost = message.tokens + MESSAGE_OVERHEAD
+                if cost > available:
+                    break
+                selected.append(message)
+                available -= cost
+            selected.reverse()
+            self._selected[budget] = (summary, selected)
+        return self._selected[budget]
+
+    def chat_messages(self, system_prompt, user_input, budget):
+        """Chat-format messages (Ollama, OpenAI) for the provider's prompt budget"""
+        summary, turns = self.select(budget)
+        if summary:
+            system_prompt = f"{system_prompt}\nSummary of the earlier conversation:\n{summary}"
+        messages = [{'role': 'system', 'content': system_prompt}]
+        messages += [{'role': message.role, 'content': message.content} for message in turns]
+        messages.append({'role': 'user', 'content': user_input})
+        return messages
+
+    def transcript(self, budget):
+        """Plain-text history for single-prompt providers (Gemini)"""
+        summary, turns = self.select(budget)
+        lines = []
+        if summary:
+            lines.append(f"Summary of the earlier conversation:\n{summary}\n")
+        lines += [f"{'User' if message.role == 'user' else 'Cloudy'}: {message.content}" for message in turns]
+        return '\n'.join(lines)
+
+
+EMPTY_CONTEXT = ConversationContext(None, 0, [])
+
+
+class ContextBuilder:
+    """Reads recent history from a session store and maintains each session's rolling summary
+
+    summarize(previous_summary, messages, max_tokens) returns the new summary
+    text; it runs on a background thread, never on the request path.
+    """
+
+    def __init__(self, store, summarize=None, history_limit=40, keep_recent=6, summarize_after=12,
+                 summarize_over_tokens=600, summary_tokens=200):
+        self.store = store
+        self.summarize = summarize or extractive_summary
+        self.history_limit = history_limit  # Messages read per request
+        self.keep_recent = keep_recent  # Newest messages never folded into the summary
+        self.summarize_after = summarize_after  # Unsummarized messages that trigger summarization...
+        self.summarize_over_tokens = summarize_over_tokens  # ...or their total tokens
+        self.summary_tokens = summary_tokens
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='context-summarizer')
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._stats = {'requests': 0, 'summaries': 0, 'summary_failures': 0}
+
+    def for_request(self, session_id, user_input):
+        """The ConversationContext for a message that was just appended to the session"""
+        history = self.store.history(session_id, limit=self.history_limit)
+        # The current message is already stored (with its token count); it is sent separately
+        if history and history[-1].role == 'user' and history[-1].content == user_input:
+            input_tokens = history.pop().tokens
+        else:
+            input_tokens = count_tokens(user_input)
+
+        summary, summary_tokens, anchor = self._load_summary(session_id)
+        if anchor:
+            # Turns up to the anchor are covered by the summary
+            for index in range(len(history) - 1, -1, -1):
+                if message_anchor(history[index]) == anchor:
+                    history = history[index + 1:]
+                    break
+
+        with self._lock:
+            self._stats['requests'] += 1
+        if len(history) > self.keep_recent and (
+                len(history) > self.summarize_after or
+                sum(message.tokens for message in history) > self.summarize_over_tokens):
+            self._schedule_summary(session_id, summary, history[:-self.keep_recent or None])
+        return ConversationContext(summary, summary_tokens, history, input_tokens, session_id)
+
+    def _load_summary(self, session_id):
+        stored = self.store.recall(session_id, SUMMARY_KEY)
+        if not stored:
+            return None, 0, None
+        try:
+            data = json.loads(stored)
+            return data['text'], data['tokens'], data['anchor']
+        except (ValueError, KeyError, TypeError):
+            return None, 0, None
+
+    def _schedule_summary(self, session_id, previous, messages):
+        with self._lock:
+            if session_id in self._in_flight:
+                return
+            self._in_flight.add(session_id)
+        self._executor.submit(self._summarize_session, session_id, previous, messages)
+
+    def _summarize_session(self, session_id, previous, messages):
+        try:
+            text = self.summarize(previous, messages, self.summary_tokens)
+            if not text:
+                raise ValueError("empty summary")
+            self.store.remember(session_id, SUMMARY_KEY, json.dumps({
+                'text': text,
+                'tokens': count_tokens(text),
+                'anchor': message_anchor(messages[-1])
+            }, ensure_ascii=False))
+            with self._lock:
+                self._stats['summaries'] += 1
+            log_event('context_summarized', level='debug', messages=len(messages), tokens=count_tokens(text))
+        except Exception as e:
+            with self._lock:
+                self._stats['summary_failures'] += 1
+            log_event('context_summary_failed', level='warning', error=str(e))
+        finally:
+            with self._lock:
+                self._in_flight.discard(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'history_limit': self.history_limit,
+                'keep_recent': self.keep_recent,
+                'summarize_after': self.summarize_after,
+                'summarize_over_tokens': self.summarize_over_tokens,
+                'summaries_in_flight': len(self._in_flight),
+                **self._stats
+            }
@@ -0,0 +1,79 @@
+"""
+End-to-end request deadlines
+A Deadline is the time budget of one request. Web search, each provider
+attempt, its retries and the wait for an Ollama slot all take their
+timeouts from what is left of it, so a reply never takes much longer than
+the budget plus the instant rule-based fallback.
+
+The deadline is passed explicitly to the provider chain. While an attempt
+runs it is also bound to the current context (applied()), so that pooled
+HTTP clients cap their socket timeouts to it without each SDK call taking
+a timeout argument.
+"""
+
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar('deadline', default=None)
+
+
+class Deadline:
+    """A fixed budget in seconds from creation; Deadline() has no limit"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.expires = None if budget is None else self.started + budget
+
+    @property
+    def bounded(self):
+        return self.expires is not None
+
+    def remaining(self):
+        """Seconds left (math.inf without a limit)"""
+        if self.expires is None:
+            return math.inf
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, seconds):
+        """Whether at least seconds are left"""
+        return self.remaining() >= seconds
+
+    def cap(self, timeout):
+        """timeout shortened to the budget left; None (no timeout) becomes the budget left"""
+        if self.expires is None:
+            return timeout
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    @contextmanager
+    def applied(self):
+        """Make this the current_deadline() for the with-block"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def as_dict(self):
+        return {
+            'budget': self.budget,
+            'elapsed': round(self.elapsed(), 4),
+            'remaining': round(self.remaining(), 4) if self.bounded else None
+        }
+
+
+NO_DEADLINE = Deadline()
+
+
+def current_deadline():
+    """The deadline applied to the running code, or NO_DEADLINE"""
+    return _current.get() or NO_DEADLINE
@@ -0,0 +1,206 @@
+"""
+Structured event logging for Cloudy AI
+Request threads only enqueue small dicts; a background writer thread
+batches them into a size-rotated JSONL file. Logging never blocks the
+hot path: when the queue is full, events are dropped and counted.
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+# logs/ next to app/, whatever the working directory
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'chatbot.jsonl')
+
+_FLUSH = object()
+_STOP = object()
+
+
+class EventLogger:
+    """Queue-backed JSONL logger with per-level sampling and size-based rotation"""
+
+    def __init__(self, path=DEFAULT_PATH, min_level='info', sample_rates=None,
+                 max_bytes=10 * 1024 * 1024, backup_count=5, batch_size=256,
+                 flush_interval=1.0, queue_size=10000, echo=False):
+        self.path = path
+        self.min_level = LEVELS.get(min_level, 20)
+        self.sample_rates = sample_rates or {}
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.echo = echo
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._flushed = threading.Condition()
+        self._flush_generation = 0
+        self.dropped = 0
+        self.written = 0
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+        self._thread.start()
+
+    def log(self, event, level='info', **fields):
+        """Enqueue one event; returns immediately"""
+        level_no = LEVELS.get(level, 20)
+        if level_no < self.min_level:
+            return
+        rate = self.sample_rates.get(level, 1.0)
+        if rate < 1.0 and random.random() >= rate:
+            return
+
+        record = {'ts': round(time.time(), 6), 'level': level, 'event': event}
+        record.update(fields)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """Block until everything enqueued so far has been written"""
+        with self._flushed:
+            target = self._flush_generation + 1
+        try:
+            self._queue.put(_FLUSH, timeout=timeout)
+        except queue.Full:
+            return False
+        with self._flushed:
+            return self._flushed.wait_for(lambda: self._flush_generation >= target, timeout=timeout)
+
+    def close(self, timeout=5.0):
+        """Flush and stop the writer (registered with atexit)"""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped
+        }
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            flush_requested = False
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                batch.append(item)
+                # Drain whatever else is already waiting, up to batch_size
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            records = []
+            for item in batch:
+                if item is _FLUSH:
+                    flush_requested = True
+                elif item is _STOP:
+                    stop = flush_requested = True
+                else:
+                    records.append(item)
+
+            if records:
+                self._write(records)
+            if flush_requested:
+                if self._file:
+                    self._file.flush()
+                with self._flushed:
+                    self._flush_generation += 1
+                    self._flushed.notify_all()
+
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, records):
+        lines = []
+        for record in records:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            except (TypeError, ValueError):
+                lines.append(json.dumps({'ts': record.get('ts'), 'level': 'error',
+                                         'event': 'unserializable_log_event'}))
+            if self.echo:
+                print(_format_echo(record))
+
+        try:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write('\n'.join(lines) + '\n')
+            self._file.flush()
+            self.written += len(lines)
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            self.dropped += len(lines)
+            print(f"Event log write failed: {e}")
+
+    def _rotate(self):
+        """chatbot.jsonl -> chatbot.jsonl.1 -> ... -> chatbot.jsonl.<backup_count>"""
+        self._file.close()
+        self._file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def _format_echo(record):
+    fields = ' '.join(f"{k}={v}" for k, v in record.items() if k not in ('ts', 'level', 'event'))
+    return f"[{record['level']}] {record['event']} {fields}".rstrip()
+
+
+_logger = None
+_logger_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """Create (or replace) the process-wide logger"""
+    global _logger
+    with _logger_lock:
+        if _logger is not None:
+            _logger.close()
+        _logger = EventLogger(**kwargs)
+    return _logger
+
+
+def get_logger():
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = EventLogger()
+    return _logger
+
+
+def log_event(event, level='info', **fields):
+    """Log a structured event through the process-wide logger"""
+    get_logger().log(event, level, **fields)
+
+
+@atexit.register
+def _flush_on_exit():
+    if _logger is not None:
+        _logger.close()
@@ -0,0 +1,149 @@
+"""
+Speculative web search for Cloudy AI
+A question that wants current information used to wait for the web search,
+and went on to the AI providers only when the search found nothing, paying
+for both one after the other. With a Grounding the search runs in the
+background while the request goes on to the provider chain.
+
+The provider chain starts at once. An attempt that puts the results into
+its prompt and starts within `wait` seconds of the search waits for them at
+most until then; a later one only takes results that are already in.
+Providers that can't use them never wait. When results are in, the attempt's prompt carries them as numbered
+sources (grounding) and the reply gets a sources footer. Otherwise the
+provider answers on its own, and the results are used only if every
+provider fails. Everything stays within the request's deadline.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from deadline import NO_DEADLINE
+from event_log import log_event
+from tracing import span
+from web_pages import excerpt
+
+# Background searches of the sync app (the web searcher has its own pool for the upstream calls)
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('WEB_GROUNDING_WORKERS', '8')),
+    thread_name_prefix='web-grounding'
+)
+
+GROUNDING_PROMPT = """Web search results for the message below (they may be newer than what you know):
+
+{sources}
+
+Use them where they are relevant and mention the numbers of the sources you used.
+
+Message: {message}"""
+
+
+class Grounding:
+    """A web search started alongside the provider chain, for providers to ground their prompts in"""
+
+    def __init__(self, future, wait=1.5, max_results=3, excerpt_chars=600):
+        self.wait = wait  # Seconds after the start that a provider may hold its call for the results
+        self.max_results = max_results
+        self.excerpt_chars = excerpt_chars
+        self.started = time.perf_counter()
+        self.arrived = None  # Seconds after the start the results came in
+        self.used_by = set()  # Providers whose prompt carried the results
+        self._future = future  # concurrent.futures.Future, or an asyncio task in the ASGI app
+        future.add_done_callback(self._done)
+
+    @classmethod
+    def start(cls, search, query, deadline=NO_DEADLINE, **options):
+        """Run search(query, deadline) on the background pool (in a copy of the caller's context)"""
+        future = _executor.submit(contextvars.copy_context().run, search, query, deadline)
+        return cls(future, **options)
+
+    @classmethod
+    def start_async(cls, search, query, deadline=NO_DEADLINE, **options):
+        """Run the coroutine function search(query, deadline) as a task on the running loop"""
+        return cls(asyncio.ensure_future(search(query, deadline)), **options)
+
+    def results(self, timeout=0.0):
+        """The search results if they are in within timeout seconds, else None
+
+        Only the sync app's searches can be waited for here; a task's results
+        are returned if they are already in (use results_async to wait).
+        """
+        if not self._future.done() and timeout > 0 and not isinstance(self._future, asyncio.Future):
+            try:
+                self._future.result(timeout=timeout)
+            except Exception:
+                pass  # Still running, or failed (the search logs its own errors)
+        return self._finished()
+
+    async def results_async(self, timeout=0.0):
+        if not self._future.done() and timeout > 0:
+            await asyncio.wait([self._future], timeout=timeout)
+        return self._finished()
+
+    def wait_for(self, deadline=NO_DEADLINE):
+        """Wait for the results until the end of the wait (traced as web_grounding_wait)"""
+        if not self._future.done():
+            with span('web_grounding_wait'):
+                return self.results(self._window(deadline))
+        return self.results()
+
+    async def wait_for_async(self, deadline=NO_DEADLINE):
+        if not self._future.done():
+            with span('web_grounding_wait'):
+                return await self.results_async(self._window(deadline))
+        return await self.results_async()
+
+    def ground(self, user_input, provider, deadline=NO_DEADLINE):
+        """user_input for provider's prompt: with the search results if they are in by the end of the wait"""
+        return self._prompt(user_input, provider, self.wait_for(deadline))
+
+    async def ground_async(self, user_input, provider, deadline=NO_DEADLINE):
+        return self._prompt(user_input, provider, await self.wait_for_async(deadline))
+
+    def grounded(self, provider):
+        return provider in self.used_by
+
+    def sources(self):
+        """Footer listing the sources a grounded reply was given"""
+        results = self.results()
+        lines = [f"[{index}] {result.get('title') or result.get('href')}: {result.get('href')}"
+                 for index, result in enumerate((results or [])[:self.max_results], 1)]
+        return "\n\n🔗 Sources:\n" + "\n".join(lines) if lines else ""
+
+    def summary(self, provider=None):
+        """Fields for the web_grounding event of a finished request"""
+        return {
+            'wait': self.wait,
+            'arrived': round(self.arrived, 3) if self.arrived is not None else None,
+            'used_by': sorted(self.used_by),
+            'grounded': self.grounded(provider)
+        }
+
+    def _finished(self):
+        future = self._future
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def _window(self, deadline):
+        return max(0.0, min(self.started + self.wait - time.perf_counter(), deadline.remaining()))
+
+    def _prompt(self, user_input, provider, results):
+        if not results:
+            return user_input
+        self.used_by.add(provider)
+        sources = "\n\n".join(
+            f"[{index}] {result.get('title', '')}\n"
+            f"{excerpt(result.get('text') or result.get('body', ''), self.excerpt_chars)}\n{result.get('href', '')}"
+            for index, result in enumerate(results[:self.max_results], 1))
+        return GROUNDING_PROMPT.format(sources=sources, message=user_input)
+
+    def _done(self, future):
+        if future.cancelled():
+            return
+        future.exception()  # Retrieved, so a failed task isn't reported as never retrieved
+        self.arrived = time.perf_counter() - self.started
+        if self.arrived > self.wait:
+            log_event('web_grounding_late', level='debug', arrived=round(self.arrived, 3), wait=self.wait)
@@ -0,0 +1,153 @@
+"""
+Pooled, keep-alive HTTP clients for the outbound providers
+Each provider gets one long-lived client, so a request reuses an open
+connection instead of paying for a TCP (and, for the cloud APIs, TLS)
+handshake every time:
+- Hugging Face: a requests.Session with a sized urllib3 pool
+- Ollama and OpenAI: their SDK clients on a shared-settings httpx pool
+Pool size, keep-alive and connect/read timeouts are set per provider
+(PoolSettings.from_env). ProviderClients owns the clients from app startup
+until close() at shutdown.
+
+Timeouts are also capped to the current request deadline (deadline.py):
+the httpx clients through a request hook, requests calls through
+PoolSettings.timeout().
+"""
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deadline import current_deadline
+from event_log import log_event
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+class PoolSettings:
+    """Connection pool and timeouts of one provider's client"""
+
+    def __init__(self, pool_size=10, keepalive=10, keepalive_expiry=60.0, connect_timeout=3.0, read_timeout=30.0):
+        self.pool_size = pool_size  # Connections open at once
+        self.keepalive = min(keepalive, pool_size)  # Idle connections kept for reuse
+        self.keepalive_expiry = keepalive_expiry  # Seconds an idle connection is kept
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout  # Longest wait for the next bytes of a response
+
+    @classmethod
+    def from_env(cls, prefix, **defaults):
+        """Settings from {prefix}_HTTP_POOL_SIZE etc., falling back to HTTP_POOL_SIZE etc., then defaults"""
+        values = {}
+        for field, cast in (('pool_size', int), ('keepalive', int), ('keepalive_expiry', float),
+                            ('connect_timeout', float), ('read_timeout', float)):
+            name = f"HTTP_{field.upper()}"
+            value = os.getenv(f"{prefix}_{name}", os.getenv(name))
+            if value is not None:
+                values[field] = cast(value)
+            elif field in defaults:
+                values[field] = defaults[field]
+        return cls(**values)
+
+    def timeout(self):
+        """(connect, read) for requests, capped to the current deadline"""
+        deadline = current_deadline()
+        return (_at_least(deadline.cap(self.connect_timeout)), _at_least(deadline.cap(self.read_timeout)))
+
+    def httpx_timeout(self):
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def httpx_limits(self):
+        return httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.keepalive,
+                            keepalive_expiry=self.keepalive_expiry)
+
+    def httpx_options(self, asynchronous=False):
+        """Keyword arguments of an httpx client (or an SDK client that passes them on) with these settings"""
+        hook = _cap_to_deadline_async if asynchronous else _cap_to_deadline
+        return {'limits': self.httpx_limits(), 'timeout': self.httpx_timeout(), 'event_hooks': {'request': [hook]}}
+
+    def as_dict(self):
+        return {
+            'pool_size': self.pool_size,
+            'keepalive': self.keepalive,
+            'keepalive_expiry': self.keepalive_expiry,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout
+        }
+
+
+def requests_session(settings):
+    """requests.Session that keeps up to settings.keepalive connections per host open"""
+    session = requests.Session()
+    # urllib3 opens extra connections past pool_maxsize when busy, but only keeps that many idle
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.keepalive, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def httpx_client(settings, **kwargs):
+    return httpx.Client(**settings.httpx_options(), **kwargs)
+
+
+def httpx_async_client(settings, **kwargs):
+    return httpx.AsyncClient(**settings.httpx_options(asynchronous=True), **kwargs)
+
+
+def _cap_to_deadline(request):
+    """httpx request hook: shorten the request's timeouts to the current deadline (retries included)"""
+    deadline = current_deadline()
+    if deadline.bounded:
+        timeouts = request.extensions.get('timeout', {})
+        request.extensions['timeout'] = {name: _at_least(deadline.cap(value)) for name, value in timeouts.items()}
+
+
+async def _cap_to_deadline_async(request):
+    _cap_to_deadline(request)
+
+
+def _at_least(timeout, floor=0.01):
+    # A zero socket timeout would mean non-blocking, not "already expired"
+    return None if timeout is None else max(timeout, floor)
+
+
+class ProviderClients:
+    """The long-lived client of each provider, closed together at shutdown"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}  # provider -> (client, close)
+        self._settings = {}
+
+    def register(self, provider, settings, client, close=None):
+        """Keep client until close(); close defaults to client.close. Returns client."""
+        with self._lock:
+            self._clients[provider] = (client, close or client.close)
+            self._settings[provider] = settings
+        return client
+
+    def get(self, provider):
+        entry = self._clients.get(provider)
+        return entry[0] if entry else None
+
+    def settings(self, provider):
+        return self._settings.get(provider)
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for provider, (client, close) in clients.items():
+            try:
+                close()
+            except Exception as e:
+                log_event('http_client_close_failed', level='warning', provider=provider, error=str(e))
+
+    def stats(self):
+        with self._lock:
+            return {provider: {'open': provider in self._clients, **settings.as_dict()}
+                    for provider, settings in self._settings.items()}
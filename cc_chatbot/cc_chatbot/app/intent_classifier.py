@@ -0,0 +1,177 @@
+"""
+Intent classifier for Cloudy AI
+Loads intent files ({"intents": [{"tag", "patterns", "responses"}]}),
+embeds every pattern into one matrix (see text_embedding.py) and
+classifies a message with a single matrix-vector product plus a per-intent
+max. The pattern matrix is cached on disk keyed by the file contents, so
+start-up stays fast as the intent set grows.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+from event_log import log_event
+from text_embedding import NUMPY_AVAILABLE, EMBEDDING_DIM, EMBEDDING_VERSION, embed_many
+
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+IntentMatch = namedtuple('IntentMatch', 'tag confidence margin')
+
+
+class IntentClassifier:
+    """Nearest-pattern intent classification with a confidence threshold"""
+
+    def __init__(self, paths, threshold=0.8, min_margin=0.05, dim=EMBEDDING_DIM, cache_path=None):
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for the intent classifier (pip install numpy)")
+
+        self.paths = list(paths)
+        self.threshold = threshold
+        self.min_margin = min_margin  # Required lead over the runner-up intent
+        self.dim = dim
+        self.cache_path = cache_path
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load_info = {}
+        self.load()
+
+    def load(self):
+        """(Re)load the intent files; the pattern matrix comes from the disk cache when possible"""
+        started = time.perf_counter()
+        digest = hashlib.sha256(f"v{EMBEDDING_VERSION}:{self.dim}".encode())
+        intents = {}  # tag -> {'tag', 'patterns', 'responses'}; files later in the list extend earlier ones
+        for path in self._files():
+            try:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+                data = json.loads(raw)
+            except (OSError, ValueError) as e:
+                log_event('intent_file_failed', level='warning', path=path, error=str(e))
+                continue
+            digest.update(raw)
+            for intent in data.get('intents', []):
+                merged = intents.setdefault(intent['tag'], {'tag': intent['tag'], 'patterns': [], 'responses': []})
+                merged['patterns'] += intent.get('patterns', [])
+                merged['responses'] += intent.get('responses', [])
+
+        # Intents need at least one pattern to be matched and one response to answer with
+        intents = [i for i in intents.values() if i['patterns'] and i['responses']]
+        patterns = [p for intent in intents for p in intent['patterns']]
+        # Each intent's patterns are contiguous rows; starts[i] is its first row
+        counts = [len(intent['patterns']) for intent in intents]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64) if counts else np.zeros(0, np.int64)
+
+        key = digest.hexdigest()
+        matrix = self._load_cached_matrix(key, len(patterns))
+        from_cache = matrix is not None
+        if not from_cache:
+            matrix = embed_many(patterns, self.dim)
+            self._save_cached_matrix(key, matrix)
+
+        with self._lock:
+            self._intents = intents
+            self._responses = {intent['tag']: intent['responses'] for intent in intents}
+            self._matrix = matrix
+            self._starts = starts
+            self._load_info = {
+                'load_seconds': round(time.perf_counter() - started, 4),
+                'matrix_from_cache': from_cache
+            }
+        log_event('intents_loaded', intents=len(intents), patterns=len(patterns), **self._load_info)
+        return len(intents)
+
+    def _files(self):
+        """The configured paths, with directories expanded to the *.json files inside them"""
+        for path in self.paths:
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    if name.endswith('.json'):
+                        yield os.path.join(path, name)
+            else:
+                yield path
+
+    def classify(self, text):
+        """Return the IntentMatch for text (tag is None if there are no intents)"""
+        return self.classify_many([text])[0]
+
+    def classify_many(self, texts):
+        """Score every text against every pattern in one (texts x dim) @ (dim x patterns) product"""
+        with self._lock:
+            intents, matrix, starts = self._intents, self._matrix, self._starts
+        if not intents:
+            return [IntentMatch(None, 0.0, 0.0) for _ in texts]
+
+        scores = embed_many(texts, self.dim) @ matrix.T  # (texts, patterns)
+        per_intent = np.maximum.reduceat(scores, starts, axis=1)  # (texts, intents)
+        best = per_intent.argmax(axis=1)
+        rows = np.arange(len(texts))
+        confidence = per_intent[rows, best]
+        if len(intents) > 1:
+            runner_up = np.partition(per_intent, -2, axis=1)[:, -2]
+        else:
+            runner_up = np.zeros(len(texts), dtype=per_intent.dtype)
+
+        return [IntentMatch(intents[b]['tag'], round(float(c), 4), round(float(c - r), 4))
+                for b, c, r in zip(best, confidence, runner_up)]
+
+    def is_confident(self, match):
+        return match.tag is not None and match.confidence >= self.threshold and match.margin >= self.min_margin
+
+    def respond(self, text):
+        """Return (IntentMatch, response) for a high-confidence match, or None"""
+        match = self.classify(text)
+        if not self.is_confident(match):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            responses = self._responses[match.tag]
+        return match, random.choice(responses)
+
+    def stats(self):
+        with self._lock:
+            answered = self.hits + self.misses
+            return {
+                'intents': len(self._intents),
+                'patterns': int(self._matrix.shape[0]),
+                'matrix_mb': round(self._matrix.nbytes / 1024 / 1024, 1),
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / answered, 4) if answered else 0.0,
+                **self._load_info
+            }
+
+    def _load_cached_matrix(self, key, rows):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path) as cached:
+                if str(cached['key']) != key or cached['matrix'].shape != (rows, self.dim):
+                    return None
+                return cached['matrix']
+        except (OSError, ValueError, KeyError) as e:
+            log_event('intent_cache_unreadable', level='warning', path=self.cache_path, error=str(e))
+            return None
+
+    def _save_cached_matrix(self, key, matrix):
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp.npz"
+            np.savez(tmp_path, key=np.array(key), matrix=matrix)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            log_event('intent_cache_save_failed', level='warning', path=self.cache_path, error=str(e))
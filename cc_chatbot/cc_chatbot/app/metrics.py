@@ -0,0 +1,305 @@
+"""
+Prometheus-style metrics for Cloudy AI
+Counters, gauges and histograms served as Prometheus text at /metrics.
+
+Recording takes no lock: each thread adds into its own shard, a dict only
+that thread writes, and a scrape sums the shards. Shards of threads that
+have exited are folded into one retired total, so thread-per-request
+servers don't grow the list. Values that already live elsewhere (session
+store size, cache hit ratios, Ollama queue) are callback metrics, read only
+at scrape time.
+
+The app's own metrics are defined at the bottom; provider_race.py records
+provider attempts and chatbot.py and asgi.py record requests.
+"""
+
+import bisect
+import functools
+import inspect
+import math
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Shards:
+    """Per-thread dicts of label values -> number or list; only the owning thread writes to one"""
+
+    def __init__(self, merge):
+        self._merge = merge  # merge(total, value): value added into total, returns the total
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Taken once per thread (registration) and per scrape
+        self._shards = {}  # thread -> its dict
+        self._retired = {}  # Sum of the shards of finished threads
+
+    def mine(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                if len(self._shards) >= 64:
+                    self._retire()
+                self._shards[threading.current_thread()] = shard
+        return shard
+
+    def totals(self):
+        with self._lock:
+            self._retire()
+            totals = {key: self._merge(None, value) for key, value in self._retired.items()}
+            for shard in self._shards.values():
+                for key, value in list(shard.items()):  # A copy: the owner may add keys meanwhile
+                    totals[key] = self._merge(totals.get(key), value)
+        return totals
+
+    def _retire(self):
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            for key, value in self._shards.pop(thread).items():
+                self._retired[key] = self._merge(self._retired.get(key), value)
+
+
+def _add_number(total, value):
+    return value if total is None else total + value
+
+
+def _add_list(total, value):
+    return list(value) if total is None else [a + b for a, b in zip(total, value)]
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)]"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic count per label values: inc('Ollama', 'success')"""
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._shards = _Shards(_add_number)
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shards.mine()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def values(self):
+        return self._shards.totals()
+
+    def samples(self):
+        return [('', key, (), value) for key, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """A value that goes up and down (inc/dec, summed across threads), e.g. requests in flight"""
+    type = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def track(self, *label_values):
+        """Context manager: inc() for the duration of the with-block"""
+        return _Tracked(self, label_values)
+
+
+class _Tracked:
+    def __init__(self, gauge, label_values):
+        self.gauge = gauge
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.gauge.inc(*self.label_values)
+
+    def __exit__(self, *exc):
+        self.gauge.dec(*self.label_values)
+
+
+class Histogram(Metric):
+    """Bucketed observations per label values: observe(0.42, 'Ollama')"""
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = _Shards(_add_list)
+
+    def observe(self, value, *label_values):
+        shard = self._shards.mine()
+        counts = shard.get(label_values)
+        if counts is None:
+            counts = shard[label_values] = [0] * (len(self.buckets) + 2)  # Buckets, +Inf, sum
+        counts[bisect.bisect_left(self.buckets, value)] += 1  # First bucket with value <= le
+        counts[-1] += value
+
+    def snapshot(self):
+        """{label values: {'count', 'sum', 'buckets': [(le, cumulative count)]}}"""
+        result = {}
+        for key, counts in self._shards.totals().items():
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.buckets + (math.inf,), counts[:-1]):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            result[key] = {'count': cumulative, 'sum': counts[-1], 'buckets': buckets}
+        return result
+
+    def samples(self):
+        samples = []
+        for key, data in sorted(self.snapshot().items()):
+            for bound, count in data['buckets']:
+                samples.append(('_bucket', key, (('le', _format_value(bound)),), count))
+            samples.append(('_sum', key, (), data['sum']))
+            samples.append(('_count', key, (), data['count']))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """A gauge (or counter) read from fn() at scrape time: a number, or {label values: number}"""
+
+    def __init__(self, name, help, fn, labels=(), type='gauge'):
+        super().__init__(name, help, labels)
+        self.fn = fn
+        self.type = type
+
+    def samples(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [('', key if isinstance(key, tuple) else (key,), (), number)
+                for key, number in sorted(value.items()) if number is not None]
+
+
+class MetricsRegistry:
+    def __init__(self, prefix='cloudy_'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(self.prefix + name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(self.prefix + name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self.prefix + name, help, labels, buckets))
+
+    def callback(self, name, help, fn, labels=(), type='gauge'):
+        return self.register(CallbackMetric(self.prefix + name, help, fn, labels, type))
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:  # A failing callback shouldn't break the scrape
+                lines.append(f"# {metric.name} unavailable: {type(e).__name__}")
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.help, quotes=False)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, label_values, extra, value in samples:
+                pairs = list(zip(metric.labels, label_values)) + list(extra)
+                labels = ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs)
+                lines.append(f"{metric.name}{suffix}{{{labels}}} {_format_value(value)}" if labels
+                             else f"{metric.name}{suffix} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(text, quotes=True):
+    text = text.replace('\\', '\\\\').replace('\n', '\\n')
+    return text.replace('"', '\\"') if quotes else text
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+# 🔹 Cloudy's metrics
+
+request_count = registry.counter(
+    'requests_total', "Chat requests (/get) by reply mode and HTTP status", ('mode', 'status'))
+request_latency = registry.histogram(
+    'request_duration_seconds', "Time to the full reply of /get, by answering provider", ('mode', 'provider'))
+requests_in_flight = registry.gauge('requests_in_flight', "Chat requests being answered", ('mode',))
+provider_attempts = registry.counter(
+    'provider_attempts_total',
+    "Provider attempts by result: success, failure, cancelled (abandoned while running: another provider "
+    "won or the deadline ran out) or skipped (not started before the deadline)",
+    ('provider', 'result'))
+provider_latency = registry.histogram(
+    'provider_duration_seconds', "Latency of finished provider attempts (first token when streaming)",
+    ('provider', 'result'))
+fallback_depth = registry.histogram(
+    'fallback_depth', "AI providers that failed or were skipped before the reply "
+    "(the whole chain when the rule-based fallback answered)", buckets=(0, 1, 2, 3, 4, 5))
+
+
+def record_attempt(provider, ok, latency=None, cancelled=False):
+    """Count one provider attempt; ok is True, False, or None for one that didn't finish
+
+    An unfinished attempt is 'cancelled' if it was abandoned while running
+    (another provider won, or the deadline ran out), else 'skipped' (never started).
+    """
+    if ok is None:
+        provider_attempts.inc(provider, 'cancelled' if cancelled else 'skipped')
+        return
+    result = 'success' if ok else 'failure'
+    provider_attempts.inc(provider, result)
+    if latency is not None:
+        provider_latency.observe(latency, provider, result)
+
+
+def timed_provider(name):
+    """Decorator: record each call of a provider-like function (a falsy result or an error is a failure)"""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                started = time.perf_counter()
+                result = None
+                try:
+                    result = await fn(*args, **kwargs)
+                    return result
+                finally:
+                    record_attempt(name, bool(result), time.perf_counter() - started)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                record_attempt(name, bool(result), time.perf_counter() - started)
+        return timed
+    return decorate
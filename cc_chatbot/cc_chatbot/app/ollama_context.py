@@ -0,0 +1,152 @@
+"""
+Per-session Ollama context reuse for Cloudy AI
+Ollama's generate API returns a `context` token array (system prompt, every
+turn so far and the reply) and accepts it on the next call, so a follow-up
+turn only has to prefill the new message instead of the long Cloudy system
+prompt and the whole history. This cache keeps one context per session and
+only hands it out while it is still valid:
+- same model (a model change invalidates it)
+- the conversation hasn't moved on without Ollama (the session's last reply
+  must be the one this context ends with)
+- enough room is left in num_ctx for the new message and the reply
+It also records time-to-first-token and prefill statistics for reused and
+fresh prompts so the saving can be measured.
+"""
+
+import threading
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+from event_log import log_event
+
+CLOUDY_PREFIX = "Cloudy ☁️:"
+
+
+def reply_key(text):
+    """Checksum of a reply, ignoring the Cloudy prefix and surrounding whitespace"""
+    text = text.strip()
+    if text.startswith(CLOUDY_PREFIX):
+        text = text[len(CLOUDY_PREFIX):].strip()
+    return zlib.crc32(text.encode('utf-8'))
+
+
+class _Entry:
+    __slots__ = ('model', 'tokens', 'reply', 'last_used')
+
+    def __init__(self, model, tokens, reply):
+        self.model = model
+        self.tokens = array('i', tokens)  # 4 bytes per token instead of a list of ints
+        self.reply = reply
+        self.last_used = time.monotonic()
+
+
+class _Timings:
+    __slots__ = ('requests', 'ttft', 'ttft_count', 'prefill_ms', 'prompt_tokens', 'prefill_count')
+
+    def __init__(self):
+        self.requests = 0
+        self.ttft = 0.0
+        self.ttft_count = 0
+        self.prefill_ms = 0.0
+        self.prompt_tokens = 0
+        self.prefill_count = 0
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'avg_ttft_ms': round(self.ttft / self.ttft_count * 1000, 1) if self.ttft_count else None,
+            'avg_prefill_ms': round(self.prefill_ms / self.prefill_count, 1) if self.prefill_count else None,
+            'avg_prompt_tokens': round(self.prompt_tokens / self.prefill_count, 1) if self.prefill_count else None
+        }
+
+
+class OllamaContextCache:
+    """LRU of session -> Ollama context tokens, with validity checks before reuse"""
+
+    def __init__(self, num_ctx, reserve, max_sessions=1000, ttl=1800):
+        self.num_ctx = num_ctx
+        self.reserve = reserve  # Tokens kept free for the reply
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted_full': 0,
+                          'invalidated_model': 0, 'invalidated_history': 0, 'expired': 0, 'evicted_lru': 0}
+        self._timings = {'reused': _Timings(), 'fresh': _Timings()}
+
+    def get(self, session_id, model, last_reply, input_tokens):
+        """The context to continue from, or None if there is no valid one"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            reason = None
+            if entry is None:
+                reason = 'misses'
+            elif entry.model != model:
+                reason = 'invalidated_model'
+            elif last_reply is None or entry.reply != reply_key(last_reply):
+                reason = 'invalidated_history'
+            elif time.monotonic() - entry.last_used > self.ttl:
+                reason = 'expired'
+            elif len(entry.tokens) + input_tokens + self.reserve > self.num_ctx:
+                reason = 'evicted_full'  # Start over from the summary before Ollama truncates it
+
+            if reason:
+                if entry is not None:
+                    del self._entries[session_id]
+                    self._counters['misses'] += 1
+                self._counters[reason] += 1
+                return None
+            self._entries.move_to_end(session_id)
+            entry.last_used = time.monotonic()
+            self._counters['hits'] += 1
+            return entry.tokens.tolist()
+
+    def put(self, session_id, model, tokens, reply):
+        """Remember the context Ollama returned with reply"""
+        if not tokens:
+            return
+        entry = _Entry(model, tokens, reply_key(reply))
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._entries[session_id] = entry
+            self._counters['stored'] += 1
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+                self._counters['evicted_lru'] += 1
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def record(self, reused, ttft=None, response=None):
+        """Record time to first token (seconds) and/or Ollama's prefill stats from the final response"""
+        with self._lock:
+            timings = self._timings['reused' if reused else 'fresh']
+            timings.requests += 1
+            if ttft is not None:
+                timings.ttft += ttft
+                timings.ttft_count += 1
+            if response and response.get('prompt_eval_duration') is not None:
+                timings.prefill_ms += response['prompt_eval_duration'] / 1e6
+                timings.prompt_tokens += response.get('prompt_eval_count') or 0
+                timings.prefill_count += 1
+        log_event('ollama_prefill', level='debug', reused=reused,
+                  ttft_ms=round(ttft * 1000, 1) if ttft is not None else None,
+                  prompt_tokens=response.get('prompt_eval_count') if response else None,
+                  prefill_ms=round(response['prompt_eval_duration'] / 1e6, 1)
+                  if response and response.get('prompt_eval_duration') is not None else None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._entries),
+                'tokens_held': sum(len(entry.tokens) for entry in self._entries.values()),
+                'num_ctx': self.num_ctx,
+                'reserve': self.reserve,
+                **self._counters,
+                'reused': self._timings['reused'].snapshot(),
+                'fresh': self._timings['fresh'].snapshot()
+            }
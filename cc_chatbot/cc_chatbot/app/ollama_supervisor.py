@@ -0,0 +1,164 @@
+"""
+Background supervisor for the local Ollama server
+Probes Ollama health on an interval, starts or restarts `ollama serve` off
+the request path, and keeps the configured model preloaded. Requests only
+read the cached readiness flag.
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+
+from event_log import log_event
+
+
+class OllamaSupervisor:
+    """Keeps the Ollama server running and the chat model resident"""
+
+    def __init__(self, model, keep_alive='30m', probe_interval=15, start_timeout=30,
+                 serve_command=None, auto_start=True, client=None):
+        self.model = model
+        # Callable returning the ollama.Client to probe and preload through, called on the
+        # supervisor thread so the ollama import stays off start-up (None: the module's default client)
+        self._client = client
+        self.keep_alive = keep_alive
+        self.probe_interval = probe_interval
+        self.start_timeout = start_timeout
+        self.serve_command = serve_command
+        self.auto_start = auto_start
+
+        self._ready = False
+        self._model_loaded = False
+        self._last_probe = None
+        self._last_error = None
+        self._process = None
+        self._process_started_at = None
+        self._unhealthy_since = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the supervisor thread (no-op if already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ollama-supervisor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_ready(self):
+        """Cached readiness flag - never blocks or calls Ollama"""
+        return self._ready
+
+    @property
+    def client(self):
+        if self._client is None:
+            import ollama
+            return ollama
+        return self._client()
+
+    def status(self):
+        return {
+            'ready': self._ready,
+            'model': self.model,
+            'model_loaded': self._model_loaded,
+            'keep_alive': self.keep_alive,
+            'last_probe': self._last_probe,
+            'last_error': self._last_error,
+            'managed_process': self._process is not None and self._process.poll() is None
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            healthy = self._probe()
+
+            if healthy:
+                self._unhealthy_since = None
+                if not self._model_loaded:
+                    self._preload_model()
+                interval = self.probe_interval
+            else:
+                self._unhealthy_since = self._unhealthy_since or time.time()
+                if self.auto_start:
+                    self._ensure_server_started()
+                # Probe more often while the server is coming up
+                interval = min(self.probe_interval, 2)
+
+            self._stop.wait(interval)
+
+    def _probe(self):
+        """Check the server and whether our model is resident in memory"""
+        try:
+            running = self.client.ps()
+            loaded = [m.get('name') or m.get('model') for m in running.get('models', [])]
+            self._model_loaded = self.model in loaded
+            self._ready = True
+            self._last_error = None
+        except Exception as e:
+            if self._ready:
+                log_event('ollama_unavailable', level='warning', error=str(e))
+            self._ready = False
+            self._model_loaded = False
+            self._last_error = str(e)
+        self._last_probe = time.time()
+        return self._ready
+
+    def _preload_model(self):
+        """Load the model into memory and keep it resident for keep_alive"""
+        try:
+            # An empty prompt loads the model without generating anything
+            self.client.generate(model=self.model, prompt='', keep_alive=self.keep_alive)
+            self._model_loaded = True
+            log_event('ollama_model_preloaded', model=self.model, keep_alive=self.keep_alive)
+        except Exception as e:
+            self._last_error = f"preload failed: {e}"
+            log_event('ollama_preload_failed', level='warning', model=self.model, error=str(e))
+
+    def _ensure_server_started(self):
+        """Start `ollama serve`, restarting it if it hasn't come up in time"""
+        if self._process is not None and self._process.poll() is None:
+            waiting_since = max(self._process_started_at, self._unhealthy_since)
+            if time.time() - waiting_since < self.start_timeout:
+                return  # Still starting up (or a short hiccup)
+            log_event('ollama_restart', level='warning')
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+        command = self._serve_command()
+        if not command:
+            self._last_error = "ollama executable not found (set OLLAMA_SERVE_CMD)"
+            return
+
+        env = os.environ.copy()
+        env.setdefault('OLLAMA_NUM_PARALLEL', '1')  # Limit parallel requests
+        env.setdefault('OLLAMA_MAX_LOADED_MODELS', '1')  # Only load one model at a time
+        env.setdefault('OLLAMA_FLASH_ATTENTION', 'false')  # Disable flash attention to save memory
+
+        popen_kwargs = {'env': env, 'stdout': subprocess.DEVNULL, 'stderr': subprocess.DEVNULL}
+        if os.name == 'nt':
+            popen_kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        else:
+            popen_kwargs['start_new_session'] = True
+
+        try:
+            self._process = subprocess.Popen(command, **popen_kwargs)
+            self._process_started_at = time.time()
+            log_event('ollama_server_started', command=' '.join(command))
+        except Exception as e:
+            self._process = None
+            self._last_error = f"could not start Ollama: {e}"
+            log_event('ollama_start_failed', level='error', error=str(e))
+
+    def _serve_command(self):
+        if self.serve_command:
+            return shlex.split(self.serve_command)
+        executable = shutil.which('ollama')
+        return [executable, 'serve'] if executable else None
@@ -0,0 +1,445 @@
+"""
+Provider chain execution for Cloudy AI
+Runs the AI providers serially, hedged (start the next provider if the
+current one is slow) or raced (all at once), and records who won.
+call_providers_async does the same for coroutine providers on an event loop.
+
+With a request deadline, no attempt outlives it and providers are only
+started while at least min_budget seconds are left; the rest are skipped
+so the caller can answer with its instant fallback.
+
+Attempts that may be abandoned (any attempt under a bounded deadline, and
+hedged or raced ones) run on one pool of PROVIDER_WORKERS threads shared by
+all requests, so calls that hang past their deadline can't pile up without
+limit. An attempt still queued for a worker when its deadline runs out is
+cancelled instead of started. Attempts abandoned because the deadline ran
+out count as timeouts against the provider's circuit breaker.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+from admission import QueueFull
+from deadline import NO_DEADLINE
+from event_log import log_event
+from metrics import fallback_depth, record_attempt
+from tracing import span
+
+PROVIDER_MODES = ('serial', 'hedge', 'race')
+
+# Worker threads for abandonable attempts, shared by all requests
+PROVIDER_WORKERS = int(os.getenv('PROVIDER_WORKERS', '16'))
+_executor = ThreadPoolExecutor(max_workers=max(1, PROVIDER_WORKERS), thread_name_prefix='provider-attempt')
+
+# Most recent outcomes, used to tune HEDGE_DELAY from real data
+race_log = deque(maxlen=int(os.getenv('PROVIDER_RACE_LOG_SIZE', '1000')))
+_race_log_lock = threading.Lock()
+
+
+def call_providers(providers, user_input, mode='serial', hedge_delay=2.0, deadline=NO_DEADLINE, min_budget=0.0,
+                   router=None, breakers=None):
+    """Return (provider_name, reply) from the first provider that answers, or (None, None)
+
+    providers is an ordered list of (name, function) pairs; each function takes
+    the user input and returns a reply string or None. A provider that raises
+    QueueFull (its local queue is full) is skipped like a failure, but the
+    QueueFull is re-raised if no other provider answers.
+
+    Attempts run with deadline applied (see deadline.py); with a bounded
+    deadline they run on the shared worker threads and are abandoned when
+    it expires.
+
+    With a router (see routing.py) the providers are tried in the order it
+    picks for this request, and it learns from every finished attempt.
+    breakers maps provider names to their CircuitBreaker, which is told
+    about attempts abandoned when the deadline ran out.
+    """
+    if mode not in PROVIDER_MODES:
+        log_event('provider_mode_unknown', level='warning', mode=mode)
+        mode = 'serial'
+    if router is not None:
+        providers = router.order(providers)
+
+    started = time.perf_counter()
+    if mode == 'serial':
+        winner, reply, attempts, overloaded = _run_serial(providers, user_input, deadline, min_budget)
+    else:
+        delay = 0 if mode == 'race' else hedge_delay
+        winner, reply, attempts, overloaded = _run_hedged(providers, user_input, delay, deadline, min_budget)
+
+    _record_outcome(_outcome(mode, hedge_delay, started, winner, attempts, deadline), router, breakers)
+    if overloaded and not reply:
+        raise overloaded
+    return winner, reply
+
+
+async def call_providers_async(providers, user_input, mode='serial', hedge_delay=2.0, deadline=NO_DEADLINE,
+                               min_budget=0.0, router=None, breakers=None):
+    """call_providers for async providers: each function is a coroutine function
+
+    Hedged and raced attempts are tasks on the running event loop rather than
+    pool threads, and losing or late attempts are cancelled instead of abandoned.
+    """
+    if mode not in PROVIDER_MODES:
+        log_event('provider_mode_unknown', level='warning', mode=mode)
+        mode = 'serial'
+    if router is not None:
+        providers = router.order(providers)
+
+    started = time.perf_counter()
+    if mode == 'serial':
+        winner, reply, attempts, overloaded = await _run_serial_async(providers, user_input, deadline, min_budget)
+    else:
+        delay = 0 if mode == 'race' else hedge_delay
+        winner, reply, attempts, overloaded = await _run_hedged_async(providers, user_input, delay, deadline,
+                                                                      min_budget)
+
+    _record_outcome(_outcome(mode, hedge_delay, started, winner, attempts, deadline), router, breakers)
+    if overloaded and not reply:
+        raise overloaded
+    return winner, reply
+
+
+def _run_serial(providers, user_input, deadline, min_budget):
+    """Try each provider in order (on the calling thread unless the deadline is bounded)"""
+    attempts = []
+    started = time.perf_counter()
+    overloaded = None
+    for index, (name, provider) in enumerate(providers):
+        if not deadline.allows(min_budget):
+            attempts.extend(_skip(providers[index:], deadline))
+            break
+        log_event('provider_attempt', level='debug', provider=name)
+        attempt_start = time.perf_counter()
+        try:
+            reply = _call_within(deadline, name, provider, user_input)
+        except FutureTimeout:
+            log_event('provider_deadline_exceeded', level='warning', provider=name, budget=deadline.budget)
+            attempts.append(_unfinished(name, started, attempt_start, timed_out=True))
+            continue
+        except QueueFull as e:
+            overloaded = e
+            reply = None
+        except Exception as e:
+            log_event('provider_error', level='warning', provider=name, error=str(e))
+            reply = None
+        attempts.append(_attempt(name, started, attempt_start, reply))
+
+        if reply:
+            return name, reply, attempts, None
+        log_event('provider_no_reply', level='debug', provider=name)
+    return None, None, attempts, overloaded
+
+
+def _run_hedged(providers, user_input, hedge_delay, deadline, min_budget):
+    """Start providers in priority order, launching the next one whenever the
+    running ones fail or are still busy after hedge_delay seconds.
+
+    The first good reply wins. Providers that have not started yet are
+    cancelled; ones already running are abandoned and their result ignored,
+    as are all running ones when the deadline expires.
+    """
+    attempts = []
+    started = time.perf_counter()
+    pending = {}  # future -> (priority, name, start time)
+    next_index = 0
+    overloaded = None
+
+    def launch_next():
+        nonlocal next_index
+        name, provider = providers[next_index]
+        log_event('provider_attempt', level='debug', provider=name, hedged=True)
+        future = _submit(deadline, name, provider, user_input)
+        pending[future] = (next_index, name, time.perf_counter())
+        next_index += 1
+
+    while pending or next_index < len(providers):
+        if not pending:
+            if not deadline.allows(min_budget):
+                break
+            launch_next()
+            if hedge_delay == 0:
+                while next_index < len(providers) and deadline.allows(min_budget):
+                    launch_next()
+
+        timeout = deadline.cap(hedge_delay if next_index < len(providers) else None)
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            if deadline.expired():
+                break
+            # Still waiting after hedge_delay: hedge with the next provider
+            if next_index < len(providers) and deadline.allows(min_budget):
+                launch_next()
+            continue
+
+        # Prefer the higher-priority provider if several finished together
+        winner = None
+        for future in sorted(done, key=lambda f: pending[f][0]):
+            priority, name, attempt_start = pending.pop(future)
+            try:
+                reply = future.result()
+            except QueueFull as e:
+                overloaded = e
+                reply = None
+            except Exception as e:
+                log_event('provider_error', level='warning', provider=name, error=str(e))
+                reply = None
+            attempts.append(_attempt(name, started, attempt_start, reply))
+            if reply and winner is None:
+                winner = (name, reply)
+            elif not reply:
+                log_event('provider_no_reply', level='debug', provider=name)
+
+        if winner:
+            for future, (_, name, attempt_start) in pending.items():
+                future.cancel()
+                attempts.append(_unfinished(name, started, attempt_start))
+            return winner[0], winner[1], attempts, None
+
+    # Out of time: abandon what is still running and skip the rest
+    for future, (_, name, attempt_start) in pending.items():
+        future.cancel()
+        log_event('provider_deadline_exceeded', level='warning', provider=name, budget=deadline.budget)
+        attempts.append(_unfinished(name, started, attempt_start, timed_out=True))
+    attempts.extend(_skip(providers[next_index:], deadline))
+    return None, None, attempts, overloaded
+
+
+async def _run_serial_async(providers, user_input, deadline, min_budget):
+    attempts = []
+    started = time.perf_counter()
+    overloaded = None
+    for index, (name, provider) in enumerate(providers):
+        if not deadline.allows(min_budget):
+            attempts.extend(_skip(providers[index:], deadline))
+            break
+        log_event('provider_attempt', level='debug', provider=name)
+        attempt_start = time.perf_counter()
+        try:
+            reply = await asyncio.wait_for(_call_applied_async(deadline, name, provider, user_input),
+                                           deadline.cap(None))
+        except asyncio.TimeoutError:
+            log_event('provider_deadline_exceeded', level='warning', provider=name, budget=deadline.budget)
+            attempts.append(_unfinished(name, started, attempt_start, timed_out=True))
+            continue
+        except QueueFull as e:
+            overloaded = e
+            reply = None
+        except Exception as e:
+            log_event('provider_error', level='warning', provider=name, error=str(e))
+            reply = None
+        attempts.append(_attempt(name, started, attempt_start, reply))
+
+        if reply:
+            return name, reply, attempts, None
+        log_event('provider_no_reply', level='debug', provider=name)
+    return None, None, attempts, overloaded
+
+
+async def _run_hedged_async(providers, user_input, hedge_delay, deadline, min_budget):
+    """_run_hedged with asyncio tasks"""
+    attempts = []
+    started = time.perf_counter()
+    pending = {}  # task -> (priority, name, start time)
+    next_index = 0
+    overloaded = None
+
+    def launch_next():
+        nonlocal next_index
+        name, provider = providers[next_index]
+        log_event('provider_attempt', level='debug', provider=name, hedged=True)
+        task = asyncio.ensure_future(_call_applied_async(deadline, name, provider, user_input))
+        pending[task] = (next_index, name, time.perf_counter())
+        next_index += 1
+
+    try:
+        while pending or next_index < len(providers):
+            if not pending:
+                if not deadline.allows(min_budget):
+                    break
+                launch_next()
+                if hedge_delay == 0:
+                    while next_index < len(providers) and deadline.allows(min_budget):
+                        launch_next()
+
+            timeout = deadline.cap(hedge_delay if next_index < len(providers) else None)
+            done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if deadline.expired():
+                    break
+                # Still waiting after hedge_delay: hedge with the next provider
+                if next_index < len(providers) and deadline.allows(min_budget):
+                    launch_next()
+                continue
+
+            # Prefer the higher-priority provider if several finished together
+            winner = None
+            for task in sorted(done, key=lambda t: pending[t][0]):
+                priority, name, attempt_start = pending.pop(task)
+                try:
+                    reply = task.result()
+                except QueueFull as e:
+                    overloaded = e
+                    reply = None
+                except Exception as e:
+                    log_event('provider_error', level='warning', provider=name, error=str(e))
+                    reply = None
+                attempts.append(_attempt(name, started, attempt_start, reply))
+                if reply and winner is None:
+                    winner = (name, reply)
+                elif not reply:
+                    log_event('provider_no_reply', level='debug', provider=name)
+
+            if winner:
+                for _, name, attempt_start in pending.values():
+                    attempts.append(_unfinished(name, started, attempt_start))
+                return winner[0], winner[1], attempts, None
+
+        # Out of time: the running attempts are cancelled below and the rest skipped
+        for _, name, attempt_start in pending.values():
+            log_event('provider_deadline_exceeded', level='warning', provider=name, budget=deadline.budget)
+            attempts.append(_unfinished(name, started, attempt_start, timed_out=True))
+        attempts.extend(_skip(providers[next_index:], deadline))
+        return None, None, attempts, overloaded
+    finally:
+        # Losers, or everything if the request itself was cancelled
+        for task in pending:
+            task.cancel()
+
+
+def _call_within(deadline, name, provider, user_input):
+    """provider(user_input) with deadline applied; raises FutureTimeout if it runs out first"""
+    if not deadline.bounded:
+        with span(name.lower()):
+            return provider(user_input)
+    future = _submit(deadline, name, provider, user_input)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except FutureTimeout:
+        future.cancel()  # Still queued: never started. Running: abandoned
+        raise
+
+
+def _submit(deadline, name, provider, user_input):
+    """Start an attempt on the shared workers, in a copy of the caller's context (its current trace span)"""
+    return _executor.submit(contextvars.copy_context().run, _call_applied, deadline, name, provider, user_input)
+
+
+def _call_applied(deadline, name, provider, user_input):
+    if deadline.expired():
+        return None  # Queued for a worker past the deadline; the caller has moved on
+    with deadline.applied(), span(name.lower()):
+        return provider(user_input)
+
+
+async def _call_applied_async(deadline, name, provider, user_input):
+    with deadline.applied(), span(name.lower()):
+        return await provider(user_input)
+
+
+def _skip(providers, deadline):
+    """Attempts for the providers skipped because too little of the deadline was left"""
+    if providers:
+        log_event('provider_deadline_skip', level='warning', providers=[name for name, _ in providers],
+                  remaining=round(deadline.remaining(), 3))
+    return [{'provider': name, 'started_at': None, 'latency': None, 'ok': None, 'skipped': True}
+            for name, _ in providers]
+
+
+def _outcome(mode, hedge_delay, started, winner, attempts, deadline=NO_DEADLINE):
+    return {
+        'mode': mode,
+        'hedge_delay': hedge_delay if mode == 'hedge' else None,
+        'winner': winner,
+        'latency': round(time.perf_counter() - started, 4),
+        'deadline': deadline.budget,
+        'attempts': attempts,
+        'timestamp': time.time()
+    }
+
+
+def _attempt(name, started, attempt_start, reply):
+    """Describe one finished provider attempt, relative to the request start"""
+    return {
+        'provider': name,
+        'started_at': round(attempt_start - started, 4),
+        'latency': round(time.perf_counter() - attempt_start, 4),
+        'ok': bool(reply)
+    }
+
+
+def _unfinished(name, started, attempt_start, timed_out=False):
+    """Describe an attempt abandoned while running: another provider won, or the deadline ran out (timed_out)"""
+    return {
+        'provider': name,
+        'started_at': round(attempt_start - started, 4),
+        'latency': round(time.perf_counter() - attempt_start, 4),
+        'ok': None,
+        'cancelled': True,
+        'timed_out': timed_out
+    }
+
+
+def _record_outcome(outcome, router=None, breakers=None):
+    with _race_log_lock:
+        race_log.append(outcome)
+    log_event('provider_outcome', **outcome)
+    for attempt in outcome['attempts']:
+        record_attempt(attempt['provider'], attempt['ok'], attempt['latency'], cancelled=attempt.get('cancelled'))
+        if router is not None:
+            # Running out of time tells the router the provider was slow; losing a race tells it nothing
+            ok = False if attempt.get('timed_out') else attempt['ok']
+            router.observe(attempt['provider'], ok, attempt['latency'])
+        breaker = (breakers or {}).get(attempt['provider'])
+        if breaker is not None and attempt.get('timed_out'):
+            # The call itself may never come back to report its failure
+            breaker.record_failure(TimeoutError(f"{attempt['provider']} ran past the request deadline"))
+    # Providers that failed, timed out or were skipped (cancelled losers of a race don't count)
+    fallback_depth.observe(sum(1 for attempt in outcome['attempts']
+                               if attempt['ok'] is False or attempt.get('timed_out') or attempt.get('skipped')))
+
+
+def race_stats():
+    """Summarise recent outcomes: win counts and latency percentiles per provider"""
+    with _race_log_lock:
+        outcomes = list(race_log)
+
+    winners = {}
+    provider_latencies = {}
+    for outcome in outcomes:
+        name = outcome['winner'] or 'none'
+        winners[name] = winners.get(name, 0) + 1
+        for attempt in outcome['attempts']:
+            if attempt['ok'] and attempt['latency'] is not None:
+                provider_latencies.setdefault(attempt['provider'], []).append(attempt['latency'])
+
+    latency_summary = {}
+    for name, latencies in provider_latencies.items():
+        latencies.sort()
+        latency_summary[name] = {
+            'count': len(latencies),
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99)
+        }
+
+    return {
+        'requests': len(outcomes),
+        'winners': winners,
+        'success_latency': latency_summary,
+        'recent': outcomes[-20:]
+    }
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,127 @@
+"""
+Lazy AI provider SDKs for Cloudy AI
+The provider SDKs (ollama, openai, google.generativeai) take most of the
+app's start-up time to import, so each one is imported and set up only
+when its provider is enabled and first asked for: by the first request
+that reaches it, or by a background warm-up once the server is up.
+
+Whether an SDK is installed is checked with importlib.util.find_spec,
+which finds the package without running it.
+"""
+
+import importlib
+import importlib.util
+import threading
+import time
+
+from event_log import log_event
+
+
+def installed(module):
+    """Whether module can be imported, without importing it (only its parent packages)"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+class LazyProvider:
+    """One provider's SDK client, built by factory(sdk module) on first get()"""
+
+    def __init__(self, name, module, factory, enabled=True):
+        self.name = name
+        self.module = module
+        self.factory = factory
+        self.installed = installed(module)
+        self.enabled = enabled and self.installed
+        self._client = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_seconds = None
+        self._loaded_by = None
+        self._error = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    @property
+    def client(self):
+        """The client if it is loaded already (never imports anything)"""
+        return self._client
+
+    def get(self, loaded_by='request'):
+        """The client (None if disabled or its set-up failed); the first call imports the SDK"""
+        if self._loaded or not self.enabled:
+            return self._client
+        with self._lock:
+            if not self._loaded:  # Concurrent first callers wait for one import
+                self._load(loaded_by)
+        return self._client
+
+    def _load(self, loaded_by):
+        started = time.perf_counter()
+        try:
+            self._client = self.factory(importlib.import_module(self.module))
+        except Exception as e:
+            self._client = None
+            self._error = f"{type(e).__name__}: {e}"
+            log_event('provider_load_failed', level='error', provider=self.name, error=self._error)
+        self._load_seconds = time.perf_counter() - started
+        self._loaded_by = loaded_by
+        self._loaded = True
+        log_event('provider_loaded', provider=self.name, module=self.module, by=loaded_by,
+                  ok=self._client is not None, load_ms=round(self._load_seconds * 1000, 1))
+
+    def status(self):
+        return {
+            'module': self.module,
+            'installed': self.installed,
+            'enabled': self.enabled,
+            'loaded': self._loaded,
+            'loaded_by': self._loaded_by,
+            'load_ms': round(self._load_seconds * 1000, 1) if self._load_seconds is not None else None,
+            'error': self._error
+        }
+
+
+class ProviderRegistry:
+    """The lazily loaded providers by name, with an optional background warm-up"""
+
+    def __init__(self):
+        self._providers = {}
+        self._warm_up = None
+
+    def register(self, name, module, factory, enabled=True):
+        provider = self._providers[name] = LazyProvider(name, module, factory, enabled)
+        return provider
+
+    def __getitem__(self, name):
+        return self._providers[name]
+
+    def get(self, name):
+        """name's client, loading it on first use (None if unknown, disabled or broken)"""
+        provider = self._providers.get(name)
+        return provider.get() if provider else None
+
+    def warm_up(self, delay=0.0, names=None):
+        """Load the enabled providers on a daemon thread after delay seconds; returns the thread"""
+        if self._warm_up and self._warm_up.is_alive():
+            return self._warm_up
+
+        def run():
+            if delay:
+                time.sleep(delay)
+            started = time.perf_counter()
+            for name in names or list(self._providers):
+                provider = self._providers.get(name)
+                if provider and provider.enabled:
+                    provider.get(loaded_by='warm-up')
+            log_event('providers_warmed_up', seconds=round(time.perf_counter() - started, 3))
+
+        self._warm_up = threading.Thread(target=run, name='provider-warm-up', daemon=True)
+        self._warm_up.start()
+        return self._warm_up
+
+    def stats(self):
+        return {name: provider.status() for name, provider in self._providers.items()}
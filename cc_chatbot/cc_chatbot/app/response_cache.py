@@ -0,0 +1,115 @@
+"""
+Exact-match response cache for Cloudy AI
+Caches LLM replies keyed on a normalized prompt plus the provider
+configuration, with a TTL, a memory-bounded LRU and hit/miss counters.
+"""
+
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(text):
+    """Lowercase, drop punctuation and collapse whitespace so trivial variations share a key"""
+    text = _PUNCTUATION.sub(' ', text.lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache bounded by total bytes, with per-entry TTL"""
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, max_entry_bytes=64 * 1024, ttl=3600):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    @staticmethod
+    def make_key(prompt, signature):
+        """Cache key: normalized prompt + provider/model/temperature signature"""
+        return (normalize_prompt(prompt), signature)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, size = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store value; returns False if the entry is too large to cache"""
+        size = self._entry_size(key, value)
+        if size > self.max_entry_bytes:
+            with self._lock:
+                self.rejected += 1
+            return False
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'rejected_too_large': self.rejected
+            }
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def _entry_size(key, value):
+        # Approximate memory cost of the key and value plus entry overhead
+        return _deep_size(key) + _deep_size(value) + 64
+
+
+def _deep_size(obj):
+    """sys.getsizeof including the contents of tuples, lists and dicts"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+        size += sum(_deep_size(item) for item in obj)
+    elif isinstance(obj, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in obj.items())
+    return size
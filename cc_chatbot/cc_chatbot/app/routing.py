@@ -0,0 +1,208 @@
+"""
+Adaptive provider routing for Cloudy AI
+Orders the AI providers per request instead of always Ollama, OpenAI,
+Gemini, Hugging Face. For each provider and model the router keeps
+exponentially weighted averages of:
+- success rate
+- latency of successful attempts (time to first token when streaming)
+- latency of failed attempts (how long a failure takes to show)
+
+A provider's expected cost of going first is its expected attempt time
+divided by its success rate (trying providers in increasing order of that
+ratio minimises the expected wait for a reply), plus the policy's price
+of the call, plus the expected queue wait when the provider reports one
+(Ollama's admission queue). Providers below the policy's minimum quality
+or above its maximum cost, unavailable ones and ones whose circuit
+breaker is open are only tried after the rest.
+
+Estimates drift back to their priors as they age (half_life), so a
+provider that was slow a few minutes ago is tried again. Recent decisions are
+kept for /stats/routing; simulate_routing.py replays provider_outcome logs
+through a router to compare policies offline.
+"""
+
+import threading
+import time
+from collections import deque
+
+from event_log import log_event
+
+POLICIES = ('adaptive', 'fixed')
+
+
+def parse_weights(text):
+    """'OpenAI=0.05,Gemini=0.03' -> {'OpenAI': 0.05, 'Gemini': 0.03}"""
+    weights = {}
+    for item in (text or '').split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            weights[name.strip()] = float(value)
+    return weights
+
+
+class RoutingPolicy:
+    """What a reply may cost and must be worth, on top of expected latency"""
+
+    def __init__(self, costs=None, quality=None, cost_weight=0.0, min_quality=0.0, max_cost=None):
+        self.costs = costs or {}  # Provider -> price of one reply, in cents
+        self.quality = quality or {}  # Provider -> 0..1, how good its replies are
+        self.cost_weight = cost_weight  # Seconds of latency one cent is worth
+        self.min_quality = min_quality  # Providers below are tried last
+        self.max_cost = max_cost  # Providers dearer than this (cents) are tried last
+
+    def demotion(self, provider):
+        """Why the policy tries provider only after the others, or None"""
+        if self.quality.get(provider, 1.0) < self.min_quality:
+            return 'quality'
+        if self.max_cost is not None and self.costs.get(provider, 0.0) > self.max_cost:
+            return 'cost'
+        return None
+
+    def as_dict(self):
+        return {'costs': self.costs, 'quality': self.quality, 'cost_weight': self.cost_weight,
+                'min_quality': self.min_quality, 'max_cost': self.max_cost}
+
+
+class Estimate:
+    """EWMA success rate and latencies of one provider/model (for one reply kind)"""
+    __slots__ = ('prior', 'success', 'latency', 'failure_latency', 'samples', 'updated')
+
+    def __init__(self, latency, success):
+        self.prior = (latency, success)
+        self.success = success
+        self.latency = latency
+        self.failure_latency = latency
+        self.samples = 0
+        self.updated = None
+
+    def current(self, now, half_life):
+        """(success, latency, failure latency) at now: halfway back to the prior every half_life seconds"""
+        prior_latency, prior_success = self.prior
+        weight = 0.0 if self.updated is None else 0.5 ** ((now - self.updated) / half_life)
+        return (prior_success + (self.success - prior_success) * weight,
+                prior_latency + (self.latency - prior_latency) * weight,
+                prior_latency + (self.failure_latency - prior_latency) * weight)
+
+    def observe(self, ok, latency, alpha, now, half_life):
+        # Start from the faded estimate, so one good attempt after a long pause counts fully
+        self.success, self.latency, self.failure_latency = self.current(now, half_life)
+        self.samples += 1
+        rate = max(alpha, 1.0 / (self.samples + 1))  # The prior counts as one sample, so it is replaced quickly
+        self.success += ((1.0 if ok else 0.0) - self.success) * rate
+        if ok:
+            self.latency += (latency - self.latency) * rate
+        else:
+            self.failure_latency += (latency - self.failure_latency) * rate
+        self.updated = now
+
+
+class Router:
+    """Orders (name, provider) pairs per request from live per-provider statistics"""
+
+    def __init__(self, policy=None, mode='adaptive', models=None, priors=None, alpha=0.2, half_life=60.0,
+                 load=None, available=None, max_decisions=200, clock=time.monotonic):
+        self.policy = policy or RoutingPolicy()
+        self.mode = mode if mode in POLICIES else 'adaptive'
+        self.models = models or {}  # Provider -> model name: statistics are kept per model
+        self.priors = priors or {}  # Provider -> (latency, success rate) before any data
+        self.alpha = alpha
+        self.half_life = half_life
+        self.load = load or {}  # Provider -> callable: expected extra wait right now (seconds)
+        self.available = available  # callable(provider) -> False to try it last
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._estimates = {}
+        self.decisions = deque(maxlen=max_decisions)
+
+    def observe(self, provider, ok, latency, stream=False):
+        """Record a finished attempt (ok True/False); unfinished ones (ok None) carry no information"""
+        if ok is None or latency is None:
+            return
+        now = self.clock()
+        with self._lock:
+            self._estimate(provider, stream).observe(ok, latency, self.alpha, now, self.half_life)
+
+    def order(self, providers, stream=False):
+        """providers ([(name, provider)]) in the order to try them for this request"""
+        now = self.clock()
+        rows = []
+        with self._lock:
+            for index, (name, _) in enumerate(providers):
+                rows.append(self._score(name, index, stream, now))
+        if self.mode == 'adaptive':
+            rows.sort(key=lambda row: (row['demoted'] is not None, row['score'], row['index']))
+        by_name = dict(providers)
+        ordered = [(row['name'], by_name[row['name']]) for row in rows]
+
+        decision = {
+            'time': time.time(),
+            'stream': stream,
+            'mode': self.mode,
+            'order': [row['name'] for row in rows],
+            'scores': {row.pop('name'): row for row in rows}
+        }
+        self.decisions.append(decision)
+        if decision['order'] != [name for name, _ in providers]:
+            log_event('routing_decision', level='debug', stream=stream, order=decision['order'])
+        return ordered
+
+    def _score(self, name, index, stream, now):
+        estimate = self._estimate(name, stream, index)
+        success, latency, failure_latency = estimate.current(now, self.half_life)
+
+        wait = 0.0
+        if name in self.load:
+            try:
+                wait = self.load[name]()
+            except Exception:
+                wait = 0.0
+        cost = self.policy.costs.get(name, 0.0)
+        expected = success * latency + (1 - success) * failure_latency + wait
+        demoted = self.policy.demotion(name)
+        if demoted is None and self.available is not None and not self.available(name):
+            demoted = 'unavailable'
+        return {
+            'name': name,
+            'index': index,
+            'success': round(success, 3),
+            'latency': round(latency, 3),
+            'failure_latency': round(failure_latency, 3),
+            'wait': round(wait, 3),
+            'cost': cost,
+            'samples': estimate.samples,
+            # Expected seconds spent per reply obtained, plus the price of the call in seconds
+            'score': round(expected / max(success, 0.01) + self.policy.cost_weight * cost, 3),
+            'demoted': demoted
+        }
+
+    def _estimate(self, name, stream, index=None):
+        key = (name, self.models.get(name), 'stream' if stream else 'reply')
+        estimate = self._estimates.get(key)
+        if estimate is None:
+            # Without a configured prior, later providers in the static order start out slower
+            if index is None:
+                index = len({provider for provider, _, _ in self._estimates})
+            estimate = self._estimates[key] = Estimate(*self.priors.get(name, (1.0 + 0.5 * index, 0.9)))
+        return estimate
+
+    def stats(self, recent=20):
+        """Current (faded) estimates per provider, model and kind, and the last recent decisions"""
+        now = self.clock()
+        estimates = []
+        with self._lock:
+            for (name, model, kind), estimate in self._estimates.items():
+                success, latency, failure_latency = estimate.current(now, self.half_life)
+                estimates.append({
+                    'provider': name, 'model': model, 'kind': kind,
+                    'success': round(success, 3), 'latency': round(latency, 3),
+                    'failure_latency': round(failure_latency, 3), 'samples': estimate.samples,
+                    'age': round(now - estimate.updated, 1) if estimate.updated is not None else None
+                })
+        return {
+            'mode': self.mode,
+            'alpha': self.alpha,
+            'half_life': self.half_life,
+            'policy': self.policy.as_dict(),
+            'estimates': estimates,
+            'decisions': list(self.decisions)[-recent:] if recent else []
+        }
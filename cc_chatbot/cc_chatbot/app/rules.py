@@ -0,0 +1,228 @@
+"""
+Keyword routing rules for Cloudy AI
+Every keyword rule (web search triggers and the rule-based fallback
+topics) lives in one declarative table that is compiled once into bit
+masks. A message is tokenized a single time however many rules are checked,
+and phrases only match whole words, so 'ai' no longer matches "explain" and
+'hi' no longer matches "this". A trailing * matches a word prefix
+('benefit*' matches "benefits").
+"""
+
+import functools
+import operator
+from collections import namedtuple
+
+# ASCII letters (lowercased) and digits are word characters; every other byte
+# (punctuation, apostrophes, emoji and other non-ASCII) separates words
+_WORD_BYTES = bytes(c if 48 <= c <= 57 or 97 <= c <= 122 else c + 32 if 65 <= c <= 90 else 32 for c in range(256))
+
+Rule = namedtuple('Rule', 'name section all_of none_of')
+
+
+def normalize(text):
+    """text as lowercase ASCII bytes with every separator turned into one space (C-speed)"""
+    # 'replace' turns each non-ASCII character into a single '?', so "what’s" -> b'what s'
+    return text.encode('ascii', 'replace').translate(_WORD_BYTES)
+
+
+def words_of(text):
+    """Split text into lowercase ASCII words, as bytes"""
+    return normalize(text).split()
+
+
+def rule(name, section, *all_of, unless=()):
+    """Every group in all_of must contain a matching phrase, and no phrase in unless may match"""
+    return Rule(name, section, tuple(tuple(group) for group in all_of), tuple(unless))
+
+
+# 🔹 Rule table
+# Rules are checked in order within their section; the first match wins.
+
+CURRENT_INFO = (
+    'today', 'now', 'current*', 'latest', 'recent*', 'this year', '2024', '2025',
+    'news', 'weather', 'stock*', 'price*', 'score*', 'update*', 'happening',
+    'who is', 'what is the current', 'what happened', 'when did', 'where is',
+    'search*', 'find*', 'look up', 'tell me about', 'information about',
+    'what are', 'how to', 'best', 'top', 'list of', 'compare*'
+)
+QUESTION_PATTERNS = ('what is', 'who is', 'where is', 'when is', 'how to', 'why is')
+# Basic programming/math questions are answered without searching
+TECHNICAL_WORDS = ('function*', 'code*', 'program*', 'algorithm*', 'theorem*', 'formula*')
+
+CLOUD_TOPIC = (
+    ('cloud*',),
+    ('computing', 'service*', 'provider*', 'aws', 'azure', 'gcp', 'infrastructure',
+     'server*', 'storage', 'database*')
+)
+PROGRAMMING = ('python', 'programming', 'code*', 'function*')
+
+RULES = [
+    # Queries that need current/real-time information from the web
+    rule('current_info', 'web_search', CURRENT_INFO),
+    rule('factual_question', 'web_search', QUESTION_PATTERNS, unless=TECHNICAL_WORDS),
+
+    # Topic answers of the rule-based fallback (get_intelligent_fallback)
+    rule('cloud_definition', 'topic', ('what is cloud computing',), ('characteristic*',)),
+    rule('cloud_service_models', 'topic', ('types of cloud service*',), ('iaas', 'paas', 'saas')),
+    rule('virtualization', 'topic', *CLOUD_TOPIC, ('virtualization',)),
+    rule('elasticity_vs_scalability', 'topic', *CLOUD_TOPIC, ('elasticity',), ('scalability',)),
+    rule('cloud_computing', 'topic', *CLOUD_TOPIC),
+    rule('python_snippets', 'topic', PROGRAMMING, ('sort*', 'reverse*')),
+    rule('python_benefits', 'topic', PROGRAMMING, ('benefit*',)),
+    rule('python', 'topic', PROGRAMMING),
+    rule('ai', 'topic', ('artificial intelligence', 'machine learning', 'ai', 'neural*')),
+    rule('quantum', 'topic', ('quantum',)),
+    rule('photosynthesis', 'topic', ('photosynthesis',)),
+    rule('pythagorean', 'topic', ('pythagorean', 'pythagoras')),
+    rule('calculus', 'topic', ('calculus',)),
+    rule('capital_of_france', 'topic', ('capital',), ('france',)),
+    rule('telephone', 'topic', ('telephone*',), ('invent*', 'who')),
+    rule('digital_marketing', 'topic', ('digital',), ('marketing',)),
+    rule('supply_chain', 'topic', ('supply chain*',)),
+    rule('exercise_benefits', 'topic', ('exercise*',), ('benefit*',)),
+    rule('study_habits', 'topic', ('study*',), ('habit*', 'improve*')),
+    rule('oop', 'topic', ('object*',), ('oriented',)),
+
+    # Small talk of the rule-based fallback (get_simple_response)
+    rule('greeting', 'simple', ('hello', 'hi', 'hey', 'greetings')),
+    rule('ask_name', 'simple', ('what is my name', "what's my name")),
+    rule('set_name', 'simple', ('my name is', 'call me', 'i am', 'my self', 'myself')),
+    rule('about_me', 'simple', ('tell me about yourself', 'who are you', 'what are you')),
+    rule('cloud', 'simple', ('cloud*', 'aws', 'azure', 'gcp', 'google cloud')),
+    rule('weather', 'simple', ('weather', 'rain*', 'sunny', 'storm*')),
+    rule('how_are_you', 'simple', ('how are you', 'how do you do', 'whats up', "what's up")),
+    rule('capabilities', 'simple', ('what can you do', 'help me', 'can you help')),
+    rule('time', 'simple', ('time', 'date', 'today', 'now')),
+    rule('thanks', 'simple', ('thank*', 'appreciate*')),
+    rule('goodbye', 'simple', ('bye', 'goodbye', 'see you', 'farewell')),
+]
+
+
+# 🔹 Matcher
+
+class _WordIndex(dict):
+    """Memo of message word -> its bits: one per rule key it matches (its own key and every
+    'stem*' it starts with) and, above those, one per rule that uses a phrase starting with
+    such a key. Words that match no key map to 0."""
+
+    def __init__(self, key_bits, key_rules, rule_shift, max_size):
+        super().__init__()
+        self.key_bits = key_bits  # key ('cloud' or 'cloud*') -> bit
+        self.key_rules = key_rules  # key -> bit mask of the rules with a phrase starting with it
+        self.rule_shift = rule_shift
+        self.stems = tuple(key[:-1] for key in key_bits if key.endswith(b'*'))
+        self.max_size = max_size
+
+    def __missing__(self, word):
+        bits = rules = 0
+        for key in [word] + [stem + b'*' for stem in self.stems if word.startswith(stem)]:
+            bits |= self.key_bits.get(key, 0)
+            rules |= self.key_rules.get(key, 0)
+        bits |= rules << self.rule_shift
+        if len(self) >= self.max_size:
+            self.clear()
+        self[word] = bits
+        return bits
+
+
+Scan = namedtuple('Scan', 'bits text')
+
+
+def _has_phrase(scan, longer):
+    """Whether one of the (key bits, needle) longer phrases occurs; stops at the first one found"""
+    for need, needle in longer:
+        if scan.bits & need == need and needle in scan.text:  # Only searched if all its words occur
+            return True
+    return False
+
+
+class RuleMatcher:
+    """Compiles the rule table once into key and rule bits; each message is tokenized a single time
+
+    Every key (a word, or a 'stem*') of the rule phrases and every rule has
+    a bit. Each distinct word of a message is looked up once in a memo that
+    gives the bits of the keys it matches and of the rules with a phrase
+    starting with one of them; the message is the OR of those. first_match()
+    checks just the rules whose bit is set, in table order, and stops at
+    the first match like the original if/elif chains. A single-word phrase
+    is one bit test; a longer phrase is searched for in the normalized
+    message, where each separator is one space ("What’s up?" matches
+    'what's up'; "what, is" does not match 'what is', as before), and
+    only when a rule being checked needs it and all of its words occur. A * is allowed on a single
+    word or on the last word of a longer phrase.
+    """
+
+    def __init__(self, rules, word_cache_size=20000):
+        self._key_bits = {}  # key ('cloud' or 'cloud*') -> bit
+        self._rules = []  # (name, all_of, none_of), one per rule bit, in table order
+        self._section_rules = {}  # section -> bit mask of its rules
+        key_rules = {}  # key -> bit mask of the rules with a phrase starting with it
+
+        for r in rules:
+            bit = 1 << len(self._rules)
+            for group in r.all_of:
+                for phrase in group:
+                    first = self._keys(phrase)[0]
+                    key_rules[first] = key_rules.get(first, 0) | bit
+            # Groups become (bits of their single-word phrases, ((key bits, needle), ...) of the longer ones)
+            all_of = tuple(self._compile_group(group) for group in r.all_of)
+            self._rules.append((r.name, all_of, self._compile_group(r.none_of)))
+            self._section_rules[r.section] = self._section_rules.get(r.section, 0) | bit
+
+        self._rule_shift = len(self._key_bits)
+        self._words = _WordIndex(self._key_bits, key_rules, self._rule_shift, word_cache_size)
+
+    def _keys(self, phrase):
+        keys = []
+        for token in phrase.split():
+            # Phrases are split exactly like messages ("what's" -> what, s)
+            keys += [words_of(token)[0] + b'*'] if token.endswith('*') else words_of(token)
+        if any(key.endswith(b'*') for key in keys[:-1]):
+            raise ValueError(f"rule phrase {phrase!r}: only its last word may end with *")
+        for key in keys:
+            self._key_bits.setdefault(key, 1 << len(self._key_bits))
+        return keys
+
+    def _compile_group(self, phrases):
+        single = 0
+        longer = []
+        for phrase in phrases:
+            keys = self._keys(phrase)
+            if len(keys) == 1:
+                single |= self._key_bits[keys[0]]
+                continue
+            need = functools.reduce(operator.or_, (self._key_bits[key] for key in keys))
+            # ' supply chain' (a stem) matches "supply chains"; ' my name is ' only whole words
+            needle = b' ' + b' '.join(key.rstrip(b'*') for key in keys) + (b'' if keys[-1].endswith(b'*') else b' ')
+            longer.append((need, needle))
+        return single, tuple(longer)
+
+    def scan(self, text):
+        """Tokenize text once for first_match()"""
+        text = normalize(text)
+        # One memo lookup per distinct word, ORed together in C
+        return Scan(functools.reduce(operator.or_, map(self._words.__getitem__, set(text.split())), 0),
+                    b' ' + text + b' ')
+
+    def first(self, text, section):
+        """Name of the first rule in section that matches text, or None"""
+        return self.first_match(self.scan(text), section)
+
+    def first_match(self, scan, section):
+        """Like first(), for a message already returned by scan()"""
+        bits = scan.bits
+        candidates = bits >> self._rule_shift & self._section_rules.get(section, 0)
+        while candidates:
+            lowest = candidates & -candidates
+            candidates ^= lowest
+            name, all_of, (unless, unless_longer) = self._rules[lowest.bit_length() - 1]
+            for single, longer in all_of:
+                if not bits & single and not (longer and _has_phrase(scan, longer)):
+                    break
+            else:
+                if not bits & unless and not (unless_longer and _has_phrase(scan, unless_longer)):
+                    return name
+        return None
+
+
+keyword_rules = RuleMatcher(RULES)
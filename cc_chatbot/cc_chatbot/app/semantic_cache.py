@@ -0,0 +1,138 @@
+"""
+Semantic response cache for Cloudy AI
+Finds a cached reply for a prompt that asks the same thing as an earlier
+one in different words. Each prompt is reduced to its question terms (see
+text_embedding.question_terms): the kind of question (what, how, why, ...)
+and the stems of its content words. Prompts with equal terms share an
+entry, so "What is cloud computing?" and "explain cloud computing to me"
+hit the same reply, while "How do I install Python?" never gets the reply
+to "How do I uninstall Python?", nor "Explain AWS Lambda pricing" the one
+to "Explain AWS Lambda".
+
+Entries are a dict keyed on (provider signature, question terms): a lookup
+is one hash probe. Bounded in size with LRU eviction, and persisted across
+restarts.
+
+An earlier version also compared n-gram embeddings against a cosine
+threshold, but the terms had to match exactly anyway, so the threshold
+could only reject good hits (benchmark_semantic_cache.py compares both).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from event_log import log_event
+from text_embedding import question_terms
+
+# Bump when the saved file's layout changes
+CACHE_FORMAT = 3
+
+
+class SemanticCache:
+    """LRU cache of (prompt → reply), keyed on the question the prompt asks"""
+
+    def __init__(self, max_entries=2000, ttl=86400, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # One save() at a time writes the file
+        self._entries = OrderedDict()  # (signature, terms) -> (prompt, provider, reply, expires)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._changes = 0  # Bumped by add(); the file is up to date while it equals _saved
+        self._saved = 0
+
+    @staticmethod
+    def make_key(prompt, signature):
+        return (signature, question_terms(prompt))
+
+    def lookup(self, prompt, signature):
+        """Return (provider, reply) cached for a prompt asking the same question, or None"""
+        key = self.make_key(prompt, signature)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            _, provider, reply, _ = entry
+            return provider, reply
+
+    def add(self, prompt, signature, provider, reply):
+        key = self.make_key(prompt, signature)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (prompt, provider, reply, time.time() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._changes += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            now = time.time()
+            return {
+                'entries': sum(1 for entry in self._entries.values() if entry[3] > now),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions
+            }
+
+    def save(self):
+        """Persist live entries, least recently used first, to <path>.json"""
+        if not self.path:
+            return
+        # Held until the file is renamed, so the periodic and the exit save can't mix up their temp files
+        with self._save_lock:
+            with self._lock:
+                if self._changes == self._saved:
+                    return
+                now = time.time()
+                entries = [(prompt, signature, provider, reply, expires)
+                           for (signature, _), (prompt, provider, reply, expires) in self._entries.items()
+                           if expires > now]
+                changes = self._changes
+
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(f"{self.path}.tmp.json", 'w', encoding='utf-8') as f:
+                json.dump({'format': CACHE_FORMAT, 'entries': entries}, f)
+            os.replace(f"{self.path}.tmp.json", f"{self.path}.json")
+            # Only now is the file up to date (with the entries added before the snapshot)
+            with self._lock:
+                self._saved = changes
+
+    def load(self):
+        """Restore entries saved by save(); returns the number loaded"""
+        if not self.path or not os.path.exists(f"{self.path}.json"):
+            return 0
+        try:
+            with open(f"{self.path}.json", encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            log_event('semantic_cache_load_failed', level='warning', error=str(e))
+            return 0
+        if meta.get('format') != CACHE_FORMAT:
+            log_event('semantic_cache_stale', level='info', format=meta.get('format'))
+            return 0  # Written by an older version of the cache
+
+        now = time.time()
+        live = [entry for entry in meta['entries'] if entry[4] > now][-self.max_entries:]
+        with self._lock:
+            for prompt, signature, provider, reply, expires in live:
+                # Terms are recomputed, so a change to question_terms() applies to saved entries too
+                self._entries[self.make_key(prompt, signature)] = (prompt, provider, reply, expires)
+        return len(live)
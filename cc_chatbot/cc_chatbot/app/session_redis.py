@@ -0,0 +1,228 @@
+"""
+Redis session backend for Cloudy AI
+Lets several workers or nodes share chat sessions. It speaks RESP (the
+Redis wire protocol) over a small pool of plain sockets, so it has no client
+library dependency and works with Redis, Valkey, KeyDB or a local stand-in
+server (see fake_redis.py). Each session is a list of messages plus a hash
+for its memory; an append is one pipelined round trip (RPUSH + LTRIM +
+EXPIRE), and recent history is one LRANGE over the newest messages. Idle
+expiry is the keys' TTL; configure maxmemory-policy allkeys-lru on the
+server to bound the number of sessions.
+"""
+
+import json
+import queue
+import socket
+import threading
+from urllib.parse import urlparse
+
+from event_log import log_event
+from session_store import Message, SessionBackend
+
+
+class RedisError(Exception):
+    pass
+
+
+class RespConnection:
+    """One socket speaking RESP2; commands are pipelined and replies read in order"""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    def pipeline(self, commands):
+        """Send every command in one write, then read one reply per command"""
+        self.sock.sendall(b''.join(map(encode_command, commands)))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode()
+        if kind == b'-':
+            return RedisError(payload.decode())
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            return self.reader.read(length + 2)[:-2].decode('utf-8')
+        if kind == b'*':
+            count = int(payload)
+            return None if count < 0 else [self._read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line[:40]!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def encode_command(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+class RedisSessionStore(SessionBackend):
+    """Chat history in Redis lists (messages) and hashes (memory)"""
+
+    def __init__(self, url='redis://localhost:6379/0', max_messages=200, idle_ttl=7200,
+                 pool_size=8, timeout=2.0, prefix='cloudy:'):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.max_messages = max_messages
+        self.idle_ttl = int(idle_ttl)
+        self.timeout = timeout
+        self.prefix = prefix
+
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._stats = {'commands': 0, 'round_trips': 0, 'errors': 0, 'deleted': 0}
+
+    def _connect(self):
+        connection = RespConnection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(('AUTH', self.password))
+        if self.db:
+            setup.append(('SELECT', self.db))
+        if setup:
+            connection.pipeline(setup)
+        return connection
+
+    def execute(self, *commands):
+        """Run commands in one round trip on a pooled connection and return their replies"""
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            replies = connection.pipeline(commands)
+        except RedisError as e:
+            # Command errors leave the connection usable
+            self._release(connection)
+            self._count(errors=1)
+            log_event('session_store_error', level='error', backend='redis', error=str(e))
+            raise
+        except OSError as e:
+            connection.close()
+            self._count(errors=1)
+            log_event('session_store_error', level='error', backend='redis', error=str(e))
+            raise
+        self._count(commands=len(commands), round_trips=1)
+        self._release(connection)
+        return replies
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _keys(self, session_id):
+        return f"{self.prefix}messages:{session_id}", f"{self.prefix}memory:{session_id}"
+
+    def append(self, session_id, role, content, provider=None):
+        message = Message(role, content, provider=provider)
+        messages_key, memory_key = self._keys(session_id)
+        record = json.dumps([message.timestamp, role, provider, content, message.tokens],
+                            ensure_ascii=False, separators=(',', ':'))
+        self.execute(
+            ('RPUSH', messages_key, record),
+            ('LTRIM', messages_key, -self.max_messages, -1),
+            ('EXPIRE', messages_key, self.idle_ttl),
+            ('EXPIRE', memory_key, self.idle_ttl)
+        )
+        return message
+
+    def history(self, session_id, limit=None):
+        messages_key, _ = self._keys(session_id)
+        records, = self.execute(('LRANGE', messages_key, -(limit or self.max_messages), -1))
+        return [Message(role, content, timestamp, provider, tokens)
+                for timestamp, role, provider, content, tokens in map(json.loads, records)]
+
+    def delete(self, session_id):
+        removed, = self.execute(('DEL', *self._keys(session_id)))
+        if removed:
+            self._count(deleted=1)
+        return bool(removed)
+
+    def recall(self, session_id, key, default=None):
+        _, memory_key = self._keys(session_id)
+        value, = self.execute(('HGET', memory_key, key))
+        return default if value is None else value
+
+    def remember(self, session_id, key, value):
+        messages_key, memory_key = self._keys(session_id)
+        self.execute(
+            ('HSET', memory_key, key, value),
+            ('EXPIRE', memory_key, self.idle_ttl),
+            ('EXPIRE', messages_key, self.idle_ttl)
+        )
+
+    def session_size(self, session_id):
+        messages_key, _ = self._keys(session_id)
+        records, = self.execute(('LRANGE', messages_key, 0, -1))
+        return sum(len(record.encode('utf-8')) for record in records) if records else None
+
+    def memory_report(self, top=20):
+        """Largest sessions by stored bytes (SCANs the keyspace; for debugging only)"""
+        rows = []
+        cursor = '0'
+        while True:
+            (cursor, keys), = self.execute(('SCAN', cursor, 'MATCH', f"{self.prefix}messages:*", 'COUNT', 500))
+            for key in keys:
+                session_id = key[len(f"{self.prefix}messages:"):]
+                records, ttl = self.execute(('LRANGE', key, 0, -1), ('TTL', key))
+                rows.append({
+                    'session': session_id[:8],
+                    'messages': len(records),
+                    'bytes': sum(len(record.encode('utf-8')) for record in records),
+                    'idle_seconds': self.idle_ttl - ttl if ttl >= 0 else None
+                })
+            if cursor == '0':
+                break
+        rows.sort(key=lambda row: row['bytes'], reverse=True)
+        return rows[:top]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._stats)
+        return {
+            'backend': 'redis',
+            'server': f"{self.host}:{self.port}/{self.db}",
+            'pooled_connections': self._pool.qsize(),
+            'max_messages': self.max_messages,
+            'idle_ttl': self.idle_ttl,
+            **counters
+        }
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._stats[name] += value
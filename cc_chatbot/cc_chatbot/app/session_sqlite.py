@@ -0,0 +1,314 @@
+"""
+SQLite session backend for Cloudy AI
+Chat history survives restarts and can be shared by several worker
+processes on one machine. The database runs in WAL mode so readers never
+block the writer. Appends are queued and a background thread commits them
+in batches (one transaction per batch, executemany); messages that are still
+queued are merged into reads, so a worker always sees its own writes. All
+SQL is fixed text, so the sqlite3 statement cache reuses prepared statements.
+Reads share a small pool of connections, so the number of open files does
+not grow with the number of request threads.
+Recent history is read newest-first through the (session_id, id) index, so
+the cost depends on the number of messages asked for, not the conversation
+length.
+"""
+
+import itertools
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from event_log import log_event
+from session_store import Message, SessionBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    created INTEGER NOT NULL,
+    last_access INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_access ON sessions (last_access);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    mid INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    provider TEXT,
+    ts INTEGER NOT NULL,
+    tokens INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS memory (
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (session_id, key)
+) WITHOUT ROWID;
+"""
+
+INSERT_MESSAGE = ("INSERT INTO messages (session_id, mid, role, content, provider, ts, tokens) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?)")
+TOUCH_SESSION = ("INSERT INTO sessions (session_id, created, last_access) VALUES (?, ?, ?) "
+                 "ON CONFLICT (session_id) DO UPDATE SET last_access = excluded.last_access")
+TRIM_SESSION = ("DELETE FROM messages WHERE session_id = ? AND id <= "
+                "(SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)")
+RECENT_MESSAGES = ("SELECT mid, role, content, provider, ts, tokens FROM messages "
+                   "WHERE session_id = ? ORDER BY id DESC LIMIT ?")
+SELECT_MEMORY = "SELECT value FROM memory WHERE session_id = ? AND key = ?"
+UPSERT_MEMORY = ("INSERT INTO memory (session_id, key, value) VALUES (?, ?, ?) "
+                 "ON CONFLICT (session_id, key) DO UPDATE SET value = excluded.value")
+SESSION_SIZE = "SELECT COUNT(*), SUM(LENGTH(content)) FROM messages WHERE session_id = ?"
+LARGEST_SESSIONS = ("SELECT m.session_id, COUNT(*), SUM(LENGTH(m.content)), s.created, s.last_access "
+                    "FROM messages m LEFT JOIN sessions s USING (session_id) "
+                    "GROUP BY m.session_id ORDER BY 3 DESC LIMIT ?")
+EXPIRED_SESSIONS = "SELECT session_id FROM sessions WHERE last_access < ?"
+LRU_OVERFLOW = "SELECT session_id FROM sessions ORDER BY last_access LIMIT ?"
+DELETE_SESSION = (
+    "DELETE FROM messages WHERE session_id = ?",
+    "DELETE FROM memory WHERE session_id = ?",
+    "DELETE FROM sessions WHERE session_id = ?",
+)
+
+# Per-row overhead added to content length in size estimates (ids, role, timestamp, index entry)
+ROW_OVERHEAD = 64
+
+
+class SQLiteSessionStore(SessionBackend):
+    """Persistent chat history in one SQLite file (WAL, batched writes)"""
+
+    def __init__(self, path, max_sessions=10000, max_messages=200, idle_ttl=7200, sweep_interval=60,
+                 batch_size=256, flush_interval=0.05, max_readers=4):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_readers = max(1, max_readers)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._idle_readers = queue.LifoQueue()  # Read connections not in use
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writer = self._connect()
+        self._writer.executescript(SCHEMA)
+        columns = {row[1] for row in self._writer.execute("PRAGMA table_info(messages)")}
+        if 'tokens' not in columns:  # Databases created before token counts were stored
+            self._writer.execute("ALTER TABLE messages ADD COLUMN tokens INTEGER NOT NULL DEFAULT 0")
+
+        # Message ids unique across processes, so queued and committed copies can be told apart
+        self._mids = itertools.count(random.getrandbits(30) << 32)
+        self._lock = threading.Lock()  # Guards _pending/_flushing
+        self._pending = []  # (session_id, Message, mid) waiting for the writer
+        self._flushing = []  # The batch being committed right now
+        self._commit_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+        self._stats = {'batches': 0, 'written': 0, 'expired': 0, 'evicted': 0, 'deleted': 0, 'write_errors': 0}
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                                     isolation_level=None, cached_statements=64)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # Durable across app crashes; fsync on checkpoint
+        with self._connections_lock:
+            self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def _reader(self):
+        """Borrow a read connection; at most max_readers are ever opened, other readers wait"""
+        try:
+            connection = self._idle_readers.get_nowait()
+        except queue.Empty:
+            with self._connections_lock:
+                # The writer is in _connections too
+                can_open = len(self._connections) <= self.max_readers
+            connection = self._connect() if can_open else self._idle_readers.get()
+        try:
+            yield connection
+        finally:
+            self._idle_readers.put(connection)
+
+    def append(self, session_id, role, content, provider=None):
+        message = Message(role, content, provider=provider)
+        with self._lock:
+            self._pending.append((session_id, message, next(self._mids)))
+            backlog = len(self._pending)
+        if self._flusher is None:
+            self.flush()  # No background writer: write through
+        elif backlog >= self.batch_size:
+            self._wakeup.set()
+        return message
+
+    def history(self, session_id, limit=None):
+        with self._lock:
+            queued = [(mid, message) for sid, message, mid in self._flushing + self._pending if sid == session_id]
+        with self._reader() as reader:
+            rows = reader.execute(RECENT_MESSAGES, (session_id, limit or self.max_messages)).fetchall()
+        # A queued message may already be committed if the writer finished in between
+        committed = {row[0] for row in rows}
+        messages = [Message(role, content, ts, provider, tokens)
+                    for mid, role, content, provider, ts, tokens in reversed(rows)]
+        messages += [message for mid, message in queued if mid not in committed]
+        return messages[-limit:] if limit else messages
+
+    def delete(self, session_id):
+        with self._lock:
+            self._pending = [item for item in self._pending if item[0] != session_id]
+        with self._commit_lock:
+            existed = self._delete_sessions(self._writer, [session_id])
+        if existed:
+            self._count(deleted=1)
+        return bool(existed)
+
+    def recall(self, session_id, key, default=None):
+        with self._reader() as reader:
+            row = reader.execute(SELECT_MEMORY, (session_id, key)).fetchone()
+        return row[0] if row else default
+
+    def remember(self, session_id, key, value):
+        now = int(time.time())
+        with self._commit_lock:
+            with self._writer:
+                self._writer.execute("BEGIN")
+                self._writer.execute(UPSERT_MEMORY, (session_id, key, value))
+                self._writer.execute(TOUCH_SESSION, (session_id, now, now))
+
+    def flush(self):
+        """Commit every queued message in one transaction"""
+        with self._commit_lock:
+            with self._lock:
+                batch = self._flushing = self._pending
+                self._pending = []
+            if not batch:
+                return 0
+            try:
+                self._write_batch(batch)
+            except sqlite3.Error as e:
+                # Put the batch back so nothing is lost; the next flush retries it
+                with self._lock:
+                    self._pending = batch + self._pending
+                self._count(write_errors=1)
+                log_event('session_write_failed', level='error', backend='sqlite', messages=len(batch), error=str(e))
+                return 0
+            finally:
+                with self._lock:
+                    self._flushing = []
+        self._count(batches=1, written=len(batch))
+        return len(batch)
+
+    def _write_batch(self, batch):
+        now = int(time.time())
+        sessions = {session_id for session_id, _, _ in batch}
+        with self._writer:
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._writer.executemany(INSERT_MESSAGE, [
+                (session_id, mid, m.role, m.content, m.provider, m.timestamp, m.tokens)
+                for session_id, m, mid in batch])
+            self._writer.executemany(TOUCH_SESSION, [(session_id, now, now) for session_id in sessions])
+            # Keep only the newest max_messages of each session written to
+            self._writer.executemany(TRIM_SESSION, [
+                (session_id, session_id, self.max_messages) for session_id in sessions])
+
+    def start_sweeper(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='session-writer', daemon=True)
+            self._flusher.start()
+            threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True).start()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except sqlite3.Error as e:
+                log_event('session_sweep_failed', level='error', backend='sqlite', error=str(e))
+
+    def sweep(self):
+        """Delete idle sessions, then the least recently used ones beyond max_sessions"""
+        cutoff = int(time.time() - self.idle_ttl)
+        with self._commit_lock:
+            expired = [row[0] for row in self._writer.execute(EXPIRED_SESSIONS, (cutoff,))]
+            self._delete_sessions(self._writer, expired)
+            overflow = self._writer.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+            evicted = []
+            if overflow > 0:
+                evicted = [row[0] for row in self._writer.execute(LRU_OVERFLOW, (overflow,))]
+                self._delete_sessions(self._writer, evicted)
+        if expired or evicted:
+            self._count(expired=len(expired), evicted=len(evicted))
+            log_event('sessions_expired', backend='sqlite', count=len(expired), evicted=len(evicted))
+        return len(expired) + len(evicted)
+
+    def _delete_sessions(self, connection, session_ids):
+        if not session_ids:
+            return 0
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for statement in DELETE_SESSION:
+                cursor = connection.executemany(statement, [(session_id,) for session_id in session_ids])
+        return cursor.rowcount  # Rows removed from sessions
+
+    def session_size(self, session_id):
+        with self._reader() as reader:
+            count, length = reader.execute(SESSION_SIZE, (session_id,)).fetchone()
+        return length + count * ROW_OVERHEAD if count else None
+
+    def memory_report(self, top=20):
+        now = time.time()
+        with self._reader() as reader:
+            rows = reader.execute(LARGEST_SESSIONS, (top,)).fetchall()
+        return [{
+            'session': session_id[:8],
+            'messages': count,
+            'bytes': length + count * ROW_OVERHEAD,
+            'idle_seconds': round(now - last_access, 1) if last_access else None,
+            'created': created
+        } for session_id, count, length, created, last_access in rows]
+
+    def stats(self):
+        with self._reader() as reader:
+            sessions = reader.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            messages = reader.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        with self._lock:
+            pending = len(self._pending) + len(self._flushing)
+            counters = dict(self._stats)
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'sessions': sessions,
+            'messages': messages,
+            'pending_writes': pending,
+            'file_bytes': sum(os.path.getsize(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p)),
+            'max_sessions': self.max_sessions,
+            'max_messages': self.max_messages,
+            'idle_ttl': self.idle_ttl,
+            **counters
+        }
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        self.flush()
+        for connection in self._connections:
+            connection.close()
+
+    def _count(self, **increments):
+        with self._lock:
+            for name, value in increments.items():
+                self._stats[name] += value
@@ -0,0 +1,310 @@
+"""
+Chat session storage for Cloudy AI
+SessionBackend is the interface every store implements (chat history plus
+the small per-session memory, such as the user's name). SessionStore keeps
+everything in process memory: sessions are spread over lock-striped shards
+so concurrent requests for different sessions rarely contend, each shard is
+an LRU bounded by its share of max_sessions, idle sessions are removed by a
+background sweeper, and each session keeps at most max_messages compact
+message records. Persistent backends live in session_sqlite.py and
+session_redis.py; create_session_store() picks one from a URL.
+"""
+
+import itertools
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+from conversation_context import count_tokens
+from event_log import log_event
+
+
+class Message:
+    """One chat message; timestamp is integer epoch seconds, tokens is counted once on creation"""
+
+    __slots__ = ('role', 'content', 'timestamp', 'provider', 'tokens')
+
+    def __init__(self, role, content, timestamp=None, provider=None, tokens=None):
+        self.role = role
+        self.content = content
+        self.timestamp = int(time.time()) if timestamp is None else timestamp
+        self.provider = provider
+        self.tokens = count_tokens(content) if tokens is None else tokens
+
+    def to_dict(self):
+        message = {'role': self.role, 'content': self.content, 'timestamp': self.timestamp}
+        if self.provider:
+            message['provider'] = self.provider
+        return message
+
+    def size(self):
+        """Approximate bytes held by this record (roles/providers are shared interned strings)"""
+        return sys.getsizeof(self) + sys.getsizeof(self.content) + sys.getsizeof(self.timestamp)
+
+
+class ChatSession:
+    __slots__ = ('messages', 'memory', 'created', 'last_access')
+
+    def __init__(self, max_messages):
+        self.messages = deque(maxlen=max_messages)
+        self.memory = None  # Created on first remember()
+        self.created = int(time.time())
+        self.last_access = time.monotonic()
+
+    def size(self):
+        size = sys.getsizeof(self) + sys.getsizeof(self.messages) + sum(m.size() for m in self.messages)
+        if self.memory:
+            size += sys.getsizeof(self.memory) + sum(sys.getsizeof(v) for v in self.memory.values())
+        return size
+
+
+class _Shard:
+    __slots__ = ('lock', 'sessions')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()  # session_id -> ChatSession, least recently used first
+
+
+class SessionBackend:
+    """Interface of a session store; every method must be thread-safe"""
+
+    def append(self, session_id, role, content, provider=None):
+        """Add a message to the session (creating it if needed) and return the Message"""
+        raise NotImplementedError
+
+    def history(self, session_id, limit=None):
+        """The session's messages, oldest first; only the newest `limit` are read if given"""
+        raise NotImplementedError
+
+    def delete(self, session_id):
+        """Forget the session's history and memory; returns True if it existed"""
+        raise NotImplementedError
+
+    def recall(self, session_id, key, default=None):
+        """A value remembered for the session (e.g. the user's name)"""
+        raise NotImplementedError
+
+    def remember(self, session_id, key, value):
+        raise NotImplementedError
+
+    def session_size(self, session_id):
+        """Approximate bytes used by one session, or None if it doesn't exist"""
+        raise NotImplementedError
+
+    def memory_report(self, top=20):
+        """The largest sessions by approximate size"""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def start_sweeper(self):
+        """Start background expiry/flushing, if the backend needs it"""
+
+    def close(self):
+        """Flush pending writes and release connections"""
+
+
+class SessionStore(SessionBackend):
+    """In-memory, bounded chat history: LRU + idle TTL + per-session message cap"""
+
+    def __init__(self, max_sessions=10000, max_messages=200, idle_ttl=7200, stripes=16, sweep_interval=60):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._shards = [_Shard() for _ in range(stripes)]
+        self._max_per_shard = max(1, -(-max_sessions // stripes))
+
+        self._stats_lock = threading.Lock()
+        self._stats = {'evicted': 0, 'expired': 0, 'deleted': 0, 'messages_trimmed': 0}
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def append(self, session_id, role, content, provider=None):
+        """Add a message, creating the session if needed"""
+        message = Message(role, content, provider=provider)
+        shard = self._shard(session_id)
+        evicted = 0
+        with shard.lock:
+            chat = shard.sessions.get(session_id)
+            if chat is None:
+                chat = shard.sessions[session_id] = ChatSession(self.max_messages)
+                evicted = self._evict_over_capacity(shard)
+            else:
+                shard.sessions.move_to_end(session_id)
+            trimmed = len(chat.messages) == self.max_messages
+            chat.messages.append(message)
+            chat.last_access = time.monotonic()
+
+        if evicted or trimmed:
+            self._count(evicted=evicted, messages_trimmed=int(trimmed))
+        return message
+
+    def history(self, session_id, limit=None):
+        """The session's messages, oldest first (the last `limit` if given)"""
+        shard = self._shard(session_id)
+        with shard.lock:
+            chat = shard.sessions.get(session_id)
+            if chat is None:
+                return []
+            shard.sessions.move_to_end(session_id)
+            chat.last_access = time.monotonic()
+            if not limit:
+                return list(chat.messages)
+            # Walk back from the newest message so the cost is O(limit)
+            messages = list(itertools.islice(reversed(chat.messages), limit))
+        messages.reverse()
+        return messages
+
+    def recall(self, session_id, key, default=None):
+        shard = self._shard(session_id)
+        with shard.lock:
+            chat = shard.sessions.get(session_id)
+            if chat is None or not chat.memory:
+                return default
+            return chat.memory.get(key, default)
+
+    def remember(self, session_id, key, value):
+        shard = self._shard(session_id)
+        evicted = 0
+        with shard.lock:
+            chat = shard.sessions.get(session_id)
+            if chat is None:
+                chat = shard.sessions[session_id] = ChatSession(self.max_messages)
+                evicted = self._evict_over_capacity(shard)
+            else:
+                shard.sessions.move_to_end(session_id)
+            if chat.memory is None:
+                chat.memory = {}
+            chat.memory[key] = value
+            chat.last_access = time.monotonic()
+        if evicted:
+            self._count(evicted=evicted)
+
+    def delete(self, session_id):
+        shard = self._shard(session_id)
+        with shard.lock:
+            removed = shard.sessions.pop(session_id, None) is not None
+        if removed:
+            self._count(deleted=1)
+        return removed
+
+    def __contains__(self, session_id):
+        shard = self._shard(session_id)
+        with shard.lock:
+            return session_id in shard.sessions
+
+    def __len__(self):
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def sweep(self):
+        """Remove sessions idle for longer than idle_ttl; returns how many were removed"""
+        cutoff = time.monotonic() - self.idle_ttl
+        expired = 0
+        for shard in self._shards:
+            with shard.lock:
+                # Shards are in LRU order, so idle sessions are at the front
+                while shard.sessions:
+                    session_id, chat = next(iter(shard.sessions.items()))
+                    if chat.last_access > cutoff:
+                        break
+                    del shard.sessions[session_id]
+                    expired += 1
+        if expired:
+            self._count(expired=expired)
+            log_event('sessions_expired', count=expired)
+        return expired
+
+    def start_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def close(self):
+        self._stop.set()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                log_event('session_sweep_failed', level='error', error=str(e))
+
+    def session_size(self, session_id):
+        shard = self._shard(session_id)
+        with shard.lock:
+            chat = shard.sessions.get(session_id)
+            return chat.size() if chat else None
+
+    def memory_report(self, top=20):
+        now = time.monotonic()
+        rows = []
+        for shard in self._shards:
+            with shard.lock:
+                for session_id, chat in shard.sessions.items():
+                    rows.append({
+                        'session': session_id[:8],  # Enough to tell sessions apart without exposing the id
+                        'messages': len(chat.messages),
+                        'bytes': chat.size(),
+                        'idle_seconds': round(now - chat.last_access, 1),
+                        'created': chat.created
+                    })
+        rows.sort(key=lambda row: row['bytes'], reverse=True)
+        return rows[:top]
+
+    def stats(self):
+        sessions = messages = 0
+        for shard in self._shards:
+            with shard.lock:
+                sessions += len(shard.sessions)
+                messages += sum(len(chat.messages) for chat in shard.sessions.values())
+        with self._stats_lock:
+            counters = dict(self._stats)
+        return {
+            'sessions': sessions,
+            'messages': messages,
+            'max_sessions': self.max_sessions,
+            'max_messages': self.max_messages,
+            'backend': 'memory',
+            'idle_ttl': self.idle_ttl,
+            **counters
+        }
+
+    def _evict_over_capacity(self, shard):
+        """Drop the shard's least recently used sessions beyond its share of max_sessions"""
+        evicted = 0
+        while len(shard.sessions) > self._max_per_shard:
+            shard.sessions.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def _shard(self, session_id):
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for name, value in increments.items():
+                self._stats[name] += value
+
+
+def create_session_store(url='memory://', **options):
+    """Build a session backend from a URL: memory://, sqlite:///path/to/sessions.db
+    or redis://host:port/db. Options are the SessionStore limits; lock stripes
+    only apply in memory, and Redis leaves session count limits to the server's
+    maxmemory policy."""
+    scheme, _, location = url.partition('://')
+    if scheme == 'memory':
+        return SessionStore(**options)
+    options.pop('stripes', None)
+    if scheme == 'sqlite':
+        from session_sqlite import SQLiteSessionStore
+        return SQLiteSessionStore(location, **options)
+    if scheme == 'redis':
+        from session_redis import RedisSessionStore
+        options.pop('max_sessions', None)
+        options.pop('sweep_interval', None)
+        return RedisSessionStore(url, **options)
+    raise ValueError(f"Unknown session backend: {url}")
@@ -0,0 +1,118 @@
+"""
+Cheap local text embeddings for Cloudy AI
+Hashes word and character n-gram features into a fixed-size vector with
+NumPy. No model download and no network - good enough to tell that
+"What is cloud computing?" and "explain cloud computing to me" are the
+same question.
+
+Question words are not filler: "How do I learn Python?" and "Why should I
+learn Python?" are different questions about the same topic. Each text gets
+a question kind (what/how/why/who/when/where), which is a feature
+of its vector, and question_terms() gives its kind and the stems of its
+content words, which must match exactly for two texts to be the same
+question (see SemanticCache).
+"""
+
+import re
+import zlib
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+EMBEDDING_DIM = 1024
+# Bump when the features below change, so vectors persisted to disk are rebuilt
+EMBEDDING_VERSION = 2
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Filler words that say little about what is being asked
+STOPWORDS = frozenset("""
+a an the is are was were be been am do does did to of in on for with about at by from
+and or but me my i you your we us it its this that these those can could would should
+please tell give show some any simple terms basics basic concept
+""".split())
+
+# Question words -> the kind of question they ask. "Explain X" and "what is X"
+# ask the same; a specific word ("explain how ...") wins over the generic ones.
+QUESTION_WORDS = {
+    'what': 'what', 'whats': 'what', 'which': 'what', 'explain': 'what', 'define': 'what',
+    'describe': 'what', 'meaning': 'what',
+    'how': 'how', 'why': 'why', 'who': 'who', 'whom': 'who', 'whose': 'who', 'when': 'when',
+    'where': 'where',
+}
+
+_SUFFIXES = ('ations', 'ation', 'ings', 'ing', 'ers', 'ors', 'ed', 'er', 'or', 'es', 's', 'e', 'ly')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def question_kind(words):
+    """'what', 'how', 'why', 'who', 'when' or 'where' ('tell me about X' asks what X is)"""
+    specific = [QUESTION_WORDS[w] for w in words if QUESTION_WORDS.get(w, 'what') != 'what']
+    return specific[0] if specific else 'what'
+
+
+def _content_words(words):
+    content = [w for w in words if w not in STOPWORDS and w not in QUESTION_WORDS]
+    return content or [w for w in words if w not in QUESTION_WORDS]
+
+
+def _stem(word):
+    """Crude suffix stripping: 'invented'/'inventor' -> 'invent', 'reverses'/'reverse' -> 'revers'"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def question_terms(text):
+    """(question kind, stems of the content words): equal for texts that ask the same thing"""
+    words = tokenize(text)
+    return question_kind(words), frozenset(_stem(w) for w in _content_words(words))
+
+
+def _features(text):
+    """The question kind, content words, word bigrams and character 3/4-grams of the content words"""
+    tokens = tokenize(text)
+    words = _content_words(tokens)
+
+    features = [f"?{question_kind(tokens)}"] * 2  # Weighs like two content words
+    features += words
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        for n in (3, 4):
+            features += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    return features
+
+
+def _bucket(feature, dim):
+    # crc32 is stable across processes (unlike hash()), so vectors can be persisted
+    return zlib.crc32(feature.encode('utf-8')) % dim
+
+
+def embed(text, dim=EMBEDDING_DIM):
+    """Return an L2-normalized float32 vector for text"""
+    vector = np.zeros(dim, dtype=np.float32)
+    features = _features(text)
+    if not features:
+        return vector
+
+    buckets = np.fromiter((_bucket(f, dim) for f in features), dtype=np.int64, count=len(features))
+    counts = np.bincount(buckets, minlength=dim).astype(np.float32)
+    vector = np.log1p(counts)  # Sublinear term frequency
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_many(texts, dim=EMBEDDING_DIM):
+    """Embed several texts into a (len(texts), dim) matrix"""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        matrix[i] = embed(text, dim)
+    return matrix
@@ -0,0 +1,226 @@
+"""
+Per-request tracing for Cloudy AI
+Each /get gets a Trace whose spans time its stages (intent check, web
+search, context, cache, every provider attempt, the Ollama queue and call,
+the fallback). The breakdown is sent back as a Server-Timing header, so
+browser devtools show where the milliseconds went, and finished traces can
+be appended to a JSONL file as OpenTelemetry OTLP/JSON (one
+ExportTraceServiceRequest per line, as the OpenTelemetry Collector's
+otlpjsonfile receiver reads).
+
+The current span lives in a contextvar: asyncio tasks and asyncio.to_thread
+inherit it, and provider_race.py copies it to its worker threads. Outside a
+traced request span() does nothing, so instrumented code costs next to
+nothing when tracing is off.
+"""
+
+import contextvars
+import functools
+import inspect
+import queue
+import random
+import re
+import time
+from contextlib import contextmanager
+
+from event_log import EventLogger
+
+_current = contextvars.ContextVar('span', default=None)
+
+TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed stage; ended spans are collected by their trace"""
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start_ns', 'started', 'duration', 'attributes',
+                 'error')
+
+    def __init__(self, trace, name, parent_id, attributes, started=None):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        now = time.perf_counter()
+        self.started = now if started is None else started
+        self.start_ns = time.time_ns() - int((now - self.started) * 1e9)
+        self.duration = None
+        self.attributes = attributes
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.started
+            self.trace.spans.append(self)  # list.append is atomic: spans may end on other threads
+            self.trace.running.discard(self)
+
+
+class Trace:
+    """The spans of one request, under a root span named after the route"""
+
+    def __init__(self, tracer, name, traceparent=None, **attributes):
+        self.tracer = tracer
+        match = TRACEPARENT.match(traceparent or '')
+        # Continue the caller's trace (W3C traceparent) when there is one
+        self.trace_id = match.group(1) if match else f"{random.getrandbits(128):032x}"
+        self.sampled = tracer.sample_rate >= 1.0 or random.random() < tracer.sample_rate
+        self.spans = []
+        self.running = set()  # Started, not yet ended (e.g. a raced provider still going after the reply)
+        self.root = Span(self, name, match.group(2) if match else None, attributes)
+        self._token = None
+
+    def attach(self):
+        """Make the root span the current span (until detach())"""
+        self._token = _current.set(self.root)
+        return self
+
+    def detach(self):
+        token, self._token = self._token, None
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:
+                pass  # Set in another context (e.g. a generator resumed elsewhere): nothing to undo here
+
+    def server_timing(self):
+        """Server-Timing header value: the ended spans in start order, then the total so far"""
+        entries = []
+        for span in sorted(self.spans[:self.tracer.max_header_spans], key=lambda span: span.started):
+            if span is self.root:
+                continue
+            entry = f"{span.name};dur={span.duration * 1000:.1f}"
+            if span.error:
+                entry += f';desc="{span.error}"'
+            entries.append(entry)
+        entries.append(f"total;dur={(time.perf_counter() - self.root.started) * 1000:.1f}")
+        return ', '.join(entries)
+
+    def finish(self):
+        """End the root span and hand the trace to the exporter (if sampled)"""
+        self.detach()
+        if self.root.duration is not None:
+            return
+        self.root.end()
+        if self.tracer.exporter is not None and self.sampled:
+            self.tracer.exporter.export(self.as_otlp())
+
+    def as_otlp(self):
+        """This trace as an OTLP/JSON ExportTraceServiceRequest; spans still running are cut off here"""
+        running = set(self.running)
+        ended = list(self.spans)
+        now = time.perf_counter()
+        spans = []
+        for span in ended + list(running.difference(ended)):
+            duration = span.duration
+            if duration is None:
+                duration = now - span.started
+                span.attributes['abandoned'] = True
+            record = {
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': SPAN_KIND_SERVER if span is self.root else SPAN_KIND_INTERNAL,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.start_ns + int(duration * 1e9)),
+                'attributes': [_attribute(key, value) for key, value in span.attributes.items() if value is not None],
+                'status': {'code': STATUS_ERROR, 'message': span.error} if span.error else {}
+            }
+            if span.parent_id:
+                record['parentSpanId'] = span.parent_id
+            spans.append(record)
+        return {'resourceSpans': [{
+            'resource': {'attributes': [_attribute('service.name', self.tracer.service_name)]},
+            'scopeSpans': [{'scope': {'name': 'cloudy.tracing'}, 'spans': spans}]
+        }]}
+
+
+class Tracer:
+    """Starts request traces; disabled (start() returns None) without Server-Timing or an exporter"""
+
+    def __init__(self, service_name='cloudy-ai', server_timing=True, exporter=None, sample_rate=1.0,
+                 max_header_spans=40):
+        self.service_name = service_name
+        self.server_timing = server_timing
+        self.exporter = exporter
+        self.sample_rate = sample_rate  # Share of traces exported (Server-Timing is always sent)
+        self.max_header_spans = max_header_spans
+
+    @property
+    def enabled(self):
+        return self.server_timing or self.exporter is not None
+
+    def start(self, name, traceparent=None, **attributes):
+        """A new attached Trace for a request, or None when tracing is off"""
+        if not self.enabled:
+            return None
+        return Trace(self, name, traceparent, **attributes).attach()
+
+
+class TraceExporter(EventLogger):
+    """Appends finished traces to a size-rotated JSONL file on the event log's background writer"""
+
+    def export(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time the with-block as a child of the current span (no-op outside a traced request)"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    parent.trace.running.add(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        child.end()
+
+
+def add_span(name, started, **attributes):
+    """Record a stage that began at perf_counter() value started and ends now"""
+    parent = _current.get()
+    if parent is not None:
+        Span(parent.trace, name, parent.span_id, attributes, started=started).end()
+
+
+def traced(name):
+    """Decorator: run each call of the function (sync or async) in a span"""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def traced_async(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return traced_async
+
+        @functools.wraps(fn)
+        def traced_sync(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return traced_sync
+    return decorate
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
@@ -0,0 +1,309 @@
+"""
+Result page enrichment for Cloudy AI's web search answers
+Search snippets are a sentence or two. PageFetcher fetches the top result
+pages concurrently and extracts their main text with BeautifulSoup, so the
+answer can quote the pages themselves.
+
+Each enrichment has a fixed total budget: pages still loading when it runs
+out are left out of the answer (a late sync fetch still fills the cache),
+however many there are and however slow. Each page also has its own
+deadline and a byte cap on its body, which is streamed and cut off at the
+cap. Pages are parsed with lxml when installed (else html.parser) and only
+the text blocks are built into a tree (a SoupStrainer), which is most of
+the parse time saved.
+
+Extracted text is cached by URL. Once stale, a page is revalidated with
+If-None-Match/If-Modified-Since from its ETag/Last-Modified, so a 304
+reuses the cached text without downloading or parsing the page again.
+"""
+
+import asyncio
+import contextvars
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+
+from event_log import log_event
+from http_clients import PoolSettings, httpx_async_client, requests_session
+from providers import installed
+from response_cache import ResponseCache
+from tracing import span
+
+BS4_AVAILABLE = installed('bs4')
+PARSER = 'lxml' if installed('lxml') else 'html.parser'
+
+# Only these elements (and what they contain) are built into the tree
+TEXT_TAGS = ['title', 'p', 'li', 'blockquote', 'pre', 'h1', 'h2', 'h3']
+HEADINGS = {'title', 'h1', 'h2', 'h3'}
+HTML_TYPES = ('text/html', 'application/xhtml+xml')
+USER_AGENT = 'Mozilla/5.0 (compatible; CloudyAI/1.0)'
+_WHITESPACE = re.compile(r'\s+')
+_SENTENCE_END = re.compile(r'[.!?](?=\s)')
+
+_strainer = None
+
+
+def extract_text(html, encoding=None, max_chars=2000, min_block_chars=40):
+    """The main text of an HTML page (bytes or str): its paragraphs and other long text blocks
+
+    Short blocks (menus, buttons, footers) and headings are dropped, as are
+    repeats; the rest is joined up to max_chars.
+    """
+    global _strainer
+    from bs4 import BeautifulSoup, SoupStrainer  # Imported with the first page, not at start-up
+    if _strainer is None:
+        _strainer = SoupStrainer(TEXT_TAGS)
+    soup = BeautifulSoup(html, PARSER, parse_only=_strainer,
+                         from_encoding=encoding if isinstance(html, bytes) else None)
+    blocks, seen, length = [], set(), 0
+    # The strained soup's children are the outermost text elements, so nested ones aren't repeated
+    for element in soup.children:
+        if getattr(element, 'name', None) is None or element.name in HEADINGS:
+            continue
+        text = _WHITESPACE.sub(' ', element.get_text(' ', strip=True))
+        if len(text) < min_block_chars or text in seen:
+            continue
+        seen.add(text)
+        blocks.append(text)
+        length += len(text) + 1
+        if length >= max_chars:
+            break
+    return '\n'.join(blocks)[:max_chars]
+
+
+def excerpt(text, limit=500):
+    """The start of text, up to limit characters, cut after a sentence (or a word) where possible"""
+    text = _WHITESPACE.sub(' ', text or '').strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    ends = [match.end() for match in _SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] > limit // 2:
+        return cut[:ends[-1]]
+    return cut.rsplit(' ', 1)[0] + '…'
+
+
+def fetchable(url):
+    return bool(url) and urlsplit(url).scheme in ('http', 'https')
+
+
+class PageFetcher:
+    """Fetches and extracts the top result pages of a search within a fixed budget"""
+
+    def __init__(self, pages=3, budget=2.0, page_timeout=1.5, max_bytes=512 * 1024, max_chars=2000,
+                 ttl=600, stale_ttl=86400, workers=6, cache_mb=8, connect_timeout=1.0):
+        self.pages = pages  # Result pages fetched per search
+        self.budget = budget  # Seconds for the whole enrichment, however many pages are slow
+        self.page_timeout = page_timeout  # Seconds for one page, connect to last byte
+        self.max_bytes = max_bytes  # Bytes of a page body read at most
+        self.max_chars = max_chars  # Characters of text kept per page
+        self.ttl = ttl  # Seconds cached text is used without asking the site
+        self.stale_ttl = stale_ttl  # Seconds it is kept for revalidation after that
+
+        self._cache = ResponseCache(max_bytes=int(cache_mb * 1024 * 1024), max_entry_bytes=max_chars * 4 + 4096,
+                                    ttl=stale_ttl)
+        self._http_settings = PoolSettings(pool_size=workers, keepalive=workers, connect_timeout=connect_timeout,
+                                           read_timeout=page_timeout)
+        # Fetches run on their own bounded pool, so slow sites can't hold up other work
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='web-page')
+        self._session = requests_session(self._http_settings)
+        self._session.headers['User-Agent'] = USER_AGENT
+        self._async_client = None
+        self._stats_lock = threading.Lock()
+        self._stats = {'enrichments': 0, 'pages': 0, 'cache_hits': 0, 'revalidated': 0, 'fetched': 0,
+                       'truncated': 0, 'timeouts': 0, 'late': 0, 'skipped': 0, 'errors': 0,
+                       'bytes': 0}
+
+    def enrich(self, results, timeout=None):
+        """Copies of results, with a 'text' from each top page that was fetched in time
+
+        timeout shortens the budget (e.g. to what is left of a request's deadline).
+        """
+        budget = self.budget if timeout is None else min(self.budget, timeout)
+        targets = self._targets(results)
+        if not targets or budget <= 0:
+            return results
+        with span('web_pages', pages=len(targets)):
+            futures = {self._executor.submit(contextvars.copy_context().run, self._fetch, url): url
+                       for url in targets}
+            done, late = wait(futures, timeout=budget)
+            for future in late:
+                future.cancel()  # Still queued for a worker; a running fetch is abandoned
+            texts = {futures[future]: future.result() for future in done if not future.exception()}
+        return self._merge(results, texts, late=len(late))
+
+    async def enrich_async(self, results, timeout=None):
+        """enrich() on the event loop: pages are fetched by tasks, and cancelled when the budget runs out"""
+        budget = self.budget if timeout is None else min(self.budget, timeout)
+        targets = self._targets(results)
+        if not targets or budget <= 0:
+            return results
+        with span('web_pages', pages=len(targets)):
+            tasks = {asyncio.ensure_future(self._fetch_async(url)): url for url in targets}
+            try:
+                done, late = await asyncio.wait(tasks, timeout=budget)
+            finally:
+                for task in tasks:
+                    task.cancel()  # Late ones, or all if the request itself was cancelled
+            texts = {tasks[task]: task.result() for task in done if not task.exception()}
+        return self._merge(results, texts, late=len(late))
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats.update(parser=PARSER, pages_per_search=self.pages, budget=self.budget, page_timeout=self.page_timeout,
+                     max_bytes=self.max_bytes, cache=self._cache.stats())
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._session.close()
+
+    async def aclose(self):
+        client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+    def _targets(self, results):
+        self._count('enrichments')
+        urls = []
+        for result in (results or [])[:self.pages]:
+            url = result.get('href')
+            if fetchable(url) and url not in urls:
+                urls.append(url)
+        return urls
+
+    def _merge(self, results, texts, late):
+        if late:
+            self._count('late', late)
+            log_event('web_pages_late', level='debug', pages=late, budget=self.budget)
+        merged = []
+        for result in results:
+            text = texts.get(result.get('href'))
+            # Copies: the search results themselves are shared through the search cache
+            merged.append({**result, 'text': text} if text else result)
+        return merged
+
+    def _cached(self, url):
+        """(cached entry or None, whether it is fresh enough to use without revalidating)"""
+        self._count('pages')
+        entry = self._cache.get(url)
+        if entry is not None and entry['fresh_until'] > time.monotonic():
+            self._count('cache_hits')
+            return entry, True
+        return entry, False
+
+    def _conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _revalidated(self, url, entry):
+        self._count('revalidated')
+        self._store(url, entry['text'], entry['etag'], entry['last_modified'])
+        return entry['text']
+
+    def _fetch(self, url):
+        entry, fresh = self._cached(url)
+        if fresh:
+            return entry['text']
+        started = time.monotonic()
+        try:
+            with span('web_page', url=url[:200]), \
+                    self._session.get(url, headers=self._conditional_headers(entry), stream=True,
+                                      timeout=self._http_settings.timeout()) as response:
+                if response.status_code == 304 and entry is not None:
+                    return self._revalidated(url, entry)
+                if not self._is_html(url, response.status_code, response.headers):
+                    return None
+                body, complete = bytearray(), True
+                for chunk in response.iter_content(16 * 1024):
+                    body += chunk
+                    if len(body) >= self.max_bytes:
+                        complete = False
+                        break
+                    if time.monotonic() - started > self.page_timeout:
+                        self._count('timeouts')
+                        complete = False
+                        break
+                encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+                return self._extracted(url, bytes(body[:self.max_bytes]), encoding, complete, response.headers)
+        except requests.Timeout:
+            self._count('timeouts')
+            return None
+        except Exception as e:
+            self._count('errors')
+            log_event('web_page_error', level='debug', url=url[:200], error=f"{type(e).__name__}: {e}")
+            return None
+
+    async def _fetch_async(self, url):
+        entry, fresh = self._cached(url)
+        if fresh:
+            return entry['text']
+        if self._async_client is None:
+            self._async_client = httpx_async_client(self._http_settings, follow_redirects=True,
+                                                    headers={'User-Agent': USER_AGENT})
+        try:
+            with span('web_page', url=url[:200]):
+                return await asyncio.wait_for(self._download_async(url, entry), self.page_timeout)
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            return None
+        except Exception as e:
+            self._count('errors')
+            log_event('web_page_error', level='debug', url=url[:200], error=f"{type(e).__name__}: {e}")
+            return None
+
+    async def _download_async(self, url, entry):
+        async with self._async_client.stream('GET', url, headers=self._conditional_headers(entry)) as response:
+            if response.status_code == 304 and entry is not None:
+                return self._revalidated(url, entry)
+            if not self._is_html(url, response.status_code, response.headers):
+                return None
+            body, complete = bytearray(), True
+            async for chunk in response.aiter_bytes(16 * 1024):
+                body += chunk
+                if len(body) >= self.max_bytes:
+                    complete = False
+                    break
+            encoding = response.charset_encoding
+            body = bytes(body[:self.max_bytes])
+        # Parsing takes milliseconds of CPU: off the event loop
+        return await asyncio.to_thread(self._extracted, url, body, encoding, complete, response.headers)
+
+    def _is_html(self, url, status, headers):
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if status == 200 and content_type in HTML_TYPES:
+            return True
+        self._count('skipped')
+        log_event('web_page_skipped', level='debug', url=url[:200], status=status, content_type=content_type)
+        return False
+
+    def _extracted(self, url, body, encoding, complete, headers):
+        """Extract body's text and cache it (unless the download was cut short by the page deadline)"""
+        self._count('fetched')
+        self._count('bytes', len(body))
+        text = extract_text(body, encoding, self.max_chars)
+        truncated = len(body) >= self.max_bytes
+        if truncated:
+            self._count('truncated')
+        # A page cut off by the byte cap always is, so its text can be cached; one cut off by time can't
+        if text and (complete or truncated):
+            self._store(url, text, headers.get('ETag'), headers.get('Last-Modified'))
+        return text or None
+
+    def _store(self, url, text, etag, last_modified):
+        self._cache.set(url, {'text': text, 'etag': etag, 'last_modified': last_modified,
+                              'fresh_until': time.monotonic() + self.ttl})
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
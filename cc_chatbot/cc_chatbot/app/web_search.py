@@ -0,0 +1,242 @@
+"""
+DuckDuckGo search layer for Cloudy AI
+Adds a per-query TTL cache (shorter for time-sensitive questions),
+single-flight coalescing of identical concurrent queries, reused DDGS
+clients and a hard deadline, so outbound search volume and tail latency
+stay bounded under load. search_async does the same with AsyncDDGS for the
+ASGI app.
+
+WEB_SEARCH_URL swaps DuckDuckGo for a SearxNG-compatible JSON endpoint
+(GET ?q=...&format=json), such as a self-hosted SearxNG or the stand-in in
+fake_providers.py, with the same cache, coalescing and deadline.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from event_log import log_event
+from http_clients import PoolSettings, httpx_async_client, requests_session
+from providers import installed
+from response_cache import ResponseCache, normalize_prompt
+
+# Imported with the first DuckDuckGo client, not at start-up
+DDGS_AVAILABLE = installed('duckduckgo_search')
+
+WEB_SEARCH_URL = os.getenv("WEB_SEARCH_URL")
+WEB_SEARCH_AVAILABLE = DDGS_AVAILABLE or bool(WEB_SEARCH_URL)
+
+# Queries containing these words go stale quickly
+TIME_SENSITIVE_KEYWORDS = {
+    'news', 'weather', 'stock', 'stocks', 'price', 'prices', 'score', 'scores',
+    'today', 'now', 'latest', 'current', 'live', 'breaking', 'happening'
+}
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers with the same key share its result"""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        """Return (result, shared) where shared is True if another caller did the work"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            return None, True
+
+        if call.error:
+            raise call.error
+        return call.result, not leader
+
+
+class WebSearcher:
+    """Cached, coalesced, deadline-bounded DuckDuckGo (or SearxNG-compatible) text search"""
+
+    def __init__(self, max_results=5, deadline=6.0, client_timeout=5, ttl=3600,
+                 time_sensitive_ttl=120, empty_ttl=60, workers=4, cache_mb=4, backend_url=None):
+        self.backend_url = backend_url  # SearxNG-style JSON search URL; None: DuckDuckGo
+        self.max_results = max_results
+        self.deadline = deadline
+        self.client_timeout = client_timeout
+        self.ttl = ttl
+        self.time_sensitive_ttl = time_sensitive_ttl
+        self.empty_ttl = empty_ttl
+
+        self._cache = ResponseCache(max_bytes=int(cache_mb * 1024 * 1024), max_entry_bytes=256 * 1024, ttl=ttl)
+        self._flight = SingleFlight()
+        # Upstream calls run on a small dedicated pool; each worker thread reuses
+        # its own DDGS client (the underlying HTTP session is not thread-safe)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='web-search')
+        self._local = threading.local()
+        self._async_client = None  # AsyncDDGS (or httpx client) of the event loop, created on first use
+        self._http_settings = PoolSettings(pool_size=workers, keepalive=workers, read_timeout=client_timeout)
+        self._session = requests_session(self._http_settings) if backend_url else None
+        self._async_flights = {}  # key -> in-flight asyncio task
+        self._stats_lock = threading.Lock()
+        self._stats = {'searches': 0, 'cache_hits': 0, 'coalesced': 0, 'upstream_calls': 0,
+                       'timeouts': 0, 'errors': 0}
+
+    def search(self, query, timeout=None):
+        """Return a list of result dicts (possibly empty), or None on timeout/error
+
+        timeout shortens the wait below the searcher's deadline (e.g. to what is left of a request's).
+        """
+        deadline = self.deadline if timeout is None else min(self.deadline, timeout)
+        key = ResponseCache.make_key(query, self._cache_tag)
+        self._count('searches')
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return cached
+
+        try:
+            results, shared = self._flight.do(key, lambda: self._fetch_with_deadline(query, key, deadline),
+                                              timeout=deadline)
+        except Exception as e:
+            self._count('errors')
+            log_event('web_search_error', level='warning', error=str(e))
+            return None
+        if shared:
+            self._count('coalesced')
+        return results
+
+    async def search_async(self, query, timeout=None):
+        """search() for the event loop: AsyncDDGS, with the same cache, coalescing and deadline"""
+        deadline = self.deadline if timeout is None else min(self.deadline, timeout)
+        key = ResponseCache.make_key(query, self._cache_tag)
+        self._count('searches')
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._count('cache_hits')
+            return cached
+
+        flight = self._async_flights.get(key)
+        if flight is None:
+            flight = self._async_flights[key] = asyncio.ensure_future(self._fetch_async(query, key))
+            flight.add_done_callback(lambda task: self._finish_flight(key, task))
+        else:
+            self._count('coalesced')
+        try:
+            # Shielded: the upstream call keeps running and still fills the cache after a timeout
+            return await asyncio.wait_for(asyncio.shield(flight), deadline)
+        except asyncio.TimeoutError:
+            self._count('timeouts')
+            log_event('web_search_timeout', level='warning', deadline=deadline, query=query[:200])
+            return None
+        except Exception as e:
+            self._count('errors')
+            log_event('web_search_error', level='warning', error=str(e))
+            return None
+
+    @property
+    def _cache_tag(self):
+        return 'searx' if self.backend_url else 'ddg'
+
+    def ttl_for(self, query):
+        words = set(normalize_prompt(query).split())
+        return self.time_sensitive_ttl if words & TIME_SENSITIVE_KEYWORDS else self.ttl
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['backend'] = 'searxng' if self.backend_url else 'duckduckgo'
+        stats['cache'] = self._cache.stats()
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._session is not None:
+            self._session.close()
+
+    async def aclose(self):
+        client, self._async_client = self._async_client, None
+        if client is None:
+            return
+        if self.backend_url:
+            await client.aclose()
+        else:
+            await client._session.close()  # AsyncDDGS.__aexit__ doesn't await the session's close()
+
+    def _fetch_with_deadline(self, query, key, deadline):
+        future = self._executor.submit(self._fetch, query, key)
+        try:
+            return future.result(timeout=deadline)
+        except FutureTimeout:
+            # The upstream call keeps running and still fills the cache when it finishes
+            self._count('timeouts')
+            log_event('web_search_timeout', level='warning', deadline=deadline, query=query[:200])
+            return None
+
+    def _fetch(self, query, key):
+        self._count('upstream_calls')
+        if self.backend_url:
+            response = self._session.get(self.backend_url, params={'q': query, 'format': 'json'},
+                                         timeout=self._http_settings.timeout())
+            response.raise_for_status()
+            results = self._from_searx(response.json())
+        else:
+            results = list(self._client().text(query, max_results=self.max_results))
+        self._cache.set(key, results, ttl=self.ttl_for(query) if results else self.empty_ttl)
+        return results
+
+    async def _fetch_async(self, query, key):
+        self._count('upstream_calls')
+        if self.backend_url:
+            if self._async_client is None:
+                self._async_client = httpx_async_client(self._http_settings)
+            response = await self._async_client.get(self.backend_url, params={'q': query, 'format': 'json'})
+            response.raise_for_status()
+            results = self._from_searx(response.json())
+        else:
+            if self._async_client is None:
+                from duckduckgo_search import AsyncDDGS
+                self._async_client = AsyncDDGS(timeout=self.client_timeout)
+            results = [result async for result in self._async_client.text(query, max_results=self.max_results)]
+        self._cache.set(key, results, ttl=self.ttl_for(query) if results else self.empty_ttl)
+        return results
+
+    def _from_searx(self, data):
+        """SearxNG results in DDGS's shape: title, href, body"""
+        return [{'title': result.get('title', ''), 'href': result.get('url', ''), 'body': result.get('content', '')}
+                for result in data.get('results', [])[:self.max_results]]
+
+    def _finish_flight(self, key, task):
+        self._async_flights.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # Retrieved here so an error nobody waited for isn't reported as unhandled
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            from duckduckgo_search import DDGS
+            client = self._local.client = DDGS(timeout=self.client_timeout)
+        return client
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
@@ -0,0 +1,178 @@
+"""
+Serving Mode Benchmark: threaded Flask vs ASGI
+Both servers answer /get from a stand-in Ollama (fake_ollama.py) that takes
+--latency seconds per reply, so the numbers show how many chats each mode
+can keep in flight, not model speed:
+- Flask behind a WSGI server with --flask-threads worker threads (like
+  `gunicorn --threads N`): at most N chats wait on Ollama at once
+- app/asgi.py under uvicorn: one event loop, chats wait on Ollama without a thread
+
+Each of --users virtual users gets its own session cookie (GET /) and sends
+--turns messages. Reports requests/s, p50/p99 latency and the peak number of
+concurrent requests Ollama saw.
+
+    python benchmark_asgi.py [--users 100] [--turns 2] [--latency 0.5] [--flask-threads 8]
+
+Without uvicorn installed the ASGI app is driven in-process through
+httpx.ASGITransport (no sockets), which is labelled in the output.
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_ollama import FakeOllamaServer
+
+ollama_server = FakeOllamaServer(tokens_per_second=math.inf).start()  # Replies take --latency, no pacing
+os.environ['OLLAMA_HOST'] = ollama_server.url  # Read by the ollama package on import
+os.environ.setdefault('OLLAMA_AUTO_START', 'false')
+os.environ.setdefault('LOG_PATH', os.devnull)
+os.environ.setdefault('WEB_SEARCH_DEADLINE', '0.01')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+import httpx
+from werkzeug.serving import BaseWSGIServer
+
+import asgi
+import chatbot
+
+try:
+    import uvicorn
+    UVICORN_AVAILABLE = True
+except ImportError:
+    UVICORN_AVAILABLE = False
+
+MESSAGES = [
+    "Can you explain how cloud computing saves money for a startup?",
+    "How should a small team think about backups in the cloud?",
+    "What should I learn first to become a cloud engineer?",
+]
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles connections on a fixed-size thread pool"""
+
+    def __init__(self, host, port, app, threads):
+        super().__init__(host, port, app)
+        self.request_queue_size = 1024
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi-worker')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run_load(make_client, users, turns):
+    """Returns (requests/s, latencies, errors)"""
+    latencies = []
+    errors = 0
+
+    async def user(index):
+        nonlocal errors
+        async with make_client() as client:
+            await client.get('/')  # Session cookie
+            for turn in range(turns):
+                started = time.perf_counter()
+                try:
+                    response = await client.post('/get', json={
+                        'message': MESSAGES[(index + turn) % len(MESSAGES)],
+                        'regenerate': True  # Skip intents and caches: every request goes to Ollama
+                    })
+                    response.raise_for_status()
+                    if response.json().get('provider') != 'Ollama':
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    return len(latencies) / (time.perf_counter() - started), latencies, errors
+
+
+def serve_flask(threads):
+    server = PooledWSGIServer('127.0.0.1', 0, chatbot.app, threads)
+    threading.Thread(target=server.serve_forever, name='flask-server', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def serve_uvicorn():
+    config = uvicorn.Config(asgi.app, host='127.0.0.1', port=0, log_level='warning', backlog=1024)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, name='uvicorn', daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+def report(name, throughput, latencies, errors, peak):
+    print(f"{name:<26} {throughput:>10.1f} {percentile(latencies, 0.5) * 1000:>9.0f} "
+          f"{percentile(latencies, 0.99) * 1000:>9.0f} {errors:>7} {peak:>13}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Threaded Flask vs ASGI against a slow stand-in Ollama")
+    parser.add_argument('--users', type=int, default=100, help="concurrent virtual users")
+    parser.add_argument('--turns', type=int, default=2, help="messages per user")
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds Ollama takes per reply")
+    parser.add_argument('--flask-threads', type=int, default=8)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    ollama_server.latency = args.latency
+    deadline = time.time() + 10
+    while not chatbot.check_ollama_service() and time.time() < deadline:
+        time.sleep(0.1)  # Supervisor's first probe
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    timeout = httpx.Timeout(300)
+
+    print(f"{args.users} users x {args.turns} messages, Ollama latency {args.latency}s\n")
+    print(f"{'server':<26} {'req/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7} {'peak at Ollama':>13}")
+
+    server, url = serve_flask(args.flask_threads)
+    ollama_server.max_in_flight = 0
+    results = asyncio.run(run_load(
+        lambda: httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout), args.users, args.turns))
+    report(f"Flask ({args.flask_threads} threads)", *results, ollama_server.stats()['max_in_flight'])
+    server.shutdown()
+
+    ollama_server.max_in_flight = 0
+    if UVICORN_AVAILABLE:
+        server, url = serve_uvicorn()
+        results = asyncio.run(run_load(
+            lambda: httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout), args.users, args.turns))
+        server.should_exit = True
+        name = "ASGI (uvicorn)"
+    else:
+        transport = httpx.ASGITransport(app=asgi.app)
+        results = asyncio.run(run_load(
+            lambda: httpx.AsyncClient(transport=transport, base_url='http://asgi', timeout=timeout),
+            args.users, args.turns))
+        name = "ASGI (in-process)"
+    report(name, *results, ollama_server.stats()['max_in_flight'])
+    if not UVICORN_AVAILABLE:
+        print("\nuvicorn is not installed (pip install uvicorn); the ASGI row skips HTTP parsing and sockets")
+    print(f"Median latency floor is the Ollama latency ({args.latency * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Outbound HTTP Client Benchmark: a fresh connection per call vs pooled keep-alive clients
+Sends the same small JSON POST (shaped like a Hugging Face inference call)
+to a local HTTPS server with a self-signed certificate, four ways:
+- requests.post: what the Hugging Face fallback did, a new TCP + TLS connection per call
+- pooled requests.Session (http_clients.requests_session), as hf_session now does
+- a new httpx.Client per call (like building an SDK client per request)
+- pooled httpx.Client (http_clients.httpx_client), as under Ollama and OpenAI
+
+--rtt adds a simulated network round trip: one per request, plus one for the
+TCP handshake and one for the TLS handshake of every new connection, as a
+cloud API would cost. Reports per-call latency and how many connections and
+TLS handshakes the server saw after one warm-up call.
+
+    python benchmark_http_clients.py [--requests 200] [--concurrency 4] [--rtt 20]
+
+Needs the openssl command to make the certificate; without it the server
+runs plain HTTP (TCP setup only), which is labelled in the output.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+import httpx
+import requests
+
+from http_clients import PoolSettings, httpx_client, requests_session
+
+REPLY = json.dumps([{'generated_text': "Cloud computing means renting servers over the internet."}]).encode('utf-8')
+PAYLOAD = {'inputs': "What is cloud computing?", 'parameters': {'max_length': 500, 'temperature': 0.7}}
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """Answers every POST with a canned reply, counting connections and TLS handshakes"""
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, rtt=0.0, ssl_context=None):
+        super().__init__(('127.0.0.1', 0), InferenceHandler)
+        self.rtt = rtt
+        self.ssl_context = ssl_context
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.handshakes = 0
+
+    @property
+    def url(self):
+        scheme = 'https' if self.ssl_context else 'http'
+        return f"{scheme}://localhost:{self.server_address[1]}/models/microsoft/DialoGPT-medium"
+
+    def finish_request(self, request, client_address):
+        # Runs on the connection's own thread, so handshakes don't serialize in accept()
+        with self.lock:
+            self.connections += 1
+        time.sleep(self.rtt)  # TCP handshake
+        if self.ssl_context:
+            time.sleep(self.rtt)  # TLS 1.3 handshake
+            try:
+                request = self.ssl_context.wrap_socket(request, server_side=True)
+            except (ssl.SSLError, OSError):
+                return
+            with self.lock:
+                self.handshakes += 1
+        super().finish_request(request, client_address)
+
+    def reset(self):
+        with self.lock:
+            self.connections = self.handshakes = 0
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        time.sleep(self.server.rtt)  # Request and response
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+
+def make_certificate(directory):
+    """Self-signed localhost certificate; returns its path, or None without openssl"""
+    if not shutil.which('openssl'):
+        return None
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                    '-keyout', key, '-out', cert], check=True, capture_output=True)
+    return cert, key
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(call, count, concurrency):
+    """Time count calls on concurrency threads; returns latencies in seconds"""
+    def timed(_):
+        started = time.perf_counter()
+        response = call()
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, range(count)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fresh connections vs pooled keep-alive clients")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rtt', type=float, default=20, help="simulated network round trip (ms)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = make_certificate(directory)
+        ssl_context = None
+        verify = True
+        if files:
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ssl_context.load_cert_chain(*files)
+            verify = files[0]
+
+        server = InferenceServer(rtt=args.rtt / 1000, ssl_context=ssl_context)
+        threading.Thread(target=server.serve_forever, name='inference-server', daemon=True).start()
+        url = server.url
+
+        settings = PoolSettings(pool_size=args.concurrency, keepalive=args.concurrency)
+        session = requests_session(settings)
+        pooled_httpx = httpx_client(settings, verify=verify)
+
+        def fresh_httpx():
+            with httpx.Client(verify=verify, timeout=settings.httpx_timeout()) as client:
+                return client.post(url, json=PAYLOAD)
+
+        clients = [
+            ("requests.post (fresh)", lambda: requests.post(url, json=PAYLOAD, verify=verify,
+                                                            timeout=settings.timeout())),
+            ("requests.Session (pooled)", lambda: session.post(url, json=PAYLOAD, verify=verify,
+                                                                timeout=settings.timeout())),
+            ("httpx.Client per call", fresh_httpx),
+            ("httpx.Client (pooled)", lambda: pooled_httpx.post(url, json=PAYLOAD)),
+        ]
+
+        transport = "TLS" if ssl_context else "plain HTTP (no openssl)"
+        print(f"{args.requests} POSTs over {transport}, concurrency {args.concurrency}, "
+              f"simulated RTT {args.rtt:.0f} ms\n")
+        print(f"{'client':<28} {'mean (ms)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+              f"{'connections':>12} {'handshakes':>11}")
+        for name, call in clients:
+            call()  # Warm-up: pooled clients open their first connection here
+            server.reset()
+            latencies = run(call, args.requests, args.concurrency)
+            print(f"{name:<28} {statistics.mean(latencies) * 1000:>10.1f} "
+                  f"{percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.99) * 1000:>9.1f} "
+                  f"{server.connections:>12} {server.handshakes:>11}")
+
+        session.close()
+        pooled_httpx.close()
+        server.shutdown()
+    print(f"\nOne round trip ({args.rtt:.0f} ms) is the floor; every new connection adds the "
+          f"TCP{' and TLS' if ssl_context else ''} handshake on top")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Intent Classifier Benchmark
+Generates synthetic intent files of growing size and measures:
+- start-up with an empty matrix cache (every pattern is embedded)
+- start-up with a warm on-disk matrix cache
+- classification latency for one message and for a batch
+and checks accuracy of the bundled app/intent_data.json on a few messages.
+"""
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from intent_classifier import IntentClassifier
+
+WORDS = """cloud server storage network python data model deploy billing account password invoice
+refund order shipping weather forecast recipe workout travel flight hotel booking music playlist
+movie ticket bank card loan budget resume interview course exam library printer laptop phone""".split()
+TEMPLATES = ["how do i {a} my {b}", "help with {a} {b}", "{a} {b} not working", "what is {a} {b}",
+             "reset {a} for {b}", "cancel my {a} {b}", "where can i find {a} {b}", "{a} {b} status",
+             "update {a} {b}", "explain {a} and {b}"]
+
+BUNDLED_CHECKS = [
+    ("hello", "greeting"),
+    ("Hi!", "greeting"),
+    ("what is cloud computing?", "cloud"),
+    ("Explain cloud computing", "cloud"),
+    ("goodbye", "bye"),
+    ("How does photosynthesis work?", None),
+    ("What is my name?", None),
+]
+
+
+def synthetic_intents(count, rng):
+    intents = []
+    for i in range(count):
+        a, b = rng.sample(WORDS, 2)
+        patterns = [template.format(a=a, b=b) + f" {i}" for template in TEMPLATES]
+        intents.append({'tag': f"intent_{i}", 'patterns': patterns, 'responses': [f"Answer {i}"]})
+    return {'intents': intents}
+
+
+def timed(fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    rng = random.Random(7)
+    workdir = tempfile.mkdtemp(prefix='intent-bench-')
+    try:
+        print(f"{'intents':>8} {'patterns':>9} {'cold start (s)':>15} {'cached start (s)':>17} "
+              f"{'classify 1 (ms)':>16} {'batch 100 (ms)':>15} {'matrix MB':>10}")
+        for count in (100, 1000, 5000):
+            path = os.path.join(workdir, f"intents_{count}.json")
+            cache_path = os.path.join(workdir, f"intents_{count}.npz")
+            with open(path, 'w') as f:
+                json.dump(synthetic_intents(count, rng), f)
+
+            cold, classifier = timed(lambda: IntentClassifier([path], cache_path=cache_path))
+            warm, classifier = timed(lambda: IntentClassifier([path], cache_path=cache_path))
+            assert classifier.stats()['matrix_from_cache']
+
+            queries = [f"how do i {rng.choice(WORDS)} my {rng.choice(WORDS)}" for _ in range(100)]
+            single, _ = timed(lambda: classifier.classify(queries[0]), repeat=50)
+            batch, _ = timed(lambda: classifier.classify_many(queries), repeat=5)
+            print(f"{count:>8} {count * len(TEMPLATES):>9} {cold:>15.3f} {warm:>17.3f} "
+                  f"{single * 1000:>16.2f} {batch * 1000:>15.2f} {classifier.stats()['matrix_mb']:>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    bundled = IntentClassifier([os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'intent_data.json')])
+    print(f"\nBundled intent_data.json (threshold {bundled.threshold}):")
+    correct = 0
+    for message, expected in BUNDLED_CHECKS:
+        match = bundled.classify(message)
+        answered = match.tag if bundled.is_confident(match) else None
+        correct += answered == expected
+        print(f"  {message!r:40} -> {answered or '(LLM)':10} confidence={match.confidence:.2f} "
+              f"margin={match.margin:.2f} {'ok' if answered == expected else 'MISMATCH'}")
+    print(f"{correct}/{len(BUNDLED_CHECKS)} routed as expected")
+    return correct == len(BUNDLED_CHECKS)
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,115 @@
+"""
+Metrics Overhead Benchmark: per-thread shards vs one lock per metric
+Each of --threads threads records --ops observations per metric type (counter
+inc, histogram observe) into:
+- metrics.py's Counter/Histogram: each thread writes its own shard, no lock
+- the same metrics behind a single shared lock, the straightforward design
+
+Reports nanoseconds per recording and how long a /metrics scrape takes
+while the writers run.
+
+    python benchmark_metrics.py [--threads 8] [--ops 200000]
+"""
+
+import argparse
+import bisect
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from metrics import LATENCY_BUCKETS, MetricsRegistry
+
+
+class LockedCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+
+class LockedHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.lock = threading.Lock()
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            counts = self.values.get(label_values)
+            if counts is None:
+                counts = self.values[label_values] = [0] * (len(self.buckets) + 2)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+
+def run(record, threads, ops):
+    """ns per call of record() from threads threads at once"""
+    start = threading.Barrier(threads + 1)
+
+    def worker():
+        start.wait()
+        for i in range(ops):
+            record(i)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    start.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return (time.perf_counter() - started) / (threads * ops) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recording cost of sharded vs locked metrics")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=200000, help="recordings per thread")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter('attempts_total', "Attempts", ('provider', 'result'))
+    histogram = registry.histogram('duration_seconds', "Latency", ('provider',))
+    locked_counter, locked_histogram = LockedCounter(), LockedHistogram()
+
+    cases = [
+        ("counter, per-thread shards", lambda i: counter.inc('Ollama', 'success')),
+        ("counter, shared lock", lambda i: locked_counter.inc('Ollama', 'success')),
+        ("histogram, per-thread shards", lambda i: histogram.observe((i % 1000) / 100, 'Ollama')),
+        ("histogram, shared lock", lambda i: locked_histogram.observe((i % 1000) / 100, 'Ollama')),
+    ]
+    print(f"{args.threads} threads x {args.ops} recordings\n")
+    print(f"{'metric':<30} {'ns/op':>8}")
+    for name, record in cases:
+        print(f"{name:<30} {run(record, args.threads, args.ops):>8.0f}")
+
+    total = sum(counter.values().values())
+    assert total == args.threads * args.ops, total  # No increment lost without the lock
+
+    scrapes = []
+    stop = threading.Event()
+
+    def scraper():
+        while not stop.is_set():
+            started = time.perf_counter()
+            registry.render()
+            scrapes.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    thread = threading.Thread(target=scraper)
+    thread.start()
+    run(lambda i: histogram.observe((i % 1000) / 100, 'Ollama'), args.threads, args.ops // 4)
+    stop.set()
+    thread.join()
+    print(f"\n/metrics render during recording: {sum(scrapes) / len(scrapes) * 1e6:.0f} us mean "
+          f"over {len(scrapes)} scrapes; counter total {total} (none lost)")
+
+
+if __name__ == '__main__':
+    main()
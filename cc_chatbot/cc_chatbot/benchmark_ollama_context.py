@@ -0,0 +1,97 @@
+"""
+Ollama Context Reuse Benchmark
+Plays the same multi-turn conversation twice through the app's streaming
+Ollama path against a running Ollama server (OLLAMA_HOST):
+- without reuse: every turn re-sends the system prompt and the history
+- with reuse: follow-up turns continue from the `context` Ollama returned
+and reports time to first token per turn plus Ollama's prefill stats.
+
+    python benchmark_ollama_context.py [--turns 8] [--max-tokens 64]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('OLLAMA_AUTO_START', 'false')
+os.environ.setdefault('LOG_PATH', os.devnull)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+import chatbot
+from ollama_context import OllamaContextCache
+
+TURNS = [
+    "What is cloud computing and why do companies use it?",
+    "How does that compare to running my own servers?",
+    "Which of those costs would go away first?",
+    "What about security, who is responsible for what?",
+    "Can you give an example with a small web shop?",
+    "How would it scale during a holiday sale?",
+    "What would you monitor to catch problems early?",
+    "Summarize your advice in three bullet points.",
+]
+
+
+def play(turns, reuse):
+    """Run the conversation; returns the time to first token of each turn and the cache stats"""
+    chatbot.ollama_contexts = OllamaContextCache(
+        num_ctx=chatbot.OLLAMA_OPTIONS['num_ctx'],
+        reserve=chatbot.OLLAMA_OPTIONS['num_predict']
+    ) if reuse else None
+    session_id = f"benchmark-{'reuse' if reuse else 'fresh'}-{time.time()}"
+    rows = []
+    for user_input in turns:
+        chatbot.add_to_history(session_id, 'user', user_input)
+        context = chatbot.get_conversation_context(session_id, user_input)
+        started = time.perf_counter()
+        first_token = None
+        parts = []
+        for chunk in chatbot._ollama_chunks(user_input, context):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            parts.append(chunk)
+        chatbot.add_to_history(session_id, 'assistant', f"{chatbot.CLOUDY_PREFIX} {''.join(parts).strip()}",
+                               provider='Ollama')
+        rows.append(first_token)
+    stats = chatbot.ollama_contexts.stats() if reuse else None
+    chatbot.chat_sessions.delete(session_id)
+    return rows, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time to first token with and without Ollama context reuse")
+    parser.add_argument('--turns', type=int, default=len(TURNS))
+    parser.add_argument('--max-tokens', type=int, default=64, help="num_predict per reply (keeps the run short)")
+    args = parser.parse_args()
+
+    if not chatbot.OLLAMA_AVAILABLE:
+        print("The ollama package is not installed")
+        return 1
+    try:
+        chatbot.ollama.generate(model=chatbot.OLLAMA_MODEL, prompt='', keep_alive=chatbot.OLLAMA_KEEP_ALIVE)
+    except Exception as e:
+        print(f"Ollama is not reachable ({e}); start it or set OLLAMA_HOST")
+        return 1
+
+    chatbot.OLLAMA_OPTIONS['num_predict'] = args.max_tokens
+    turns = (TURNS * (args.turns // len(TURNS) + 1))[:args.turns]
+    fresh, _ = play(turns, reuse=False)
+    reused, stats = play(turns, reuse=True)
+
+    print(f"Model {chatbot.OLLAMA_MODEL}, num_ctx {chatbot.OLLAMA_OPTIONS['num_ctx']}, {args.max_tokens} tokens per reply")
+    print(f"{'turn':>4} {'no reuse TTFT (ms)':>19} {'reuse TTFT (ms)':>16}")
+    for index, (a, b) in enumerate(zip(fresh, reused), 1):
+        print(f"{index:>4} {a * 1000:>19.0f} {b * 1000:>16.0f}")
+    follow_ups = slice(1, None)  # Turn 1 has nothing to reuse
+    print(f"\nMedian TTFT of follow-up turns: {statistics.median(fresh[follow_ups]) * 1000:.0f} ms without reuse, "
+          f"{statistics.median(reused[follow_ups]) * 1000:.0f} ms with reuse")
+    print(f"Context cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evicted_full']} evicted near num_ctx; "
+          f"avg prefill {stats['reused']['avg_prefill_ms']} ms over {stats['reused']['avg_prompt_tokens']} tokens "
+          f"(reused) vs {stats['fresh']['avg_prefill_ms']} ms over {stats['fresh']['avg_prompt_tokens']} tokens (fresh)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
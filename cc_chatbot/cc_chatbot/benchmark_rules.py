@@ -0,0 +1,241 @@
+"""
+Keyword Rule Matcher Check & Benchmark
+1. Routing check: every rule in app/rules.py is probed with its own
+   keywords, plus the TEST_CASES messages, and the route is compared with
+   the original substring-based if/elif chains (copied below). The only
+   allowed differences are the substring bugs the word matcher fixes.
+2. Microbenchmark: time per message for the original chains vs the
+   compiled matcher.
+
+Exits non-zero if any rule routes differently than expected.
+"""
+
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from rules import RULES, keyword_rules
+from test_chatbot import TEST_CASES
+
+
+# 🔹 Original routing (conditions of should_use_web_search,
+# get_intelligent_fallback and get_simple_response before the rule table)
+
+def legacy_web_search(user_input):
+    user_input_lower = user_input.lower()
+    current_info_keywords = [
+        'today', 'now', 'current', 'latest', 'recent', 'this year', '2024', '2025',
+        'news', 'weather', 'stock', 'price', 'score', 'update', 'happening',
+        'who is', 'what is the current', 'what happened', 'when did', 'where is',
+        'search', 'find', 'look up', 'tell me about', 'information about',
+        'what are', 'how to', 'best', 'top', 'list of', 'compare'
+    ]
+    question_patterns = ['what is', 'who is', 'where is', 'when is', 'how to', 'why is']
+    should_search = any(keyword in user_input_lower for keyword in current_info_keywords)
+    if any(pattern in user_input_lower for pattern in question_patterns):
+        if not any(word in user_input_lower for word in ['function', 'code', 'program', 'algorithm', 'theorem', 'formula']):
+            should_search = True
+    return should_search
+
+
+def legacy_topic(user_input):
+    s = user_input.lower().strip()
+    if 'cloud computing' in s or ('cloud' in s and 'computing' in s) or ('cloud' in s and any(word in s for word in ['service', 'provider', 'aws', 'azure', 'gcp', 'infrastructure', 'server', 'storage', 'database'])):
+        if 'what is cloud computing' in s and ('characteristic' in s or 'main characteristics' in s):
+            return 'cloud_definition'
+        if 'types of cloud service' in s and ('iaas' in s or 'paas' in s or 'saas' in s):
+            return 'cloud_service_models'
+        if 'virtualization' in s:
+            return 'virtualization'
+        if 'elasticity' in s and 'scalability' in s:
+            return 'elasticity_vs_scalability'
+        return 'cloud_computing'
+    if any(word in s for word in ['python', 'programming', 'code', 'function']):
+        if 'sort' in s or 'reverse' in s:
+            return 'python_snippets'
+        elif 'benefit' in s:
+            return 'python_benefits'
+        return 'python'
+    if any(word in s for word in ['artificial intelligence', 'machine learning', 'ai', 'neural']):
+        return 'ai'
+    if 'quantum' in s:
+        return 'quantum'
+    if 'photosynthesis' in s:
+        return 'photosynthesis'
+    if 'pythagorean' in s or 'pythagoras' in s:
+        return 'pythagorean'
+    if 'calculus' in s:
+        return 'calculus'
+    if 'capital' in s and 'france' in s:
+        return 'capital_of_france'
+    if 'telephone' in s and ('invent' in s or 'who' in s):
+        return 'telephone'
+    if 'digital marketing' in s or ('digital' in s and 'marketing' in s):
+        return 'digital_marketing'
+    if 'supply chain' in s:
+        return 'supply_chain'
+    if 'exercise' in s and 'benefit' in s:
+        return 'exercise_benefits'
+    if 'study' in s and ('habit' in s or 'improve' in s):
+        return 'study_habits'
+    if 'object' in s and 'oriented' in s:
+        return 'oop'
+    return None
+
+
+def legacy_simple(user_input):
+    s = user_input.lower().strip()
+    if any(word in s for word in ['hello', 'hi', 'hey', 'greetings']):
+        return 'greeting'
+    elif any(phrase in s for phrase in ['what is my name', 'my name is', 'call me', 'i am', 'my self', 'myself']):
+        if any(phrase in s for phrase in ['what is my name', 'what\'s my name']):
+            return 'ask_name'
+        return 'set_name'
+    elif any(phrase in s for phrase in ['tell me about yourself', 'who are you', 'what are you']):
+        return 'about_me'
+    elif any(word in s for word in ['cloud', 'aws', 'azure', 'gcp', 'google cloud']):
+        return 'cloud'
+    elif any(word in s for word in ['weather', 'rain', 'sunny', 'storm']):
+        return 'weather'
+    elif any(phrase in s for phrase in ['how are you', 'how do you do', 'whats up', 'what\'s up']):
+        return 'how_are_you'
+    elif any(phrase in s for phrase in ['what can you do', 'help me', 'can you help']):
+        return 'capabilities'
+    elif any(word in s for word in ['time', 'date', 'today', 'now']):
+        return 'time'
+    elif any(word in s for word in ['thank', 'thanks', 'appreciate']):
+        return 'thanks'
+    elif any(word in s for word in ['bye', 'goodbye', 'see you', 'farewell']):
+        return 'goodbye'
+    return None
+
+
+def route(message, web_search, topic, simple):
+    return (web_search(message), topic(message), simple(message))
+
+
+def legacy_route(message):
+    return route(message, legacy_web_search, legacy_topic, legacy_simple)
+
+
+def compiled_route(message):
+    found = keyword_rules.scan(message)
+    return (
+        keyword_rules.first_match(found, 'web_search') is not None,
+        keyword_rules.first_match(found, 'topic'),
+        keyword_rules.first_match(found, 'simple')
+    )
+
+
+# Messages where the routes are expected to differ, and why
+EXPECTED_DIFFERENCES = {
+    "Can you explain this?": "'ai' inside \"explain\", 'hi' inside \"this\"",
+    "Explain calculus basics": "'ai' inside \"explain\" hid the calculus answer",
+    "Explain the concept of supply chain management": "'ai' inside \"explain\" hid the supply chain answer",
+    "supply chain": "'ai' inside \"chain\" hid the supply chain answer",
+    "supply chains": "'ai' inside \"chains\" hid the supply chain answer",
+    "Something about mountains": "'hi' inside \"something\", 'ai' inside \"mountains\"",
+    "machine learning": "'hi' inside \"machine\"",
+    "this year": "'hi' inside \"this\"",
+    "Which laptop should I buy?": "'hi' inside \"which\", 'top' inside \"laptop\"",
+    "Please stop": "'top' inside \"stop\"",
+    "I want to know more": "'now' inside \"know\"",
+    "I like the train station": "'ai' and 'rain' inside \"train\"",
+    "rain": "'ai' inside \"rain\"",
+    "rains": "'ai' inside \"rains\"",
+    "update": "'date' inside \"update\"",
+    "updates": "'date' inside \"updates\"",
+    "sometimes I forget": "'time' inside \"sometimes\"",
+    "what's my name": "was unreachable: only 'what is my name' opened the name branch",
+    "What's my name?": "was unreachable: only 'what is my name' opened the name branch",
+}
+
+
+def probe_messages():
+    """One message per phrase of every rule, combined with the other groups' first phrases"""
+    messages = set()
+    for rule in RULES:
+        for index, group in enumerate(rule.all_of):
+            others = [g[0] for i, g in enumerate(rule.all_of) if i != index]
+            for phrase in group:
+                words = [phrase] + others
+                # Stems are probed bare and inflected ('benefit*' -> benefit, benefits)
+                for suffix in ('', 's'):
+                    text = ' '.join(w[:-1] + suffix if w.endswith('*') else w for w in words)
+                    messages.add(text)
+        for phrase in rule.none_of:
+            messages.add(' '.join(g[0].rstrip('*') for g in rule.all_of) + ' ' + phrase.rstrip('*'))
+    return sorted(messages)
+
+
+def check_routing():
+    messages = list(dict.fromkeys(
+        probe_messages() + [case['message'] for case in TEST_CASES] + list(EXPECTED_DIFFERENCES)))
+    unexpected = []
+    expected = []
+    for message in messages:
+        old, new = legacy_route(message), compiled_route(message)
+        if old == new:
+            continue
+        if message in EXPECTED_DIFFERENCES:
+            expected.append((message, old, new))
+        else:
+            unexpected.append((message, old, new))
+
+    print(f"Routing check: {len(messages)} messages, {len(RULES)} rules")
+    for label, rows in (("Expected differences (substring bugs fixed)", expected),
+                        ("UNEXPECTED differences", unexpected)):
+        if rows:
+            print(f"\n{label}:")
+            for message, old, new in rows:
+                reason = EXPECTED_DIFFERENCES.get(message, '')
+                print(f"  {message!r}  {reason}\n    before: {old}\n    after:  {new}")
+    print("\n(route = web search?, topic rule, small-talk rule)")
+    return not unexpected
+
+
+# A long message with few rule words: the original chains scan it once per keyword
+LONG_PROSE = (
+    "The committee met on a grey morning to review the quarterly figures. Several members raised "
+    "concerns about shipping delays and the rising cost of materials, while others argued that the "
+    "new warehouse layout had already paid for itself. After a long discussion they agreed to "
+    "revisit the plan in spring. "
+) * 4
+
+
+def benchmark(iterations=2000, runs=5):
+    messages = [case['message'] for case in TEST_CASES]
+    # A long message made of rule words: the original chains stop at the first hit,
+    # the matcher still has to split every word
+    dense = ' '.join(itertools.islice(itertools.cycle(messages), 40))
+
+    print(f"\nMicrobenchmark (best of {runs} runs of {iterations} iterations, "
+          f"all three routing decisions per message)")
+    print(f"{'messages':<34} {'original (us)':>14} {'compiled (us)':>14} {'speedup':>8}")
+    batches = (
+        ("TEST_CASES (short questions)", messages),
+        (f"{len(LONG_PROSE)}-char prose, few rule words", [LONG_PROSE]),
+        (f"{len(dense)}-char, dense rule words", [dense]),
+    )
+    for label, batch in batches:
+        timings = []
+        for route_fn in (legacy_route, compiled_route):
+            route_fn(batch[0])  # Warm the matcher's word memo
+            best = float('inf')
+            for _ in range(runs):
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    for message in batch:
+                        route_fn(message)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best / (iterations * len(batch)) * 1e6)
+        print(f"{label:<34} {timings[0]:>14.1f} {timings[1]:>14.1f} {timings[0] / timings[1]:>7.1f}x")
+
+
+if __name__ == '__main__':
+    ok = check_routing()
+    benchmark()
+    sys.exit(0 if ok else 1)
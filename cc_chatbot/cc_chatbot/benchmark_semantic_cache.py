@@ -0,0 +1,162 @@
+"""
+Semantic Cache Report
+Measures hit rate and false-hit rate of the semantic response cache
+against the TEST_CASES in test_chatbot.py.
+
+- Hit rate: a paraphrase of a cached question returns that question's reply
+- False-hit rate: a question returns the reply cached for a *different* question
+- Near misses: pairs on the same topic that ask different things ("How do I
+  install Python?" / "How do I uninstall Python?"); the second must never get
+  the reply cached for the first. The report exits with status 1 if one does.
+
+For comparison it also runs the same checks against the nearest cached
+prompt by cosine similarity of n-gram embeddings, for a range of
+thresholds: the trade-off between hits and wrong answers that keying the
+cache on question terms avoids.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from semantic_cache import SemanticCache
+from test_chatbot import TEST_CASES
+from text_embedding import NUMPY_AVAILABLE, embed_many
+
+# One paraphrase per test case, in TEST_CASES order
+PARAPHRASES = [
+    "explain cloud computing to me",
+    "Can you explain AI simply?",
+    "Why should I use Python?",
+    "Explain how photosynthesis works",
+    "Tell me about quantum computing",
+    "Explain the Pythagorean theorem",
+    "What are the basics of calculus?",
+    "Explain digital marketing",
+    "What is supply chain management?",
+    "Which city is the capital of France?",
+    "Who was the inventor of the telephone?",
+    "Python function that reverses a string",
+    "Explain object oriented programming",
+    "Hi, how are you doing?",
+    "Call me Alex, that's my name",
+    "Do you remember my name?",
+    "Why is exercise good for you?",
+    "Tips to improve study habits",
+]
+
+# Same topic, different question: (cached, asked)
+NEAR_MISSES = [
+    ("How do I learn Python?", "Why should I learn Python?"),
+    ("What is Paris?", "Where is Paris?"),
+    ("Who invented the telephone?", "When was the telephone invented?"),
+    ("How do I install Python?", "How do I uninstall Python?"),
+    ("Explain AWS Lambda", "Explain AWS Lambda pricing"),
+    ("What is Java?", "What is JavaScript?"),
+    ("How do I install Python on Windows?", "How do I install Python on Mac?"),
+    ("What is the capital of France?", "What is the capital of Spain?"),
+    ("What is machine learning?", "What is deep learning?"),
+    ("Why is exercise good for you?", "When should I exercise?"),
+    ("How do I learn Python?", "How do I learn Python fast?"),
+    ("What are the benefits of cloud computing?", "What are the risks of cloud computing?"),
+]
+
+THRESHOLDS = [0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9]
+SIGNATURE = 'benchmark'
+
+
+class CosineCache:
+    """Nearest cached prompt by cosine similarity above a threshold (the comparison baseline)"""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.prompts = []
+        self.replies = []
+
+    def add(self, prompt, signature, provider, reply):
+        self.prompts.append(prompt)
+        self.replies.append((provider, reply))
+
+    def lookup(self, prompt, signature):
+        if not self.prompts:
+            return None
+        scores = embed_many(self.prompts) @ embed_many([prompt])[0]
+        best = int(scores.argmax())
+        return self.replies[best] if scores[best] >= self.threshold else None
+
+
+def build_cache(make_cache, skip=None):
+    cache = make_cache()
+    for i, test in enumerate(TEST_CASES):
+        if i != skip:
+            cache.add(test['message'], SIGNATURE, 'benchmark', i)
+    return cache
+
+
+def evaluate(make_cache):
+    cache = build_cache(make_cache)
+    results = [cache.lookup(paraphrase, SIGNATURE) for paraphrase in PARAPHRASES]
+    hits = sum(1 for i, r in enumerate(results) if r and r[1] == i)
+    false_hits = sum(1 for i, r in enumerate(results) if r and r[1] != i)
+
+    # Leave-one-out: an unseen test question must not hit another question's reply
+    unseen_false_hits = 0
+    for i, test in enumerate(TEST_CASES):
+        if build_cache(make_cache, skip=i).lookup(test['message'], SIGNATURE):
+            unseen_false_hits += 1
+
+    return {
+        'hit_rate': hits / len(PARAPHRASES),
+        'paraphrase_false_hits': false_hits / len(PARAPHRASES),
+        'unseen_false_hits': unseen_false_hits / len(TEST_CASES),
+        'near_miss_hits': near_miss_hits(make_cache),
+    }
+
+
+def near_miss_hits(make_cache):
+    """The NEAR_MISSES pairs whose second question got the first one's reply"""
+    hits = []
+    for cached, asked in NEAR_MISSES:
+        cache = make_cache()
+        cache.add(cached, SIGNATURE, 'benchmark', cached)
+        if cache.lookup(asked, SIGNATURE):
+            hits.append((cached, asked))
+    return hits
+
+
+def measure_lookup_latency(entries=2000, lookups=500):
+    cache = SemanticCache(max_entries=entries)
+    for i in range(entries):
+        cache.add(f"{TEST_CASES[i % len(TEST_CASES)]['message']} variant {i}", SIGNATURE, 'benchmark', i)
+    start = time.perf_counter()
+    for i in range(lookups):
+        cache.lookup(PARAPHRASES[i % len(PARAPHRASES)], SIGNATURE)
+    return (time.perf_counter() - start) / lookups * 1000
+
+
+def print_row(label, r):
+    print(f"{label:>16} {r['hit_rate']:>10.0%} {r['paraphrase_false_hits']:>12.0%} "
+          f"{r['unseen_false_hits']:>19.0%} {len(r['near_miss_hits']):>12}")
+
+
+if __name__ == '__main__':
+    assert len(PARAPHRASES) == len(TEST_CASES)
+    print("=" * 74)
+    print("SEMANTIC CACHE REPORT")
+    print(f"{len(TEST_CASES)} test cases, {len(PARAPHRASES)} paraphrases, {len(NEAR_MISSES)} near misses")
+    print("=" * 74)
+    print(f"{'cache':>16} {'hit rate':>10} {'false hits':>12} {'unseen false hits':>19} {'near misses':>12}")
+    result = evaluate(lambda: SemanticCache(max_entries=len(TEST_CASES)))
+    print_row('question terms', result)
+    if NUMPY_AVAILABLE:
+        for threshold in THRESHOLDS:
+            print_row(f"cosine >= {threshold:.2f}", evaluate(lambda: CosineCache(threshold)))
+    print("-" * 74)
+    print(f"Lookup latency with 2000 entries: {measure_lookup_latency():.3f} ms")
+    if result['near_miss_hits']:
+        print("\nFAILED: near misses answered from the cache:")
+        for cached, asked in result['near_miss_hits']:
+            print(f"  {asked!r} got the reply to {cached!r}")
+        sys.exit(1)
@@ -0,0 +1,116 @@
+"""
+Session Backend Benchmark
+For the memory, SQLite and Redis session backends, measures:
+- append throughput and p50/p99 append latency with 1 and 8 writer threads
+- latency of reading the 20 most recent messages from a short and a long
+  conversation (should not grow with the conversation length)
+
+Redis runs against REDIS_URL if set, otherwise against the stand-in server
+in fake_redis.py (a pure-Python server, so its numbers are a lower bound).
+"""
+
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+import event_log
+
+event_log.configure(path=os.devnull)
+
+from fake_redis import FakeRedisServer
+from session_store import create_session_store
+
+MESSAGE = "Cloudy ☁️: " + "Cloud computing delivers servers, storage and software over the internet. " * 4
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def write_load(store, threads, per_thread):
+    """Each thread appends to its own sessions; returns (appends/s, latencies in seconds)"""
+    latencies = [[] for _ in range(threads)]
+
+    def writer(index):
+        samples = latencies[index]
+        for i in range(per_thread):
+            session_id = f"bench-{threads}-{index}-{i % 50}"
+            start = time.perf_counter()
+            store.append(session_id, 'user' if i % 2 else 'assistant', MESSAGE)
+            samples.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if hasattr(store, 'flush'):
+        store.flush()  # Count the time to make queued writes durable
+    elapsed = time.perf_counter() - start
+    samples = [sample for thread_samples in latencies for sample in thread_samples]
+    return len(samples) / elapsed, samples
+
+
+def read_latency(store, session_id, repeat=300):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        store.history(session_id, limit=20)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='session-bench-')
+    fake = None
+    redis_url = os.getenv('REDIS_URL')
+    if not redis_url:
+        fake = FakeRedisServer().start()
+        redis_url = fake.url
+    backends = (
+        ('memory', 'memory://'),
+        ('sqlite', f"sqlite:///{os.path.join(workdir, 'sessions.db')}"),
+        ('redis' if fake is None else 'redis (stand-in)', redis_url),
+    )
+    try:
+        print(f"{'backend':<17} {'threads':>7} {'appends/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        reads = []
+        for name, url in backends:
+            store = create_session_store(url, max_sessions=100000, max_messages=10000, idle_ttl=3600)
+            store.start_sweeper()
+            for threads, per_thread in ((1, 2000), (8, 500)):
+                throughput, samples = write_load(store, threads, per_thread)
+                print(f"{name:<17} {threads:>7} {throughput:>10.0f} "
+                      f"{percentile(samples, 0.5) * 1000:>9.3f} {percentile(samples, 0.99) * 1000:>9.3f}")
+
+            for length in (40, 5000):
+                session_id = f"read-{length}"
+                for i in range(length):
+                    store.append(session_id, 'user', MESSAGE)
+            if hasattr(store, 'flush'):
+                store.flush()
+            reads.append((name, read_latency(store, 'read-40'), read_latency(store, 'read-5000')))
+            store.delete('read-40')
+            store.delete('read-5000')
+            store.close()
+
+        print(f"\nRecent-history read (newest 20 messages), median:")
+        print(f"{'backend':<17} {'40-msg session (ms)':>20} {'5000-msg session (ms)':>22}")
+        for name, short, long in reads:
+            print(f"{name:<17} {short * 1000:>20.3f} {long * 1000:>22.3f}")
+    finally:
+        if fake:
+            fake.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
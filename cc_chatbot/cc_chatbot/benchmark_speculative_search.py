@@ -0,0 +1,105 @@
+"""
+Speculative Web Search Benchmark: search first vs search alongside the LLM
+Sends questions that want current information ("what is the latest news
+about ...") to /get in both WEB_SEARCH_MODEs, against the stand-in providers
+and search server of fake_providers.py:
+- sequential: the web search runs first; the AI providers are asked only
+  if it finds nothing (after the search failed or ran out of time)
+- speculative: the search starts in the background and the providers go
+  ahead, grounding their prompt in the results if they are in within
+  WEB_GROUNDING_WAIT seconds
+
+in three search scenarios: fast (--fast-search), slow (--slow-search) and
+down (every search hangs until WEB_SEARCH_DEADLINE). Every question is new,
+so nothing is answered from a cache. Reports mean/p50/p90 time to the reply,
+which provider answered and how many replies were grounded.
+
+    python benchmark_speculative_search.py [--requests 10] [--latency 0.8] [--search-deadline 3]
+    python benchmark_speculative_search.py --scenario down --grounding-wait 1.0
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+from fake_providers import FakeProviders, parse_errors
+
+SCENARIOS = ('fast', 'slow', 'down')
+MODES = ('sequential', 'speculative')
+TOPICS = ['rust', 'kubernetes', 'serverless', 'edge computing', 'postgres', 'webassembly', 'llm agents']
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def set_scenario(search, scenario, args):
+    search.latency = args.slow_search if scenario == 'slow' else args.fast_search
+    search.errors = parse_errors('timeout=1.0' if scenario == 'down' else '')
+
+
+def run(client, chatbot, mode, scenario, args, counter):
+    """Send args.requests new questions one after the other; one (latency, provider, grounded) each"""
+    chatbot.WEB_SEARCH_MODE = mode
+    results = []
+    for _ in range(args.requests):
+        number = next(counter)
+        message = f"What is the latest news about {TOPICS[number % len(TOPICS)]} ({scenario} {number})?"
+        started = time.perf_counter()
+        body = client.post('/get', json={'message': message}).get_json()
+        results.append((time.perf_counter() - started, body['provider'], bool(body.get('grounded'))))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and speculative web search on /get")
+    parser.add_argument('--requests', type=int, default=10, help="questions per scenario and mode")
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help="scenarios to run (default: all)")
+    parser.add_argument('--latency', default='0.8', help="providers' time to first token (seconds or a spec)")
+    parser.add_argument('--fast-search', default='0.3', help="search latency in the fast scenario")
+    parser.add_argument('--slow-search', default='2.5', help="search latency in the slow scenario")
+    parser.add_argument('--search-deadline', default='3', help="WEB_SEARCH_DEADLINE (seconds)")
+    parser.add_argument('--grounding-wait', default='1.5', help="WEB_GROUNDING_WAIT (seconds)")
+    args = parser.parse_args()
+
+    providers = FakeProviders(latency=args.latency, tokens_per_second=200, seed=1).start()
+    providers['search'].hang = float(args.search_deadline) + 5  # A hung search outlasts its deadline
+    os.environ.update(providers.env())
+    os.environ.update(WEB_SEARCH_DEADLINE=args.search_deadline, WEB_GROUNDING_WAIT=args.grounding_wait)
+    os.environ.setdefault('OLLAMA_AUTO_START', 'false')
+    os.environ.setdefault('LOG_PATH', os.devnull)
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+    import chatbot  # Reads the environment on import
+
+    deadline = time.time() + 10
+    while not chatbot.check_ollama_service() and time.time() < deadline:
+        time.sleep(0.1)  # Supervisor's first probe
+    client = chatbot.app.test_client()
+    counter = itertools.count()
+
+    print(f"providers {args.latency}s to first token, search deadline {args.search_deadline}s, "
+          f"grounding wait {args.grounding_wait}s, {args.requests} questions per row\n")
+    print(f"{'scenario':<9} {'mode':<12} {'mean s':>7} {'p50 s':>7} {'p90 s':>7} {'grounded':>9}  replies by")
+    try:
+        for scenario in args.scenario or SCENARIOS:
+            set_scenario(providers['search'], scenario, args)
+            for mode in MODES:
+                results = run(client, chatbot, mode, scenario, args, counter)
+                latencies = [latency for latency, _, _ in results]
+                grounded = sum(1 for _, _, grounded in results if grounded) / len(results)
+                by = Counter(provider for _, provider, _ in results)
+                shares = ', '.join(f"{name} {count / len(results):.0%}" for name, count in by.most_common())
+                print(f"{scenario:<9} {mode:<12} {statistics.mean(latencies):>7.2f} "
+                      f"{percentile(latencies, 0.5):>7.2f} {percentile(latencies, 0.9):>7.2f} "
+                      f"{grounded:>9.0%}  {shares}")
+    finally:
+        providers.stop()
+
+
+if __name__ == '__main__':
+    main()
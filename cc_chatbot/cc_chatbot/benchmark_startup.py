@@ -0,0 +1,164 @@
+"""
+Startup Benchmark: how long a fresh worker takes to import app/chatbot.py
+Runs `python -X importtime` on `import chatbot` in --runs fresh processes
+and reports:
+- the import time (median and spread), i.e. how soon a new worker can serve
+- the slowest imports under chatbot (cumulative, median over the runs)
+- the extra time to load every enabled provider SDK afterwards (what the
+  background warm-up does, and what each import used to cost up front)
+
+OpenAI and Gemini are enabled with dummy keys; nothing is sent anywhere.
+
+--history appends each run (time, git commit, medians) to a JSONL file and
+compares with the previous entry, so start-up time can be tracked over
+time; with --tolerance, a slower import than the last entry exits 1.
+
+    python benchmark_startup.py [--runs 7] [--top 15]
+    python benchmark_startup.py --history logs/startup_history.jsonl --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, 'app')
+
+# Run in the child process: import chatbot, then load the enabled SDKs
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {app!r})
+started = time.perf_counter()
+import chatbot
+imported = time.perf_counter() - started
+started = time.perf_counter()
+for name in ('Ollama', 'OpenAI', 'Gemini'):
+    chatbot.provider_registry[name].get(loaded_by='benchmark')
+loaded = time.perf_counter() - started
+print(json.dumps({{'import': imported, 'sdks': loaded, 'status': chatbot.provider_registry.stats()}}))
+"""
+
+
+def run_once(env):
+    """One fresh interpreter: (result dict, {module: cumulative seconds} from -X importtime)"""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD.format(app=APP)],
+                             capture_output=True, text=True, env=env, cwd=HERE, timeout=120)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+    return json.loads(process.stdout.strip().splitlines()[-1]), parse_importtime(process.stderr)
+
+
+def parse_importtime(stderr):
+    """{top-level import under chatbot: cumulative seconds}, from `import time: self | cumulative | name` lines"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:  # A module's imports are listed before it, one level deeper
+            modules[name.strip()] = int(cumulative) / 1e6
+        elif depth == 0:
+            if name.strip() == 'chatbot':
+                return modules
+            modules = {}
+    return modules
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=HERE, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def last_entry(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time of app/chatbot.py in fresh processes")
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--top', type=int, default=15, help="slowest imports to list")
+    parser.add_argument('--history', help="JSONL file to append this run to and compare against")
+    parser.add_argument('--tolerance', type=float, help="exit 1 if the import is this much slower than last time")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='startup-bench-')
+    env = dict(os.environ,
+               OLLAMA_AUTO_START='false',
+               OLLAMA_HOST='127.0.0.1:9',  # Nothing listens there: the supervisor's probe fails at once
+               PROVIDER_WARM_UP='false',
+               OPENAI_API_KEY=os.getenv('OPENAI_API_KEY', 'benchmark'),
+               GEMINI_API_KEY=os.getenv('GEMINI_API_KEY', 'benchmark'),
+               LOG_PATH=os.path.join(scratch, 'chatbot.jsonl'),
+               INTENT_CACHE_PATH=os.path.join(scratch, 'intents.npz'),
+               SEMANTIC_CACHE_PATH=os.path.join(scratch, 'semantic_cache'))
+
+    run_once(env)  # Warm the OS file cache and write the bytecode and intent caches
+    imports, sdks, modules = [], [], {}
+    status = None
+    for _ in range(args.runs):
+        result, by_module = run_once(env)
+        imports.append(result['import'])
+        sdks.append(result['sdks'])
+        status = result['status']
+        for name, seconds in by_module.items():
+            modules.setdefault(name, []).append(seconds)
+
+    import_ms = statistics.median(imports) * 1000
+    sdks_ms = statistics.median(sdks) * 1000
+    print(f"{args.runs} fresh processes, Python {sys.version.split()[0]}\n")
+    print(f"import chatbot:        {import_ms:7.0f} ms median  "
+          f"({min(imports) * 1000:.0f}-{max(imports) * 1000:.0f} ms)")
+    print(f"+ load enabled SDKs:   {sdks_ms:7.0f} ms median  (lazy: paid by the warm-up or first use)")
+    for name, provider in status.items():
+        print(f"    {name:<12} {provider['module']:<22} "
+              + (f"{provider['load_ms']:7.0f} ms" if provider['enabled'] else "  not enabled/installed"))
+
+    slowest = sorted(((statistics.median(values), name) for name, values in modules.items()), reverse=True)
+    print(f"\nSlowest imports under chatbot (cumulative, median):")
+    for seconds, name in slowest[:args.top]:
+        print(f"    {name:<30} {seconds * 1000:7.1f} ms")
+
+    if not args.history:
+        return
+    entry = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import_ms': round(import_ms, 1),
+        'sdks_ms': round(sdks_ms, 1),
+        'slowest': {name: round(seconds * 1000, 1) for seconds, name in slowest[:args.top]}
+    }
+    previous = last_entry(args.history)
+    directory = os.path.dirname(args.history)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+    if previous is None:
+        print(f"\nRecorded the first entry in {args.history}")
+        return
+
+    change = import_ms / previous['import_ms'] - 1
+    print(f"\nSince {previous['time']} ({previous.get('commit') or '?'}): "
+          f"{previous['import_ms']:.0f} -> {import_ms:.0f} ms ({change:+.0%})")
+    if args.tolerance is not None and change > args.tolerance:
+        print(f"Import time regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
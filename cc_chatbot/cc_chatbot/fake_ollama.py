@@ -0,0 +1,40 @@
+"""
+Stand-in Ollama server for local testing
+Answers the parts of Ollama's HTTP API the app uses (/api/chat and
+/api/generate, streamed or not, /api/ps and /api/tags) with a canned reply
+after a fixed delay, so serving modes can be load-tested without a model:
+
+    python fake_ollama.py --port 11500 --latency 1.0
+    OLLAMA_HOST=http://127.0.0.1:11500 python app/chatbot.py
+
+The server lives in fake_providers.py with the other stand-in providers;
+this module keeps the Ollama-only entry point.
+"""
+
+import argparse
+
+from fake_providers import REPLY, FakeOllamaServer, OllamaHandler
+
+__all__ = ['REPLY', 'FakeOllamaServer', 'OllamaHandler']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11500)
+    parser.add_argument('--model', default='llama3.2:1b')
+    parser.add_argument('--latency', default='1.0', help="seconds before the first token (or a distribution spec)")
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--errors', default='', help="fault rates, e.g. 503=0.05,timeout=0.01")
+    args = parser.parse_args()
+    server = FakeOllamaServer((args.host, args.port), model=args.model, latency=args.latency,
+                              tokens_per_second=args.tokens_per_second, errors=args.errors)
+    print(f"Stand-in Ollama listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
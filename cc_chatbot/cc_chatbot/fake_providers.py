@@ -0,0 +1,620 @@
+"""
+Stand-in provider servers for offline load testing
+One local HTTP server per outbound dependency, each speaking enough of the
+real wire protocol for the clients the app uses, streaming included:
+
+    Ollama        /api/chat, /api/generate (NDJSON), /api/ps, /api/tags   OLLAMA_HOST
+    OpenAI        /v1/chat/completions (JSON or SSE), /v1/models          OPENAI_BASE_URL
+    Gemini        /v1beta/models/{model}:generateContent and
+                  :streamGenerateContent (REST, JSON array or SSE)        GEMINI_API_ENDPOINT
+    Hugging Face  /models/{model} (JSON, or TGI-style SSE)                HF_API_URL
+    Web search    /search?q=...&format=json (SearxNG JSON)                WEB_SEARCH_URL
+                  /page/... (the results' HTML pages, with ETag and 304s)
+
+Each server waits a time to first token drawn from its latency
+distribution, paces tokens at tokens_per_second and injects errors (429,
+5xx, or a hung request for 'timeout') at configured rates. A seeded RNG
+makes runs reproducible:
+
+    python fake_providers.py --latency lognormal:0.8,0.4 --tokens-per-second 40 \\
+        --errors 429=0.05,500=0.02,timeout=0.01 --seed 1
+    # prints the environment that points app/chatbot.py at the servers
+
+Latency specs: 0.5 (fixed), uniform:0.2,0.8, normal:0.5,0.1,
+lognormal:MEDIAN,SIGMA, exponential:MEAN. --profile takes a JSON file of
+per-provider overrides, e.g. {"openai": {"latency": "2.0", "errors": {"429": 0.5}}}.
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+REPLY = "Cloudy ☁️: Cloud computing means renting servers, storage and software over the internet instead of running your own."
+
+DEFAULT_PORTS = {'ollama': 11500, 'openai': 11501, 'gemini': 11502, 'huggingface': 11503, 'search': 11504}
+
+
+class Latency:
+    """A latency distribution in seconds, parsed from a spec like 'lognormal:0.8,0.4'"""
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, spec):
+        if isinstance(spec, Latency):
+            spec = spec.spec
+        self.spec = str(spec)
+        kind, _, args = self.spec.partition(':')
+        if not args:
+            kind, args = 'fixed', kind
+        if kind not in self.KINDS:
+            raise ValueError(f"unknown latency distribution {kind!r} (one of {', '.join(self.KINDS)})")
+        self.kind = kind
+        self.args = [float(value) for value in args.split(',')]
+
+    def sample(self, rng):
+        a = self.args
+        if self.kind == 'fixed':
+            value = a[0]
+        elif self.kind == 'uniform':
+            value = rng.uniform(a[0], a[1])
+        elif self.kind == 'normal':
+            value = rng.gauss(a[0], a[1])
+        elif self.kind == 'lognormal':
+            value = a[0] * math.exp(rng.gauss(0, a[1]))  # a[0] is the median
+        else:
+            value = rng.expovariate(1 / a[0]) if a[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __str__(self):
+        return self.spec
+
+
+def parse_errors(spec):
+    """'429=0.05,500=0.02,timeout=0.01' -> {'429': 0.05, '500': 0.02, 'timeout': 0.01}"""
+    if not spec:
+        return {}
+    if isinstance(spec, dict):
+        return {str(kind): float(rate) for kind, rate in spec.items()}
+    errors = {}
+    for item in spec.split(','):
+        kind, _, rate = item.partition('=')
+        errors[kind.strip()] = float(rate)
+    return errors
+
+
+class FakeProviderServer(ThreadingHTTPServer):
+    """Shared timing, fault injection and counters of the stand-in servers"""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+    name = 'provider'
+    handler = None
+
+    def __init__(self, address=('127.0.0.1', 0), model=None, latency=0.5, tokens_per_second=50.0,
+                 errors=None, reply=REPLY, replies=None, seed=None, hang=30.0):
+        super().__init__(address, self.handler)
+        self.model = model
+        self.latency = latency  # Seconds before the first token (a number or a Latency spec)
+        self.tokens_per_second = tokens_per_second  # Pace of streamed words (math.inf: all at once)
+        self.errors = parse_errors(errors)  # Fault -> probability per request
+        self.reply = reply
+        self.replies = replies or {}  # Keyword in the prompt -> canned reply
+        self.hang = hang  # Seconds a 'timeout' fault holds the request before dropping it
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.faults = {}
+
+    @property
+    def latency(self):
+        return self._latency
+
+    @latency.setter
+    def latency(self, spec):
+        self._latency = Latency(spec)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the app at this server"""
+        return {}
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name=f"fake-{self.name}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'max_in_flight': self.max_in_flight, 'faults': dict(self.faults)}
+
+    def enter(self):
+        """Count a request and decide its fault: None, an HTTP status code or 'timeout'"""
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            roll = self.rng.random()
+            fault = None
+            for kind, rate in self.errors.items():
+                if roll < rate:
+                    fault = kind
+                    self.faults[kind] = self.faults.get(kind, 0) + 1
+                    break
+                roll -= rate
+            return fault
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def time_to_first_token(self):
+        with self.lock:
+            return self._latency.sample(self.rng)
+
+    def pace(self, tokens=1):
+        if self.tokens_per_second and not math.isinf(self.tokens_per_second):
+            time.sleep(tokens / self.tokens_per_second)
+
+    def reply_for(self, prompt):
+        prompt = (prompt or '').lower()
+        for keyword, reply in self.replies.items():
+            if keyword.lower() in prompt:
+                return reply
+        return self.reply
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Streamed chunks go out as they are written
+
+    def log_message(self, format, *args):
+        pass
+
+    # Provider hooks
+    def error_body(self, status):
+        return {'error': f"injected {status} error"}
+
+    def error_headers(self, status):
+        return {'Retry-After': '1'} if status == 429 else {}
+
+    def respond(self, prompt, stream, body):
+        """Send the reply (after time to first token) in the provider's format"""
+        raise NotImplementedError
+
+    # Shared request flow
+    def complete(self, prompt, stream, body=None):
+        server = self.server
+        fault = server.enter()
+        try:
+            if fault == 'timeout':
+                time.sleep(server.hang)
+                self.close_connection = True  # Drop it without an answer
+                return
+            if fault is not None:
+                status = int(fault)
+                return self.send_json(self.error_body(status), status=status, headers=self.error_headers(status))
+            time.sleep(server.time_to_first_token())
+            self.respond(prompt, stream, body)
+        finally:
+            server.leave()
+
+    def words(self, prompt):
+        return self.server.reply_for(prompt).split(' ')
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return {}
+
+    def send_json(self, data, status=200, headers=None):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+    def chunk(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def sse(self, data):
+        self.chunk(f"data: {data if isinstance(data, str) else json.dumps(data)}\n\n")
+
+    def end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+
+    def not_found(self):
+        self.send_json({'error': 'not found'}, status=404)
+
+
+# 🔹 Ollama
+
+class OllamaHandler(FakeHandler):
+    def error_body(self, status):
+        return {'error': 'server busy, please try again' if status in (429, 503) else f"injected {status} error"}
+
+    def do_GET(self):
+        if self.path in ('/api/ps', '/api/tags'):
+            self.send_json({'models': [{'name': self.server.model, 'model': self.server.model}]})
+        else:
+            self.not_found()
+
+    def do_POST(self):
+        body = self.read_json()
+        if self.path not in ('/api/chat', '/api/generate'):
+            return self.not_found()
+        if not body.get('prompt') and not body.get('messages'):
+            return self.send_json(self._final(body, ''))  # Empty prompt: model preload
+        messages = body.get('messages') or [{'content': body.get('prompt', '')}]
+        self.complete(messages[-1].get('content', ''), body.get('stream', True), body)
+
+    def respond(self, prompt, stream, body):
+        words = self.words(prompt)
+        text = ' '.join(words)
+        if not stream:
+            self.server.pace(len(words))
+            return self.send_json(self._final(body, text))
+        chat = self.path == '/api/chat'
+        self.start_chunked('application/x-ndjson')
+        for word in words:
+            chunk = {'model': body.get('model'), 'done': False}
+            if chat:
+                chunk['message'] = {'role': 'assistant', 'content': word + ' '}
+            else:
+                chunk['response'] = word + ' '
+            self.chunk(json.dumps(chunk) + '\n')
+            self.server.pace()
+        final = self._final(body, text)
+        final.pop('message', None)
+        final.pop('response', None)
+        self.chunk(json.dumps(final) + '\n')
+        self.end_chunked()
+
+    def _final(self, body, text):
+        final = {'model': body.get('model'), 'done': True, 'prompt_eval_count': 10,
+                 'prompt_eval_duration': 1000000, 'eval_count': len(text.split())}
+        if self.path == '/api/chat':
+            final['message'] = {'role': 'assistant', 'content': text}
+        else:
+            final['response'] = text
+            final['context'] = list(body.get('context') or []) + list(range(len(text.split()) + 1))
+        return final
+
+
+class FakeOllamaServer(FakeProviderServer):
+    name = 'ollama'
+    handler = OllamaHandler
+
+    def __init__(self, address=('127.0.0.1', 0), model='llama3.2:1b', latency=1.0, tokens_per_second=50.0, **kwargs):
+        super().__init__(address, model=model, latency=latency, tokens_per_second=tokens_per_second, **kwargs)
+
+    def env(self):
+        return {'OLLAMA_HOST': self.url}
+
+
+# 🔹 OpenAI
+
+class OpenAIHandler(FakeHandler):
+    def error_body(self, status):
+        kind = {429: 'rate_limit_exceeded', 401: 'invalid_api_key'}.get(status, 'server_error')
+        return {'error': {'message': f"Injected {status} error", 'type': kind, 'param': None, 'code': kind}}
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            self.send_json({'object': 'list', 'data': [{'id': self.server.model, 'object': 'model', 'owned_by': 'fake'}]})
+        else:
+            self.not_found()
+
+    def do_POST(self):
+        body = self.read_json()
+        if urlsplit(self.path).path != '/v1/chat/completions':
+            return self.not_found()
+        messages = body.get('messages') or [{}]
+        self.complete(messages[-1].get('content', ''), bool(body.get('stream')), body)
+
+    def respond(self, prompt, stream, body):
+        words = self.words(prompt)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        base = {'id': completion_id, 'created': int(time.time()), 'model': body.get('model') or self.server.model}
+        if not stream:
+            self.server.pace(len(words))
+            return self.send_json({
+                **base, 'object': 'chat.completion',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ' '.join(words)},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(words),
+                          'total_tokens': len(prompt.split()) + len(words)}
+            })
+        self.start_chunked('text/event-stream')
+        for index, word in enumerate(words):
+            delta = {'content': word + ' '}
+            if index == 0:
+                delta['role'] = 'assistant'
+            self.sse({**base, 'object': 'chat.completion.chunk',
+                      'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})
+            self.server.pace()
+        self.sse({**base, 'object': 'chat.completion.chunk',
+                  'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+        self.sse('[DONE]')
+        self.end_chunked()
+
+
+class FakeOpenAIServer(FakeProviderServer):
+    name = 'openai'
+    handler = OpenAIHandler
+
+    def __init__(self, address=('127.0.0.1', 0), model='gpt-4o-mini', **kwargs):
+        super().__init__(address, model=model, **kwargs)
+
+    def env(self):
+        return {'OPENAI_BASE_URL': f"{self.url}/v1", 'OPENAI_API_KEY': 'fake-key', 'OPENAI_MODEL': self.model}
+
+
+# 🔹 Gemini (REST transport of google-generativeai)
+
+GEMINI_PATH = re.compile(r'^/v1(?:beta)?/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$')
+GEMINI_STATUS = {400: 'INVALID_ARGUMENT', 429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE'}
+
+
+class GeminiHandler(FakeHandler):
+    def error_body(self, status):
+        return {'error': {'code': status, 'message': f"Injected {status} error",
+                          'status': GEMINI_STATUS.get(status, 'UNKNOWN')}}
+
+    def do_POST(self):
+        body = self.read_json()
+        url = urlsplit(self.path)
+        match = GEMINI_PATH.match(url.path)
+        if not match:
+            return self.not_found()
+        self.sse_format = parse_qs(url.query).get('alt', [''])[0] == 'sse'
+        parts = ((body.get('contents') or [{}])[-1].get('parts') or [{}])
+        self.complete(parts[-1].get('text', ''), match.group('method') == 'streamGenerateContent', body)
+
+    def respond(self, prompt, stream, body):
+        words = self.words(prompt)
+        if not stream:
+            self.server.pace(len(words))
+            return self.send_json(self._candidate(' '.join(words), done=True))
+        # The REST transport reads a JSON array incrementally; ?alt=sse asks for Server-Sent Events
+        self.start_chunked('text/event-stream' if self.sse_format else 'application/json')
+        for index, word in enumerate(words):
+            candidate = self._candidate(word + ' ', done=index == len(words) - 1)
+            if self.sse_format:
+                self.sse(candidate)
+            else:
+                self.chunk(('[' if index == 0 else ',\r\n') + json.dumps(candidate))
+            self.server.pace()
+        if not self.sse_format:
+            self.chunk(']')
+        self.end_chunked()
+
+    def _candidate(self, text, done):
+        candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+        if done:
+            candidate['finishReason'] = 'STOP'
+        return {'candidates': [candidate]}
+
+
+class FakeGeminiServer(FakeProviderServer):
+    name = 'gemini'
+    handler = GeminiHandler
+
+    def __init__(self, address=('127.0.0.1', 0), model='gemini-pro', **kwargs):
+        super().__init__(address, model=model, **kwargs)
+
+    def env(self):
+        return {'GEMINI_API_ENDPOINT': self.url, 'GEMINI_API_KEY': 'fake-key', 'GEMINI_MODEL': self.model}
+
+
+# 🔹 Hugging Face Inference API
+
+class HuggingFaceHandler(FakeHandler):
+    def error_body(self, status):
+        if status == 503:
+            return {'error': f"Model {self.server.model} is currently loading", 'estimated_time': 20.0}
+        return {'error': f"Injected {status} error"}
+
+    def do_POST(self):
+        body = self.read_json()
+        if not urlsplit(self.path).path.startswith('/models/'):
+            return self.not_found()
+        self.complete(str(body.get('inputs', '')), bool(body.get('stream')), body)
+
+    def respond(self, prompt, stream, body):
+        words = self.words(prompt)
+        if not stream:
+            self.server.pace(len(words))
+            # DialoGPT-style: the generated text repeats the input
+            return self.send_json([{'generated_text': f"{prompt} {' '.join(words)}"}])
+        self.start_chunked('text/event-stream')
+        for index, word in enumerate(words):
+            last = index == len(words) - 1
+            self.sse({'token': {'id': index, 'text': word + ' ', 'special': False},
+                      'generated_text': ' '.join(words) if last else None})
+            self.server.pace()
+        self.end_chunked()
+
+
+class FakeHuggingFaceServer(FakeProviderServer):
+    name = 'huggingface'
+    handler = HuggingFaceHandler
+
+    def __init__(self, address=('127.0.0.1', 0), model='microsoft/DialoGPT-medium', **kwargs):
+        super().__init__(address, model=model, **kwargs)
+
+    def env(self):
+        return {'HF_API_URL': f"{self.url}/models/{self.model}", 'HUGGING_FACE_API_KEY': 'fake-key'}
+
+
+# 🔹 Web search (SearxNG JSON API)
+
+class SearchHandler(FakeHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.startswith('/page/'):
+            return self.complete(url.path, False)
+        if url.path != '/search':
+            return self.not_found()
+        query = parse_qs(url.query).get('q', [''])[0]
+        self.complete(query, False)
+
+    def respond(self, prompt, stream, body):
+        if prompt.startswith('/page/'):
+            return self.page(prompt)
+        slug = re.sub(r'[^a-z0-9]+', '-', prompt.lower()).strip('-') or 'search'
+        results = [{
+            'title': f"{prompt.strip() or 'Result'} - result {rank}",
+            'url': f"{self.server.url}/page/{slug}/{rank}",
+            'content': self.server.reply_for(prompt),
+            'engine': 'fake'
+        } for rank in range(1, 6)]
+        self.send_json({'query': prompt, 'number_of_results': len(results), 'results': results})
+
+    def page(self, path):
+        """A result page: navigation, then a few paragraphs; unchanged pages are revalidated with a 304"""
+        etag = f'"{uuid.uuid5(uuid.NAMESPACE_URL, path).hex[:16]}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            return self.end_headers()
+        topic = path.split('/')[2].replace('-', ' ')
+        paragraphs = ''.join(f"<p>{self.server.reply_for(topic)} This is paragraph {n} of the page about {topic}.</p>"
+                             for n in range(1, 6))
+        html = (f"<!DOCTYPE html><html><head><title>{topic}</title><style>p {{ margin: 0 }}</style></head><body>"
+                f"<nav><ul><li><a href='/'>Home</a></li><li><a href='/about'>About</a></li></ul></nav>"
+                f"<main><h1>{topic}</h1>{paragraphs}</main><script>var tracking = 1;</script></body></html>")
+        payload = html.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Mon, 05 Oct 2026 12:00:00 GMT')
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeSearchServer(FakeProviderServer):
+    name = 'search'
+    handler = SearchHandler
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.3, **kwargs):
+        super().__init__(address, latency=latency, **kwargs)
+
+    def env(self):
+        return {'WEB_SEARCH_URL': f"{self.url}/search"}
+
+
+SERVERS = {
+    'ollama': FakeOllamaServer,
+    'openai': FakeOpenAIServer,
+    'gemini': FakeGeminiServer,
+    'huggingface': FakeHuggingFaceServer,
+    'search': FakeSearchServer,
+}
+
+
+class FakeProviders:
+    """A set of running stand-in servers; env() points the app at all of them"""
+
+    def __init__(self, names=tuple(SERVERS), host='127.0.0.1', ports=None, profile=None, **defaults):
+        self.servers = {}
+        for name in names:
+            options = {**defaults, **(profile or {}).get(name, {})}
+            port = (ports or {}).get(name, 0)
+            self.servers[name] = SERVERS[name]((host, port), **options)
+
+    def __getitem__(self, name):
+        return self.servers[name]
+
+    def start(self):
+        for server in self.servers.values():
+            server.start()
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.stop()
+
+    def env(self):
+        env = {}
+        for server in self.servers.values():
+            env.update(server.env())
+        return env
+
+    def stats(self):
+        return {name: server.stats() for name, server in self.servers.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Ollama, OpenAI, Gemini, Hugging Face and search servers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--base-port', type=int, default=11500,
+                        help="first port; the servers listen on consecutive ports (0: any free ports)")
+    parser.add_argument('--only', help="comma-separated subset of: " + ', '.join(SERVERS))
+    parser.add_argument('--latency', default='0.5', help="time to first token, seconds or a distribution spec")
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--errors', default='', help="fault rates, e.g. 429=0.05,500=0.02,timeout=0.01")
+    parser.add_argument('--replies', help="JSON file of prompt keyword -> canned reply")
+    parser.add_argument('--profile', help="JSON file of per-provider overrides")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(SERVERS)
+    ports = {name: args.base_port + index if args.base_port else 0 for index, name in enumerate(SERVERS)}
+    replies = None
+    if args.replies:
+        with open(args.replies) as f:
+            replies = json.load(f)
+    profile = None
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+
+    providers = FakeProviders(names, host=args.host, ports=ports, profile=profile, latency=args.latency,
+                              tokens_per_second=args.tokens_per_second, errors=args.errors, replies=replies,
+                              seed=args.seed).start()
+    for name, server in providers.servers.items():
+        print(f"# {name:<12} {server.url}  latency={server.latency} errors={server.errors or 'none'}")
+    for key, value in providers.env().items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        providers.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Stand-in Redis server for local testing
+Speaks RESP2 and implements the commands the Redis session backend uses
+(lists, hashes, TTLs, SCAN), keeping everything in memory. Use it to run the
+app or benchmark_sessions.py without a real Redis:
+
+    python fake_redis.py --port 6390
+    SESSION_BACKEND=redis://localhost:6390/0 python app/chatbot.py
+"""
+
+import argparse
+import fnmatch
+import socket
+import socketserver
+import threading
+import time
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, RespHandler)
+        self.data = {}  # key -> list (RPUSH) or dict (HSET)
+        self.expires = {}  # key -> monotonic deadline
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-redis', daemon=True).start()
+        return self
+
+    def _live(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def run(self, command, args):
+        with self.lock:
+            handler = getattr(self, f"cmd_{command.lower()}", None)
+            if handler is None:
+                return RespError(f"ERR unknown command '{command}'")
+            try:
+                return handler(*args)
+            except (TypeError, ValueError) as e:
+                return RespError(f"ERR {e}")
+
+    def cmd_ping(self, *args):
+        return args[0] if args else Simple('PONG')
+
+    def cmd_auth(self, *args):
+        return Simple('OK')
+
+    def cmd_select(self, db):
+        return Simple('OK')
+
+    def cmd_flushall(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return Simple('OK')
+
+    def cmd_dbsize(self):
+        return sum(1 for key in list(self.data) if self._live(key) is not None)
+
+    def cmd_rpush(self, key, *values):
+        items = self._live(key)
+        if items is None:
+            items = self.data[key] = []
+        items.extend(values)
+        return len(items)
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self._live(key)
+        if items is not None:
+            items[:] = items[_index(start, len(items)):_stop(stop, len(items))]
+            if not items:
+                self.data.pop(key)
+        return Simple('OK')
+
+    def cmd_lrange(self, key, start, stop):
+        items = self._live(key) or []
+        return items[_index(start, len(items)):_stop(stop, len(items))]
+
+    def cmd_llen(self, key):
+        return len(self._live(key) or [])
+
+    def cmd_hset(self, key, *pairs):
+        fields = self._live(key)
+        if fields is None:
+            fields = self.data[key] = {}
+        added = sum(1 for name in pairs[::2] if name not in fields)
+        fields.update(zip(pairs[::2], pairs[1::2]))
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self._live(key) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        return [item for pair in (self._live(key) or {}).items() for item in pair]
+
+    def cmd_expire(self, key, seconds):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.monotonic() + int(seconds)
+        return 1
+
+    def cmd_ttl(self, key):
+        if self._live(key) is None:
+            return -2
+        deadline = self.expires.get(key)
+        return -1 if deadline is None else int(deadline - time.monotonic())
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self.data[key]
+                removed += 1
+            self.expires.pop(key, None)
+        return removed
+
+    def cmd_scan(self, cursor, *options):
+        # The whole keyspace in one page
+        pattern = '*'
+        for name, value in zip(options[::2], options[1::2]):
+            if name.upper() == 'MATCH':
+                pattern = value
+        keys = [key for key in list(self.data) if self._live(key) is not None and fnmatch.fnmatchcase(key, pattern)]
+        return ['0', keys]
+
+
+class Simple(str):
+    """A simple-string reply (+OK)"""
+
+
+class RespError(str):
+    """An error reply (-ERR ...)"""
+
+
+def _index(value, length):
+    value = int(value)
+    return max(0, length + value) if value < 0 else value
+
+
+def _stop(value, length):
+    value = int(value)
+    return length + value + 1 if value < 0 else value + 1
+
+
+def encode_reply(value):
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, RespError):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, Simple):
+        return f"+{value}\r\n".encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(map(encode_reply, value))
+    data = value.encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            self.wfile.write(encode_reply(self.server.run(command[0], command[1:])))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.decode().split()  # Inline command (e.g. from telnet)
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2].decode('utf-8'))
+        return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    server = FakeRedisServer((args.host, args.port))
+    print(f"Stand-in Redis listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+"""
+Concurrent load test for Cloudy AI
+Drives /get with many virtual users at once instead of test_chatbot.py's
+one-message-at-a-time loop, and reports throughput and p50/p90/p99 latency
+overall, per test category and per answering provider, plus status codes
+and errors. Each virtual user keeps its own session cookie.
+
+Load shapes:
+- closed loop (default): --concurrency users each send the workload in
+  order, --iterations times, the next message as soon as a reply arrives
+- open loop: --rate requests/s with Poisson arrivals for --duration seconds
+  (or --requests requests), whether or not earlier replies have arrived
+
+The workload is test_chatbot.TEST_CASES, or --traffic: a JSONL file of
+{"message", "category", "session", "ts"} records, or the app's own event log
+(its chat_request events). Recorded sessions become virtual users;
+--replay-timing keeps their recorded arrival times (sped up by --speed).
+
+--serve flask|asgi runs the app in-process against the stand-in providers
+of fake_providers.py, so the test needs no model, API key or network (CI):
+
+    python load_test.py --serve asgi --concurrency 20 --iterations 2
+    python load_test.py --url http://localhost:5000 --rate 5 --duration 60 --stream
+    python load_test.py --serve flask --save-baseline baseline.json
+    python load_test.py --serve flask --baseline baseline.json --tolerance 0.1   # exit 1 on regression
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import httpx
+
+from test_chatbot import TEST_CASES
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+
+# Metric -> the direction that is worse, for --baseline comparisons
+REGRESSION_CHECKS = {
+    'throughput': 'lower',
+    'latency.p50': 'higher',
+    'latency.p90': 'higher',
+    'latency.p99': 'higher',
+    'ttft.p50': 'higher',
+    'ttft.p99': 'higher',
+    'error_rate': 'higher',
+}
+
+
+# 🔹 Workloads
+
+def test_case_workload():
+    return [{'message': case['message'], 'category': case['category'],
+             'expected_keywords': case['expected_keywords']} for case in TEST_CASES]
+
+
+def load_traffic(path):
+    """Requests recorded in a JSONL file or the app's event log, in arrival order"""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'event' in record:  # The app's event log
+                if record['event'] != 'chat_request' or not record.get('input'):
+                    continue
+                record = {'message': record['input'], 'session': record.get('session'),
+                          'ts': record.get('ts'), 'regenerate': record.get('regenerate', False),
+                          'category': 'replay'}
+            if record.get('message'):
+                items.append(record)
+    times = [item['ts'] for item in items if item.get('ts') is not None]
+    start = min(times) if times else 0
+    for item in items:
+        item.setdefault('category', 'replay')
+        item['offset'] = item['ts'] - start if item.get('ts') is not None else None
+    items.sort(key=lambda item: item['offset'] or 0)
+    return items
+
+
+def session_scripts(items, users, iterations):
+    """One ordered list of requests per virtual user"""
+    if any(item.get('session') for item in items):
+        scripts = defaultdict(list)
+        for item in items:
+            scripts[item.get('session')].append(item)
+        return [script * iterations for script in scripts.values()]
+    return [items * iterations for _ in range(users)]
+
+
+# 🔹 Virtual users
+
+class VirtualUser:
+    """One browser: an HTTP client with its own session cookie"""
+
+    def __init__(self, make_client, args):
+        self.make_client = make_client
+        self.args = args
+        self.client = None
+
+    async def __aenter__(self):
+        self.client = self.make_client()
+        await self.client.get('/')  # Session cookie
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def send(self, item):
+        """POST one message; returns a sample dict"""
+        args = self.args
+        headers = {}
+        if args.stream:
+            headers['Accept'] = 'text/event-stream'
+        if args.deadline:
+            headers['X-Request-Deadline'] = str(args.deadline)
+        body = {'message': item['message'], 'regenerate': args.regenerate or bool(item.get('regenerate'))}
+        sample = {'category': item.get('category', 'replay'), 'status': None, 'provider': None,
+                  'latency': None, 'ttft': None, 'error': None, 'keyword_hit': None}
+        reply = ''
+        started = time.perf_counter()
+        try:
+            if args.stream:
+                async with self.client.stream('POST', '/get', json=body, headers=headers) as response:
+                    sample['status'] = response.status_code
+                    event = None
+                    async for line in response.aiter_lines():
+                        if line.startswith('event:'):
+                            event = line[6:].strip()
+                        elif line.startswith('data:'):
+                            data = json.loads(line[5:])
+                            if 'token' in data and sample['ttft'] is None:
+                                sample['ttft'] = time.perf_counter() - started
+                            if event == 'done':
+                                reply, sample['provider'] = data.get('reply', ''), data.get('provider')
+                            event = None
+            else:
+                response = await self.client.post('/get', json=body, headers=headers)
+                sample['status'] = response.status_code
+                if response.status_code == 200:
+                    data = response.json()
+                    reply, sample['provider'] = data.get('reply', ''), data.get('provider')
+        except httpx.TimeoutException:
+            sample['error'] = 'timeout'
+        except httpx.HTTPError as e:
+            sample['error'] = type(e).__name__
+        sample['latency'] = time.perf_counter() - started
+        if sample['error'] is None and sample['status'] != 200:
+            sample['error'] = f"http_{sample['status']}"
+        if item.get('expected_keywords') and reply:
+            sample['keyword_hit'] = any(word.lower() in reply.lower() for word in item['expected_keywords'])
+        return sample
+
+
+async def closed_loop(make_client, scripts, args):
+    samples = []
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def user(script):
+        async with limit, VirtualUser(make_client, args) as vu:
+            for item in script:
+                samples.append(await vu.send(item))
+
+    await asyncio.gather(*(user(script) for script in scripts))
+    return samples
+
+
+async def open_loop(make_client, items, args):
+    """Send requests at Poisson arrival times (or the recorded ones) regardless of replies"""
+    rng = random.Random(args.seed)
+    users = [VirtualUser(make_client, args) for _ in range(args.sessions)]
+    for vu in users:
+        await vu.__aenter__()
+    tasks = []
+    started = time.perf_counter()
+    try:
+        at = 0.0
+        index = 0
+        while True:
+            if (args.requests and index >= args.requests) or (args.replay_timing and index >= len(items)):
+                break
+            item = items[index % len(items)]
+            if args.replay_timing:
+                at = (item['offset'] or 0) / args.speed
+            else:
+                at += rng.expovariate(args.rate)
+            if args.duration and at > args.duration:
+                break
+            delay = started + at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(users[index % len(users)].send(item)))
+            index += 1
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for vu in users:
+            await vu.__aexit__(None, None, None)
+
+
+# 🔹 In-process app (--serve)
+
+def serve(mode, args):
+    """Start the stand-in providers and the app; returns (make_client, providers, stop)"""
+    from fake_providers import FakeProviders
+
+    profile = None
+    if args.fake_profile:
+        with open(args.fake_profile) as f:
+            profile = json.load(f)
+    providers = FakeProviders(latency=args.fake_latency, tokens_per_second=args.fake_tokens_per_second,
+                              errors=args.fake_errors, seed=args.seed, profile=profile).start()
+    os.environ.update(providers.env())
+    os.environ.setdefault('OLLAMA_AUTO_START', 'false')
+    os.environ.setdefault('LOG_PATH', os.devnull)
+    sys.path.insert(0, APP_DIR)
+    import chatbot  # Reads the environment on import
+
+    deadline = time.time() + 10
+    while not chatbot.check_ollama_service() and time.time() < deadline:
+        time.sleep(0.1)  # Supervisor's first probe
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=4, max_keepalive_connections=4)
+
+    if mode == 'flask':
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, chatbot.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name='flask-server', daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        return (lambda: httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits)), providers, server.shutdown
+
+    import asgi
+    try:
+        import uvicorn
+    except ImportError:
+        # No sockets or HTTP parsing: the app runs on the load generator's event loop
+        transport = httpx.ASGITransport(app=asgi.app)
+        return (lambda: httpx.AsyncClient(transport=transport, base_url='http://asgi', timeout=timeout)), \
+            providers, lambda: None
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=0, log_level='warning', backlog=1024))
+    threading.Thread(target=server.run, name='uvicorn', daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    url = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+
+    def stop():
+        server.should_exit = True
+    return (lambda: httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits)), providers, stop
+
+
+# 🔹 Report
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def distribution(values):
+    if not values:
+        return None
+    return {
+        'mean': round(statistics.mean(values), 4),
+        'p50': round(percentile(values, 0.5), 4),
+        'p90': round(percentile(values, 0.9), 4),
+        'p99': round(percentile(values, 0.99), 4),
+        'max': round(max(values), 4)
+    }
+
+
+def group_stats(samples):
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for s in samples if s['error']),
+        'latency': distribution([s['latency'] for s in samples if not s['error']]),
+        'ttft': distribution([s['ttft'] for s in samples if s['ttft'] is not None])
+    }
+
+
+def summarize(samples, elapsed, config):
+    by_category = defaultdict(list)
+    by_provider = defaultdict(list)
+    for sample in samples:
+        by_category[sample['category']].append(sample)
+        by_provider[sample['provider'] or 'none'].append(sample)
+    errors = defaultdict(int)
+    statuses = defaultdict(int)
+    for sample in samples:
+        statuses[str(sample['status'])] += 1
+        if sample['error']:
+            errors[sample['error']] += 1
+    checked = [s['keyword_hit'] for s in samples if s['keyword_hit'] is not None]
+    return {
+        'config': config,
+        'requests': len(samples),
+        'duration': round(elapsed, 3),
+        'throughput': round(len(samples) / elapsed, 3) if elapsed else 0.0,
+        'error_rate': round(sum(errors.values()) / len(samples), 4) if samples else 0.0,
+        **group_stats(samples),
+        'status': dict(statuses),
+        'error_kinds': dict(errors),
+        'keyword_hit_rate': round(sum(checked) / len(checked), 4) if checked else None,
+        'by_category': {name: group_stats(group) for name, group in sorted(by_category.items())},
+        'by_provider': {name: group_stats(group) for name, group in sorted(by_provider.items())}
+    }
+
+
+def print_report(summary):
+    def ms(dist, key):
+        return f"{dist[key] * 1000:>8.0f}" if dist else f"{'-':>8}"
+
+    print(f"\n{summary['requests']} requests in {summary['duration']:.1f}s: "
+          f"{summary['throughput']:.1f} req/s, error rate {summary['error_rate']:.1%}")
+    if summary['keyword_hit_rate'] is not None:
+        print(f"Expected keywords found in {summary['keyword_hit_rate']:.0%} of checked replies")
+    print(f"Status codes: {summary['status']}" + (f"  errors: {summary['error_kinds']}" if summary['error_kinds'] else ''))
+    header = f"{'':<22} {'requests':>8} {'errors':>7} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'ttft p50':>8}"
+    for title, groups in (('overall', {'all': summary}), ('category', summary['by_category']),
+                          ('provider', summary['by_provider'])):
+        print(f"\n{header.replace(' ' * 22, f'{title:<22}', 1)}")
+        for name, stats in groups.items():
+            print(f"{name[:22]:<22} {stats['requests']:>8} {stats['errors']:>7} {ms(stats['latency'], 'p50')} "
+                  f"{ms(stats['latency'], 'p90')} {ms(stats['latency'], 'p99')} {ms(stats['ttft'], 'p50')}")
+
+
+def metric(summary, path):
+    value = summary
+    for key in path.split('.'):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(summary, baseline, tolerance):
+    """Metrics worse than the baseline by more than tolerance: [(metric, baseline, current)]"""
+    regressions = []
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for path, worse in REGRESSION_CHECKS.items():
+        old, new = metric(baseline, path), metric(summary, path)
+        if old is None or new is None:
+            continue
+        if path == 'error_rate':
+            regressed = new > old + tolerance  # Rates are compared in absolute terms
+        elif worse == 'higher':
+            regressed = new > old * (1 + tolerance)
+        else:
+            regressed = new < old * (1 - tolerance)
+        change = (new - old) / old if old else 0.0
+        print(f"  {'REGRESSED' if regressed else 'ok':<10} {path:<12} {old:>10.4f} -> {new:>10.4f} ({change:+.1%})")
+        if regressed:
+            regressions.append((path, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of /get with latency percentiles")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://localhost:5000', help="running server to test")
+    target.add_argument('--serve', choices=('flask', 'asgi'),
+                        help="run the app in-process against the stand-in providers")
+    parser.add_argument('--traffic', help="JSONL requests or the app's event log to replay (default: TEST_CASES)")
+    parser.add_argument('--concurrency', type=int, default=10, help="closed loop: concurrent virtual users")
+    parser.add_argument('--iterations', type=int, default=1, help="closed loop: passes over the workload per user")
+    parser.add_argument('--rate', type=float, help="open loop: mean arrivals per second (Poisson)")
+    parser.add_argument('--duration', type=float, help="open loop: seconds to send for")
+    parser.add_argument('--requests', type=int, help="open loop: requests to send")
+    parser.add_argument('--sessions', type=int, default=20, help="open loop: session cookies to spread requests over")
+    parser.add_argument('--replay-timing', action='store_true', help="send --traffic at its recorded times")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed-up with --replay-timing")
+    parser.add_argument('--stream', action='store_true', help="request Server-Sent Events and time the first token")
+    parser.add_argument('--regenerate', action='store_true', help="skip the intent and response caches")
+    parser.add_argument('--deadline', type=float, help="X-Request-Deadline to send (seconds)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="client timeout per request")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--fake-latency', default='lognormal:0.5,0.3', help="--serve: provider time to first token")
+    parser.add_argument('--fake-tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--fake-errors', default='', help="--serve: fault rates, e.g. 429=0.05,timeout=0.01")
+    parser.add_argument('--fake-profile', help="--serve: JSON file of per-provider overrides")
+    parser.add_argument('--output', help="write the summary (JSON) here")
+    parser.add_argument('--save-baseline', help="write the summary as a baseline for later runs")
+    parser.add_argument('--baseline', help="compare with a saved baseline; exit 1 on regression")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed regression (fraction)")
+    args = parser.parse_args()
+
+    items = load_traffic(args.traffic) if args.traffic else test_case_workload()
+    if not items:
+        parser.error("the workload is empty")
+    open_loop_mode = args.rate is not None or args.replay_timing
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+    if args.replay_timing and not any(item.get('offset') for item in items):
+        parser.error("--replay-timing needs --traffic with recorded times")
+    if args.rate is not None and not (args.duration or args.requests):
+        args.requests = len(items)
+
+    providers, stop = None, lambda: None
+    if args.serve:
+        make_client, providers, stop = serve(args.serve, args)
+    else:
+        def make_client():
+            return httpx.AsyncClient(base_url=args.url, timeout=httpx.Timeout(args.timeout))
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ('output', 'save_baseline', 'baseline')}
+    config['mode'] = 'open' if open_loop_mode else 'closed'
+    shape = (f"{args.rate} req/s open loop" if args.rate is not None else
+             "recorded timing" if args.replay_timing else
+             f"{args.concurrency} users x {args.iterations} pass(es), closed loop")
+    print(f"Load test of {'in-process ' + args.serve if args.serve else args.url}: {len(items)} messages, {shape}"
+          f"{', streaming' if args.stream else ''}")
+
+    started = time.perf_counter()
+    if open_loop_mode:
+        samples = asyncio.run(open_loop(make_client, items, args))
+    else:
+        samples = asyncio.run(closed_loop(make_client, session_scripts(items, args.concurrency, args.iterations),
+                                          args))
+    elapsed = time.perf_counter() - started
+    stop()
+
+    summary = summarize(samples, elapsed, config)
+    if providers is not None:
+        summary['fake_providers'] = providers.stats()
+        providers.stop()
+    print_report(summary)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2)
+            print(f"\nSummary saved to {path}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(summary, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Routing simulation: compare provider routing policies offline
+Replays provider latencies through app/routing.py's Router with a simulated
+clock, once per policy, and reports per policy the time to a reply
+(mean/p50/p90/p99), the success rate, the cost and which providers answered.
+
+Latencies come from the app's event log (its provider_outcome events, one
+per /get that reached the providers) or from --synthetic, a run in which
+Ollama saturates for a while and Gemini is rate limited part of the time.
+Each replayed request walks the provider chain serially in the order the
+policy picks, within --deadline seconds. A provider's attempt takes the
+latency and outcome it had at that moment in the recording: the attempt
+recorded for that request if the provider was tried, else its nearest
+recorded attempt in time. Providers never recorded are left out. Ollama's
+queue wait is not modelled separately: recorded attempts already include it.
+
+    python simulate_routing.py [--log logs/chatbot.jsonl]
+    python simulate_routing.py --synthetic --requests 2000 --alpha 0.3 --half-life 30
+    python simulate_routing.py --synthetic --cost-weight 0 --json routing.json
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import statistics
+import sys
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, 'app'))
+
+from routing import POLICIES, Router, RoutingPolicy, parse_weights  # noqa: E402
+
+PROVIDERS = ['Ollama', 'OpenAI', 'Gemini', 'HuggingFace']
+
+
+# 🔹 Recorded latencies
+
+class Timeline:
+    """Each provider's attempts (time, ok, latency) in time order"""
+
+    def __init__(self):
+        self._times = defaultdict(list)
+        self._samples = defaultdict(list)
+
+    def add(self, provider, at, ok, latency):
+        index = bisect.bisect(self._times[provider], at)
+        self._times[provider].insert(index, at)
+        self._samples[provider].insert(index, (ok, latency))
+
+    @property
+    def providers(self):
+        return [name for name in PROVIDERS if self._times.get(name)] + \
+               sorted(name for name in self._times if name not in PROVIDERS and self._times[name])
+
+    def at(self, provider, when):
+        """(ok, latency) of provider's recorded attempt nearest in time to when"""
+        times = self._times[provider]
+        index = bisect.bisect(times, when)
+        if index == len(times) or (index > 0 and when - times[index - 1] <= times[index] - when):
+            index -= 1
+        return self._samples[provider][index]
+
+
+def load_log(path):
+    """(request times, Timeline) from the provider_outcome events of an event log"""
+    requests, timeline = [], Timeline()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('event') != 'provider_outcome':
+                continue
+            start = record.get('timestamp') or record.get('ts')
+            requests.append(start)
+            for attempt in record.get('attempts', []):
+                # An attempt that ran out of time counts as a failure; a cancelled race loser tells nothing
+                ok = False if attempt.get('timed_out') else attempt.get('ok')
+                if ok is not None and attempt.get('latency') is not None:
+                    timeline.add(attempt['provider'], start + attempt['started_at'], ok, attempt['latency'])
+    return sorted(requests), timeline
+
+
+def synthetic(count, rate, seed):
+    """(request times, Timeline) of a made-up run: every provider answers every request
+
+    Ollama is fast until it saturates from 30% to 60% of the run; Gemini
+    is rate limited (fast 429s) from 50% to 80%; Hugging Face is slow and flaky.
+    """
+    rng = random.Random(seed)
+    requests, timeline = [], Timeline()
+    now = 0.0
+    for index in range(count):
+        now += rng.expovariate(rate)
+        phase = index / count
+        requests.append(now)
+        saturated = 0.3 <= phase < 0.6
+        limited = 0.5 <= phase < 0.8
+        samples = {
+            'Ollama': (rng.random() < (0.7 if saturated else 0.98),
+                       rng.lognormvariate(1.8 if saturated else -0.4, 0.3)),
+            'OpenAI': (rng.random() < 0.99, rng.lognormvariate(0.2, 0.3)),
+            'Gemini': (False, rng.uniform(0.05, 0.15)) if limited and rng.random() < 0.8
+            else (rng.random() < 0.97, rng.lognormvariate(0.0, 0.3)),
+            'HuggingFace': (rng.random() < 0.5, rng.lognormvariate(0.7, 0.5)),
+        }
+        for name, (ok, latency) in samples.items():
+            timeline.add(name, now, ok, latency)
+    return requests, timeline
+
+
+# 🔹 Simulation
+
+def simulate(mode, requests, timeline, args, policy):
+    """Replay every request through a Router in mode; one result per request"""
+    clock = [0.0]
+    router = Router(policy=policy, mode=mode, alpha=args.alpha, half_life=args.half_life, clock=lambda: clock[0])
+    chain = [(name, None) for name in timeline.providers]
+    results = []
+    for start in requests:
+        clock[0] = start
+        elapsed, cost, winner, tried = 0.0, 0.0, None, 0
+        for name, _ in router.order(chain):
+            remaining = args.deadline - elapsed
+            if remaining < args.min_budget:
+                break
+            ok, latency = timeline.at(name, start + elapsed)
+            tried += 1
+            cost += policy.costs.get(name, 0.0)
+            if latency > remaining:  # Abandoned when the deadline runs out
+                ok, latency = False, remaining
+            elapsed += latency
+            clock[0] = start + elapsed
+            router.observe(name, ok, latency)
+            if ok:
+                winner = name
+                break
+        results.append({'latency': elapsed, 'winner': winner, 'cost': cost, 'tried': tried})
+    return results, router
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(results):
+    latencies = [r['latency'] for r in results]
+    winners = defaultdict(int)
+    for r in results:
+        winners[r['winner'] or 'none'] += 1
+    return {
+        'requests': len(results),
+        'success_rate': round(sum(1 for r in results if r['winner']) / len(results), 4),
+        'latency': {
+            'mean': round(statistics.mean(latencies), 4),
+            'p50': round(percentile(latencies, 0.5), 4),
+            'p90': round(percentile(latencies, 0.9), 4),
+            'p99': round(percentile(latencies, 0.99), 4)
+        },
+        'attempts_per_request': round(statistics.mean(r['tried'] for r in results), 3),
+        'cost_cents': round(sum(r['cost'] for r in results), 2),
+        'winners': {name: round(count / len(results), 4) for name, count in sorted(winners.items())}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare provider routing policies on recorded latencies")
+    parser.add_argument('--log', default=os.path.join(HERE, 'logs', 'chatbot.jsonl'),
+                        help="event log with provider_outcome events")
+    parser.add_argument('--synthetic', action='store_true', help="use a made-up run instead of --log")
+    parser.add_argument('--requests', type=int, default=1000, help="--synthetic: number of requests")
+    parser.add_argument('--rate', type=float, default=1.0, help="--synthetic: requests per second")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--policy', action='append', choices=POLICIES,
+                        help="policies to compare (default: all)")
+    parser.add_argument('--deadline', type=float, default=float(os.getenv('REQUEST_DEADLINE', '20')))
+    parser.add_argument('--min-budget', type=float, default=float(os.getenv('PROVIDER_MIN_BUDGET', '1.0')))
+    parser.add_argument('--alpha', type=float, default=float(os.getenv('ROUTING_ALPHA', '0.2')))
+    parser.add_argument('--half-life', type=float, default=float(os.getenv('ROUTING_HALF_LIFE', '60')))
+    parser.add_argument('--costs', default=os.getenv('PROVIDER_COSTS', 'OpenAI=0.05,Gemini=0.03'),
+                        help="cents per reply, e.g. OpenAI=0.05,Gemini=0.03")
+    parser.add_argument('--quality', default=os.getenv('PROVIDER_QUALITY',
+                                                       'Ollama=0.6,OpenAI=0.9,Gemini=0.85,HuggingFace=0.3'))
+    parser.add_argument('--cost-weight', type=float, default=float(os.getenv('ROUTING_COST_WEIGHT', '10')),
+                        help="seconds of latency one cent is worth")
+    parser.add_argument('--min-quality', type=float, default=float(os.getenv('ROUTING_MIN_QUALITY', '0.5')))
+    parser.add_argument('--max-cost', type=float, default=None)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        requests, timeline = synthetic(args.requests, args.rate, args.seed)
+        source = f"synthetic run ({args.requests} requests, seed {args.seed})"
+    else:
+        if not os.path.exists(args.log):
+            parser.error(f"{args.log} not found (run the app first, or use --synthetic)")
+        requests, timeline = load_log(args.log)
+        source = args.log
+    if not requests or not timeline.providers:
+        parser.error(f"no provider attempts recorded in {source}")
+
+    policy = RoutingPolicy(costs=parse_weights(args.costs), quality=parse_weights(args.quality),
+                           cost_weight=args.cost_weight, min_quality=args.min_quality, max_cost=args.max_cost)
+    print(f"{len(requests)} requests from {source}; providers: {', '.join(timeline.providers)}")
+    print(f"deadline {args.deadline}s, alpha {args.alpha}, half-life {args.half_life}s, "
+          f"cost weight {args.cost_weight}s/cent\n")
+    print(f"{'policy':<10} {'success':>8} {'mean s':>8} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} "
+          f"{'tries':>6} {'cents':>8}  replies by")
+
+    results = {}
+    for mode in args.policy or POLICIES:
+        runs, router = simulate(mode, requests, timeline, args, policy)
+        summary = results[mode] = summarize(runs)
+        summary['estimates'] = router.stats(recent=0)['estimates']
+        latency = summary['latency']
+        shares = ', '.join(f"{name} {share:.0%}" for name, share in summary['winners'].items())
+        print(f"{mode:<10} {summary['success_rate']:>8.1%} {latency['mean']:>8.2f} {latency['p50']:>8.2f} "
+              f"{latency['p90']:>8.2f} {latency['p99']:>8.2f} {summary['attempts_per_request']:>6.2f} "
+              f"{summary['cost_cents']:>8.2f}  {shares}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'source': source, 'config': vars(args), 'policies': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 """
 Automated Test Suite for Cloudy AI Chatbot
 Tests various domains and scenarios to ensure proper functionality
+(one message at a time; load_test.py sends these cases concurrently and reports latency percentiles)
 """
 
 import requests